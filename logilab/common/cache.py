@@ -18,25 +18,212 @@
 """Cache module, with a least recently used algorithm for the management of the
 deletion of entries.
 
-
-
-
+Other eviction policies are provided by the :class:`LFUCache` (least
+frequently used), :class:`TTLCache` (time to live) and :class:`CostCache`
+(total cost of the entries) classes, and :class:`PersistentCache` stores its
+entries in a sqlite database shared by processes.
 """
 __docformat__ = "restructuredtext en"
 
-from threading import Lock
+import os
+import sys
+import hashlib
+import sqlite3
+from threading import Lock, RLock
+from time import time
+
+from six import PY2, binary_type, integer_types
+from six.moves import cPickle as pickle
 
 from logilab.common.decorators import locked
 
 _marker = object()
 
+
+class _UsageList(object):
+    """Ordered set of keys, from the least to the most recently used one.
+
+    It is implemented as a hashed doubly-linked list: each key is mapped to
+    its `[prev, next, key]` link so that moving, appending and removing a key
+    are all O(1) operations.
+    """
+    __slots__ = ('_root', '_links')
+
+    def __init__(self):
+        self._root = root = []
+        root[:] = [root, root, None]
+        self._links = {}
+
+    def __len__(self):
+        return len(self._links)
+
+    def __contains__(self, key):
+        return key in self._links
+
+    def __iter__(self):
+        root = self._root
+        link = root[1]
+        while link is not root:
+            yield link[2]
+            link = link[1]
+
+    def __getitem__(self, index):
+        if not self._links:
+            raise IndexError('usage list index out of range')
+        if index == 0:
+            return self._root[1][2]
+        if index == -1:
+            return self._root[0][2]
+        return list(self)[index]
+
+    def __repr__(self):
+        return repr(list(self))
+
+    def append(self, key):
+        """Mark `key` as the most recently used key."""
+        root = self._root
+        try:
+            link = self._links[key]
+        except KeyError:
+            last = root[0]
+            last[1] = root[0] = self._links[key] = [last, root, key]
+            return
+        if link is root[0]:
+            return # key is already the most recently used key
+        prev, next_ = link[0], link[1]
+        prev[1] = next_
+        next_[0] = prev
+        last = root[0]
+        link[0] = last
+        link[1] = root
+        last[1] = root[0] = link
+
+    def remove(self, key):
+        """Remove `key`, raising `ValueError` if it is unknown."""
+        try:
+            prev, next_, _ = self._links.pop(key)
+        except KeyError:
+            raise ValueError('%r not in usage list' % (key,))
+        prev[1] = next_
+        next_[0] = prev
+
+    def popleft(self):
+        """Remove and return the least recently used key."""
+        if not self._links:
+            raise IndexError('pop from an empty usage list')
+        key = self._root[1][2]
+        self.remove(key)
+        return key
+
+    def clear(self):
+        root = self._root
+        root[:] = [root, root, None]
+        self._links.clear()
+
+
+class _FrequencyList(object):
+    """Set of keys, ordered from the least to the most frequently used one,
+    ties being ordered from the least to the most recently used one.
+
+    Keys are stored in one :class:`_UsageList` per use count, so that all
+    operations are O(1) but the removal of the last key of the least frequent
+    bucket.
+    """
+    __slots__ = ('_counts', '_buckets', '_mincount')
+
+    def __init__(self):
+        self._counts = {}
+        self._buckets = {}
+        self._mincount = 0
+
+    def __len__(self):
+        return len(self._counts)
+
+    def __contains__(self, key):
+        return key in self._counts
+
+    def __iter__(self):
+        for count in sorted(self._buckets):
+            for key in self._buckets[count]:
+                yield key
+
+    def __getitem__(self, index):
+        if index == 0 and self._counts:
+            return self._buckets[self._mincount][0]
+        return list(self)[index]
+
+    def __repr__(self):
+        return repr(list(self))
+
+    def append(self, key):
+        """Record a use of `key`."""
+        count = self._counts.get(key, 0)
+        if count:
+            bucket = self._buckets[count]
+            bucket.remove(key)
+            if not bucket:
+                del self._buckets[count]
+                if count == self._mincount:
+                    # key is moved to the next bucket, no lesser count left
+                    self._mincount = count + 1
+        count += 1
+        self._counts[key] = count
+        try:
+            self._buckets[count].append(key)
+        except KeyError:
+            self._buckets[count] = bucket = _UsageList()
+            bucket.append(key)
+        if not self._mincount or count < self._mincount:
+            self._mincount = count
+
+    def remove(self, key):
+        """Remove `key`, raising `ValueError` if it is unknown."""
+        try:
+            count = self._counts.pop(key)
+        except KeyError:
+            raise ValueError('%r not in frequency list' % (key,))
+        bucket = self._buckets[count]
+        bucket.remove(key)
+        if not bucket:
+            del self._buckets[count]
+            if count == self._mincount:
+                self._mincount = min(self._buckets) if self._buckets else 0
+
+    def popleft(self):
+        """Remove and return the least frequently used key."""
+        if not self._counts:
+            raise IndexError('pop from an empty frequency list')
+        key = self._buckets[self._mincount][0]
+        self.remove(key)
+        return key
+
+    def clear(self):
+        self._counts.clear()
+        self._buckets.clear()
+        self._mincount = 0
+
+
 class Cache(dict):
     """A dictionary like cache.
 
+    Every operation on the cache is O(1): the recency of the keys is tracked
+    in a hashed doubly-linked list.
+
+    The `hits`, `misses` and `evictions` attributes count lookups of present
+    and missing keys and entries removed to make room for new ones (see
+    :meth:`stats`). The `contentions` attribute counts how many times a
+    thread had to wait for another one to release the cache's lock.
+
+    Subclasses may implement other eviction policies by changing the
+    `_usage_class` attribute, which holds the keys in eviction order, or by
+    extending the `_lookup`, `_set`, `_discard` and `_clear` methods, which
+    are called with the lock held.
+
     inv:
         len(self._usage) <= self.size
         len(self.data) <= self.size
     """
+    _usage_class = _UsageList
 
     def __init__(self, size=100):
         """ Warning : Cache.__init__() != dict.__init__().
@@ -44,71 +231,708 @@ class Cache(dict):
         """
         assert size >= 0, 'cache size must be >= 0 (0 meaning no caching)'
         self.size = size
-        self._usage = []
+        self.hits = self.misses = self.evictions = 0
+        self.contentions = 0
+        self._usage = self._usage_class()
         self._lock = Lock()
         super(Cache, self).__init__()
 
     def _acquire(self):
-        self._lock.acquire()
+        if not self._lock.acquire(False):
+            self._lock.acquire()
+            self.contentions += 1
 
     def _release(self):
         self._lock.release()
 
+    def _lookup(self, key):
+        try:
+            value = super(Cache, self).__getitem__(key)
+        except KeyError:
+            self.misses += 1
+            raise
+        self.hits += 1
+        self._usage.append(key)
+        return value
+
     def _update_usage(self, key):
-        if not self._usage:
-            self._usage.append(key)
-        elif self._usage[-1] != key:
-            try:
-                self._usage.remove(key)
-            except ValueError:
-                # we are inserting a new key
-                # check the size of the dictionary
-                # and remove the oldest item in the cache
-                if self.size and len(self._usage) >= self.size:
-                    super(Cache, self).__delitem__(self._usage[0])
-                    del self._usage[0]
-            self._usage.append(key)
-        else:
-            pass # key is already the most recently used key
+        usage = self._usage
+        if key not in usage and self.size and len(usage) >= self.size:
+            # we are inserting a new key and the cache is full: remove the
+            # oldest item in the cache
+            self._evict()
+        usage.append(key)
 
-    def __getitem__(self, key):
-        value = super(Cache, self).__getitem__(key)
-        self._update_usage(key)
+    def _set(self, key, item):
+        # Just make sure that size > 0 before inserting a new item in the cache
+        if self.size > 0:
+            self._update_usage(key)
+            super(Cache, self).__setitem__(key, item)
+
+    def _discard(self, key):
+        """remove `key`, already removed from the usage list, and return its
+        value
+        """
+        return super(Cache, self).pop(key)
+
+    def _remove(self, key):
+        value = self._discard(key)
+        self._usage.remove(key)
         return value
+
+    def _evict(self):
+        self._discard(self._usage.popleft())
+        self.evictions += 1
+
+    def _clear(self):
+        super(Cache, self).clear()
+        self._usage.clear()
+
+    def __getitem__(self, key):
+        return self._lookup(key)
     __getitem__ = locked(_acquire, _release)(__getitem__)
 
     def __setitem__(self, key, item):
-        # Just make sure that size > 0 before inserting a new item in the cache
-        if self.size > 0:
-            super(Cache, self).__setitem__(key, item)
-            self._update_usage(key)
+        self._set(key, item)
     __setitem__ = locked(_acquire, _release)(__setitem__)
 
     def __delitem__(self, key):
-        super(Cache, self).__delitem__(key)
-        self._usage.remove(key)
+        self._remove(key)
     __delitem__ = locked(_acquire, _release)(__delitem__)
 
+    def get(self, key, default=None):
+        try:
+            return self._lookup(key)
+        except KeyError:
+            return default
+    get = locked(_acquire, _release)(get)
+
     def clear(self):
-        super(Cache, self).clear()
-        self._usage = []
+        self._clear()
     clear = locked(_acquire, _release)(clear)
 
     def pop(self, key, default=_marker):
-        if key in self:
-            self._usage.remove(key)
-        #if default is _marker:
-        #    return super(Cache, self).pop(key)
-        return super(Cache, self).pop(key, default)
+        try:
+            return self._remove(key)
+        except KeyError:
+            if default is _marker:
+                raise
+            return default
     pop = locked(_acquire, _release)(pop)
 
     def popitem(self):
-        raise NotImplementedError()
+        """Remove and return the least recently used (key, value) pair."""
+        try:
+            key = self._usage.popleft()
+        except IndexError:
+            raise KeyError('popitem(): cache is empty')
+        return key, self._discard(key)
+    popitem = locked(_acquire, _release)(popitem)
 
     def setdefault(self, key, default=None):
-        raise NotImplementedError()
+        try:
+            return self._lookup(key)
+        except KeyError:
+            self._set(key, default)
+            return default
+    setdefault = locked(_acquire, _release)(setdefault)
+
+    def update(self, other=(), **kwargs):
+        if isinstance(other, dict):
+            # don't go through other.__getitem__, it may be a Cache (or even
+            # self) whose usage list would be touched
+            other = list(dict.items(other))
+        elif hasattr(other, 'keys'):
+            other = [(key, other[key]) for key in other.keys()]
+        for key, item in other:
+            self._set(key, item)
+        for key, item in kwargs.items():
+            self._set(key, item)
+    update = locked(_acquire, _release)(update)
+
+    def stats(self):
+        """Return a dictionary of statistics about the cache usage."""
+        return {'hits': self.hits, 'misses': self.misses,
+                'evictions': self.evictions, 'currsize': len(self),
+                'maxsize': self.size}
+
+
+class LFUCache(Cache):
+    """A dictionary like cache, evicting the least frequently used entries
+    first.
+    """
+    _usage_class = _FrequencyList
+
+
+class TTLCache(Cache):
+    """A dictionary like cache whose entries expire `ttl` seconds after
+    they have been set, the least recently used entries being evicted when
+    it is full.
+
+    Expiration is lazy: expired entries are dropped when they are looked up
+    or when a new entry is set. `timer` is the function returning the current
+    time, :func:`time.time` by default. The number of expired entries is
+    counted in the `expirations` attribute.
+    """
+
+    def __init__(self, size=100, ttl=60, timer=time):
+        assert ttl > 0, 'time to live must be > 0'
+        self.ttl = ttl
+        self.timer = timer
+        self.expirations = 0
+        self._expires = {}
+        # keys ordered by set time, hence by expiration time
+        self._sets = _UsageList()
+        super(TTLCache, self).__init__(size)
+
+    def _expired(self, key, now=None):
+        if now is None:
+            now = self.timer()
+        return self._expires.get(key, now + 1) <= now
+
+    def _expire(self):
+        now = self.timer()
+        while self._sets and self._expired(self._sets[0], now):
+            self._remove(self._sets[0])
+            self.expirations += 1
 
-    def update(self, other):
-        raise NotImplementedError()
+    def _lookup(self, key):
+        if self._expired(key):
+            self._remove(key)
+            self.expirations += 1
+        return super(TTLCache, self)._lookup(key)
 
+    def _set(self, key, item):
+        self._expire()
+        super(TTLCache, self)._set(key, item)
+        if self.size > 0:
+            self._expires[key] = self.timer() + self.ttl
+            self._sets.append(key)
+
+    def _discard(self, key):
+        value = super(TTLCache, self)._discard(key)
+        del self._expires[key]
+        self._sets.remove(key)
+        return value
+
+    def _clear(self):
+        super(TTLCache, self)._clear()
+        self._expires.clear()
+        self._sets.clear()
+
+    def __contains__(self, key):
+        return (super(TTLCache, self).__contains__(key)
+                and not self._expired(key))
+
+    def stats(self):
+        stats = super(TTLCache, self).stats()
+        stats['expirations'] = self.expirations
+        return stats
+
+
+class CostCache(Cache):
+    """A dictionary like cache whose entries have a cost, computed by the
+    `sizer` function (:func:`sys.getsizeof` by default), the least recently
+    used entries being evicted as soon as the total cost exceeds `maxcost`
+    or there are more than `size` entries (0 meaning no limit).
+
+    Values whose cost is greater than `maxcost` are not cached. The current
+    total cost is available in the `cost` attribute.
+    """
+
+    def __init__(self, maxcost, size=0, sizer=sys.getsizeof):
+        assert maxcost >= 0, 'cache maximum cost must be >= 0'
+        self.maxcost = maxcost
+        self.sizer = sizer
+        self.cost = 0
+        self._costs = {}
+        super(CostCache, self).__init__(size)
+
+    def _set(self, key, item):
+        if key in self._costs:
+            self._remove(key)
+        cost = self.sizer(item)
+        if cost > self.maxcost:
+            return
+        while self._usage and self.cost + cost > self.maxcost:
+            self._evict()
+        # size 0 means no limit on the number of entries here, so don't call
+        # Cache._set
+        self._update_usage(key)
+        dict.__setitem__(self, key, item)
+        self._costs[key] = cost
+        self.cost += cost
+
+    def _discard(self, key):
+        value = super(CostCache, self)._discard(key)
+        self.cost -= self._costs.pop(key)
+        return value
+
+    def _clear(self):
+        super(CostCache, self)._clear()
+        self._costs.clear()
+        self.cost = 0
+
+    def stats(self):
+        stats = super(CostCache, self).stats()
+        stats['cost'] = self.cost
+        stats['maxcost'] = self.maxcost
+        return stats
+
+
+class _CacheShard(Cache):
+    """Segment of a :class:`ShardedCache`, accounting for its entries in the
+    budget of the whole cache.
+    """
+
+    def __init__(self, owner):
+        super(_CacheShard, self).__init__(owner.size)
+        self._owner = owner
+
+    def _set(self, key, item):
+        new = self.size > 0 and not dict.__contains__(self, key)
+        super(_CacheShard, self)._set(key, item)
+        if new:
+            self._owner._count_entries(1)
+
+    def _discard(self, key):
+        value = super(_CacheShard, self)._discard(key)
+        self._owner._count_entries(-1)
+        return value
 
+    def _clear(self):
+        count = len(self)
+        super(_CacheShard, self)._clear()
+        self._owner._count_entries(-count)
+
+    def evict(self):
+        """Evict the least recently used entry, if any."""
+        if self._usage:
+            self._evict()
+    evict = locked(Cache._acquire, Cache._release)(evict)
+
+
+class ShardedCache(object):
+    """A dictionary like cache spreading its keys over several independently
+    locked :class:`Cache` segments, so that threads working on different
+    segments don't contend on the same lock.
+
+    `size` is the total number of entries the cache may hold, whatever the
+    shards they belong to. When it is exceeded, the least recently used entry
+    of the largest shard is evicted. There are never more shards than `size`.
+    """
+
+    def __init__(self, size=100, shards=16):
+        assert size >= 0, 'cache size must be >= 0 (0 meaning no caching)'
+        assert shards > 0, 'number of shards must be > 0'
+        self.size = size
+        # number of entries, and of evictions in progress, over all shards
+        self._count = self._evicting = 0
+        self._lock = Lock()
+        shards = max(min(shards, size), 1)
+        self._shards = tuple(_CacheShard(self) for i in range(shards))
+
+    def _shard(self, key):
+        return self._shards[hash(key) % len(self._shards)]
+
+    def _count_entries(self, count):
+        with self._lock:
+            self._count += count
+
+    def _enforce_size(self):
+        """Evict entries until the size budget is met. This is done out of the
+        shards' locks, so that a thread holding one of them never waits for
+        another one.
+        """
+        while True:
+            with self._lock:
+                if self._count - self._evicting <= self.size:
+                    return
+                self._evicting += 1
+            try:
+                # if the shard has been emptied meanwhile, the budget is
+                # checked again on the next iteration
+                max(self._shards, key=len).evict()
+            finally:
+                with self._lock:
+                    self._evicting -= 1
+
+    def __getitem__(self, key):
+        return self._shard(key)[key]
+
+    def __setitem__(self, key, item):
+        self._shard(key)[key] = item
+        self._enforce_size()
+
+    def __delitem__(self, key):
+        del self._shard(key)[key]
+
+    def __contains__(self, key):
+        return key in self._shard(key)
+
+    def __len__(self):
+        return sum(len(shard) for shard in self._shards)
+
+    def __iter__(self):
+        for shard in self._shards:
+            for key in list(shard.keys()):
+                yield key
+
+    def __repr__(self):
+        return '<%s size=%s shards=%s len=%s>' % (
+            self.__class__.__name__, self.size, len(self._shards), len(self))
+
+    def keys(self):
+        return list(self)
+
+    def values(self):
+        return [value for shard in self._shards
+                for value in list(shard.values())]
+
+    def items(self):
+        return [item for shard in self._shards
+                for item in list(shard.items())]
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def pop(self, key, default=_marker):
+        if default is _marker:
+            return self._shard(key).pop(key)
+        return self._shard(key).pop(key, default)
+
+    def setdefault(self, key, default=None):
+        value = self._shard(key).setdefault(key, default)
+        self._enforce_size()
+        return value
+
+    def update(self, other=(), **kwargs):
+        if hasattr(other, 'keys'):
+            other = [(key, other[key]) for key in other.keys()]
+        for key, item in other:
+            self[key] = item
+        for key, item in kwargs.items():
+            self[key] = item
+
+    def clear(self):
+        for shard in self._shards:
+            shard.clear()
+
+    def contentions(self):
+        """Return the number of contended lock acquisitions of each shard."""
+        return [shard.contentions for shard in self._shards]
+
+    def stats(self):
+        """Return a dictionary of statistics about the cache usage, summed
+        over all shards.
+        """
+        stats = {}
+        for shard in self._shards:
+            for key, value in shard.stats().items():
+                stats[key] = stats.get(key, 0) + value
+        stats['maxsize'] = self.size
+        return stats
+
+
+class _SQLiteConnection(object):
+    """A sqlite connection shared by threads, and reopened in forked
+    processes.
+
+    It also holds what caches using it share: the number of entries in the
+    database (None until counted) and access times not written yet.
+    """
+    # number of access times written at once
+    atimes_batch = 100
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = RLock()
+        self._cnx = self._pid = None
+        self.count = None
+        # number of insertions since the entries have been counted
+        self.uncounted = 0
+        # {(namespace, key): access time} of entries read since the last
+        # write of access times
+        self.atimes = {}
+
+    def execute(self, sql, args=()):
+        """Execute `sql` and return all fetched rows, with the lock held."""
+        with self.lock:
+            return self._connection().execute(sql, args).fetchall()
+
+    def rowcount(self, sql, args=()):
+        """Execute `sql` and return the number of rows it modified, with the
+        lock held.
+        """
+        with self.lock:
+            return self._connection().execute(sql, args).rowcount
+
+    def touch(self, namespace, key):
+        """Record an access to an entry, whose access time is written later,
+        along with others.
+        """
+        with self.lock:
+            self.atimes[(namespace, key)] = time()
+            if len(self.atimes) >= self.atimes_batch:
+                self.flush_atimes()
+
+    def flush_atimes(self):
+        """Write access times recorded by :meth:`touch`."""
+        with self.lock:
+            if not self.atimes:
+                return
+            cnx = self._connection()
+            cnx.execute('BEGIN')
+            try:
+                cnx.executemany(
+                    'UPDATE cache SET atime=? WHERE namespace=? AND key=?',
+                    [(atime, namespace, key) for (namespace, key), atime
+                     in self.atimes.items()])
+            except BaseException:
+                cnx.execute('ROLLBACK')
+                raise
+            cnx.execute('COMMIT')
+            self.atimes = {}
+
+    def _connection(self):
+        if self._pid != os.getpid():
+            self._cnx = self._connect()
+            self._pid = os.getpid()
+        return self._cnx
+
+    def _connect(self):
+        cnx = sqlite3.connect(self.path, timeout=30, isolation_level=None,
+                              check_same_thread=False)
+        try:
+            cnx.execute('PRAGMA journal_mode=WAL')
+        except sqlite3.DatabaseError:
+            pass # file system not supporting WAL, keep the default journal
+        cnx.execute('CREATE TABLE IF NOT EXISTS cache (namespace TEXT, '
+                    'key TEXT, version TEXT, value BLOB, atime REAL, '
+                    'PRIMARY KEY (namespace, key))')
+        cnx.execute('CREATE INDEX IF NOT EXISTS cache_atime ON cache (atime)')
+        return cnx
+
+
+def _dumps(obj):
+    return pickle.dumps(obj, 2)
+
+
+def _canonical_key(key):
+    """Return a picklable equivalent of `key`, whose pickle is the same for
+    all the keys equal to `key`: numbers are converted to int when possible,
+    dicts, sets and frozensets to tuples of sorted items, and containers are
+    tagged with their type (sets and frozensets sharing the same one, as they
+    may be equal).
+    """
+    if isinstance(key, (bool, float) + integer_types):
+        if isinstance(key, float) and not key.is_integer():
+            return key
+        return int(key)
+    if PY2 and isinstance(key, binary_type):
+        try:
+            return key.decode('ascii') # 'a' == u'a'
+        except UnicodeDecodeError:
+            return key
+    if isinstance(key, tuple):
+        return ('tuple',) + tuple(_canonical_key(item) for item in key)
+    if isinstance(key, list):
+        return ('list',) + tuple(_canonical_key(item) for item in key)
+    if isinstance(key, dict):
+        return ('dict',) + tuple(sorted(
+            ((_canonical_key(k), _canonical_key(v)) for k, v in key.items()),
+            key=_dumps))
+    if isinstance(key, (set, frozenset)):
+        return ('set',) + tuple(sorted(
+            (_canonical_key(item) for item in key), key=_dumps))
+    return key
+
+
+class PersistentCache(object):
+    """A dictionary like cache storing pickled values in the sqlite database
+    at `path`, so that they survive restarts and are shared by the processes
+    using the same file.
+
+    Keys must be picklable: they are stored as the hash of their pickle, so
+    the cache can't be iterated. Numbers, strings, tuples, lists, dicts, sets
+    and frozensets are normalized first, so that equal keys share the same
+    entry whatever the order their items were inserted in; keys of other
+    types must have the same pickle when they are equal. Entries set with another `version` token
+    are ignored, then purged. The database holds up to `size` entries (0
+    meaning no limit) for all namespaces, the least recently used ones being
+    evicted first.
+
+    To keep reads and writes cheap, access times are written by batches of
+    :attr:`_SQLiteConnection.atimes_batch`, and entries are counted once
+    every `recount_interval` insertions, a running count being kept in
+    between. Entries inserted meanwhile by other processes may then exceed
+    `size` for a while.
+
+    :meth:`namespace` returns a cache sharing the same database and limit,
+    whose keys can't conflict with this one's.
+    """
+
+    recount_interval = 100
+
+    def __init__(self, path, size=10000, version=None, namespace=''):
+        assert size >= 0, 'cache size must be >= 0 (0 meaning no limit)'
+        self.path = path
+        self.size = size
+        self.version = '' if version is None else str(version)
+        self.hits = self.misses = self.evictions = 0
+        self._namespace = namespace
+        self._cnx = _SQLiteConnection(path)
+
+    def __repr__(self):
+        return '<%s %s namespace=%r version=%r>' % (
+            self.__class__.__name__, self.path, self._namespace, self.version)
+
+    def namespace(self, name):
+        """Return a cache on the same database, whose keys live in the `name`
+        namespace.
+        """
+        cache = self.__class__.__new__(self.__class__)
+        cache.__dict__.update(self.__dict__)
+        cache.hits = cache.misses = cache.evictions = 0
+        cache._namespace = name
+        return cache
+
+    def _hash(self, key):
+        return hashlib.sha1(_dumps(_canonical_key(key))).hexdigest()
+
+    def _lookup(self, key):
+        hkey = self._hash(key)
+        rows = self._cnx.execute(
+            'SELECT value, version FROM cache WHERE namespace=? AND key=?',
+            (self._namespace, hkey))
+        if not rows or rows[0][1] != self.version:
+            if rows:
+                self._delete(hkey)
+            raise KeyError(key)
+        self._cnx.touch(self._namespace, hkey)
+        return pickle.loads(bytes(rows[0][0]))
+
+    def _delete(self, hkey):
+        self._remove('DELETE FROM cache WHERE namespace=? AND key=?',
+                     (self._namespace, hkey))
+
+    def _remove(self, sql, args):
+        """Execute `sql` deleting entries, keeping count of them."""
+        cnx = self._cnx
+        with cnx.lock:
+            removed = cnx.rowcount(sql, args)
+            if cnx.count is not None:
+                cnx.count -= removed
+
+    def __getitem__(self, key):
+        try:
+            value = self._lookup(key)
+        except KeyError:
+            self.misses += 1
+            raise
+        self.hits += 1
+        return value
+
+    def __setitem__(self, key, item):
+        value = sqlite3.Binary(pickle.dumps(item, pickle.HIGHEST_PROTOCOL))
+        hkey = self._hash(key)
+        args = (self.version, value, time(), self._namespace, hkey)
+        cnx = self._cnx
+        with cnx.lock:
+            cnx.atimes.pop((self._namespace, hkey), None)
+            if cnx.rowcount('UPDATE cache SET version=?, value=?, atime=? '
+                            'WHERE namespace=? AND key=?', args):
+                return
+            # another process may have inserted the key meanwhile
+            cnx.rowcount('INSERT OR REPLACE INTO cache (version, value, atime, '
+                         'namespace, key) VALUES (?, ?, ?, ?, ?)', args)
+            if cnx.count is not None:
+                cnx.count += 1
+            cnx.uncounted += 1
+            if self.size:
+                self._evict()
+
+    def _evict(self):
+        """Evict the least recently used entries if the database holds more
+        than `size` entries.
+        """
+        cnx = self._cnx
+        with cnx.lock:
+            if cnx.count is None or cnx.uncounted >= self.recount_interval:
+                cnx.count = cnx.execute('SELECT COUNT(*) FROM cache')[0][0]
+                cnx.uncounted = 0
+            if cnx.count > self.size:
+                cnx.flush_atimes()
+                evicted = cnx.rowcount(
+                    'DELETE FROM cache WHERE rowid IN (SELECT rowid FROM '
+                    'cache ORDER BY atime LIMIT ?)', (cnx.count - self.size,))
+                cnx.count -= evicted
+                self.evictions += evicted
+
+    def __delitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        self._delete(self._hash(key))
+
+    def __contains__(self, key):
+        return bool(self._cnx.execute(
+            'SELECT 1 FROM cache WHERE namespace=? AND key=? AND version=?',
+            (self._namespace, self._hash(key), self.version)))
+
+    def __len__(self):
+        return self._cnx.execute(
+            'SELECT COUNT(*) FROM cache WHERE namespace=? AND version=?',
+            (self._namespace, self.version))[0][0]
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def pop(self, key, default=_marker):
+        try:
+            value = self._lookup(key)
+        except KeyError:
+            if default is _marker:
+                raise
+            return default
+        self._delete(self._hash(key))
+        return value
+
+    def setdefault(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            self[key] = default
+            return default
+
+    def update(self, other=(), **kwargs):
+        if hasattr(other, 'keys'):
+            other = [(key, other[key]) for key in other.keys()]
+        for key, item in other:
+            self[key] = item
+        for key, item in kwargs.items():
+            self[key] = item
+
+    def clear(self):
+        """Remove all entries of this cache's namespace."""
+        self._remove('DELETE FROM cache WHERE namespace=?', (self._namespace,))
+
+    def purge(self):
+        """Remove entries of this cache's namespace set with another version
+        token.
+        """
+        self._remove('DELETE FROM cache WHERE namespace=? AND version!=?',
+                     (self._namespace, self.version))
+
+    def stats(self):
+        """Return a dictionary of statistics about the cache usage by this
+        process.
+        """
+        return {'hits': self.hits, 'misses': self.misses,
+                'evictions': self.evictions, 'currsize': len(self),
+                'maxsize': self.size}
@@ -118,19 +118,24 @@ __all__ = ('OptionsManagerMixIn', 'OptionsProviderMixIn',
 import os
 import sys
 import re
-from os.path import exists, expanduser
+from os.path import exists, expanduser, abspath
 from copy import copy
+from collections import OrderedDict
 from warnings import warn
 
-from six import integer_types, string_types
+from six import integer_types, string_types, get_unbound_function
 from six.moves import range, configparser as cp, input
 
+from optparse import OptionError
+
 from logilab.common.compat import str_encode as _encode
 from logilab.common.deprecation import deprecated
-from logilab.common.textutils import normalize_text, unquote
-from logilab.common import optik_ext
+from logilab.common.lazy import LazyObject, lazy_import
 
-OptionError = optik_ext.OptionError
+# only needed once options are used
+optik_ext = lazy_import('logilab.common.optik_ext')
+normalize_text = LazyObject('logilab.common.textutils', 'normalize_text')
+unquote = LazyObject('logilab.common.textutils', 'unquote')
 
 REQUIRED = []
 
@@ -243,6 +248,43 @@ def _call_validator(opttype, optdict, option, value):
             raise optik_ext.OptionValueError('%s value (%r) should be of type %s' %
                                    (option, value, opttype))
 
+def _compile_validator(opttype, optdict, option):
+    """return a function validating a value for the given option
+
+    The returned function behaves as :func:`_call_validator` but remembers
+    the calling convention of the underlying validator once it's known.
+    """
+    if opttype not in VALIDATORS:
+        return lambda value: _call_validator(opttype, optdict, option, value)
+    validator = VALIDATORS[opttype]
+    # None: unknown yet, True: (optdict, option, value), False: (value)
+    signature = [None]
+    def validate(value):
+        if signature[0] is None:
+            try:
+                value = validator(optdict, option, value)
+            except TypeError:
+                pass
+            else:
+                signature[0] = True
+                return value
+        elif signature[0]:
+            try:
+                return validator(optdict, option, value)
+            except TypeError:
+                raise optik_ext.OptionValueError(
+                    '%s value (%r) should be of type %s' % (option, value, opttype))
+        try:
+            value = validator(value)
+        except optik_ext.OptionValueError:
+            raise
+        except:
+            raise optik_ext.OptionValueError('%s value (%r) should be of type %s' %
+                                   (option, value, opttype))
+        signature[0] = False
+        return value
+    return validate
+
 # user input functions ########################################################
 
 # user input functions will ask the user for input on stdin then validate
@@ -427,12 +469,49 @@ def rest_format_section(stream, section, options, encoding=None, doc=None):
             print(file=stream)
             print('  Default: ``%s``' % value.replace("`` ", "```` ``"), file=stream)
 
+# compiled configuration files cache ##########################################
+
+# absolute path -> ((modification time, size), [(option, value)])
+_CONFIG_FILE_CACHE = {}
+
+def _config_file_items(config_file):
+    """return the list of (option, value) found in the given configuration file,
+    in the order they are dispatched by `load_config_file`
+
+    The result is cached until the file's modification time or size changes.
+    """
+    config_file = abspath(config_file)
+    stat = os.stat(config_file)
+    key = (stat.st_mtime, stat.st_size)
+    try:
+        cachekey, items = _CONFIG_FILE_CACHE[config_file]
+    except KeyError:
+        pass
+    else:
+        if cachekey == key:
+            return items
+    parser = cp.ConfigParser()
+    parser.read([config_file])
+    items = [item for section in parser.sections()
+             for item in parser.items(section)]
+    _CONFIG_FILE_CACHE[config_file] = (key, items)
+    return items
+
+def clear_config_file_cache():
+    """forget about configuration files read in compiled schema mode"""
+    _CONFIG_FILE_CACHE.clear()
+
+
 # Options Manager ##############################################################
 
 class OptionsManagerMixIn(object):
     """MixIn to handle a configuration from both a configuration file and
     command line options
     """
+    # when true, options are set and configuration files are loaded through a
+    # flat option -> (provider, validator, attrname, optdict) table built once,
+    # see `compiled_schema()`
+    use_compiled_schema = False
 
     def __init__(self, usage, config_file=None, version=None, quiet=0):
         self.config_file = config_file
@@ -447,6 +526,8 @@ class OptionsManagerMixIn(object):
         # verbosity
         self.quiet = quiet
         self._maxlevel = 0
+        self._schema = None
+        self._watcher = None
 
     def reset_parsers(self, usage='', version=None):
         # configuration file parser
@@ -508,6 +589,7 @@ class OptionsManagerMixIn(object):
         args, optdict = self.optik_option(provider, opt, optdict)
         option = optikcontainer.add_option(*args, **optdict)
         self._all_options[opt] = provider
+        self._schema = None
         self._maxlevel = max(self._maxlevel, option.level or 0)
 
     def optik_option(self, provider, opt, optdict):
@@ -555,7 +637,49 @@ class OptionsManagerMixIn(object):
 
     def global_set_option(self, opt, value):
         """set option on the correct option provider"""
-        self._all_options[opt].set_option(opt, value)
+        if self.use_compiled_schema:
+            self._compiled_set_option(opt, value)
+        else:
+            self._all_options[opt].set_option(opt, value)
+
+    def compiled_schema(self):
+        """return a dictionary mapping each option name to a
+        (provider, validator, attrname, optdict) tuple.
+
+        `validator` is None when the option has to be set through its
+        provider's `set_option` method (actions other than 'store', 'named'
+        type or provider overriding `set_option`).
+        The table is computed once and reset when some option is added.
+        """
+        if self._schema is None:
+            default_set_option = get_unbound_function(OptionsProviderMixIn.set_option)
+            schema = {}
+            for opt, provider in self._all_options.items():
+                try:
+                    optdict = provider.get_option_def(opt)
+                except OptionError:
+                    continue
+                attrname = provider.option_attrname(opt, optdict)
+                opttype = optdict.get('type')
+                if (optdict.get('action', 'store') != 'store' or opttype == 'named'
+                    or get_unbound_function(type(provider).set_option) is not default_set_option):
+                    validator = None
+                elif opttype is None:
+                    validator = lambda value: value
+                else:
+                    validator = _compile_validator(opttype, optdict, opt)
+                schema[opt] = (provider, validator, attrname, optdict)
+            self._schema = schema
+        return self._schema
+
+    def _compiled_set_option(self, opt, value):
+        provider, validator, attrname, optdict = self.compiled_schema()[opt]
+        if validator is None:
+            provider.set_option(opt, value, optdict=optdict)
+        else:
+            if value is not None:
+                value = validator(value)
+            setattr(provider.config, attrname, value)
 
     def generate_config(self, stream=None, skipsections=(), encoding=None):
         """write a configuration file according to the current configuration
@@ -608,13 +732,65 @@ class OptionsManagerMixIn(object):
 
     def load_file_configuration(self, config_file=None):
         """load the configuration from file"""
-        self.read_config_file(config_file)
-        self.load_config_file()
+        if self.use_compiled_schema:
+            self._load_compiled_file_configuration(config_file)
+        else:
+            self.read_config_file(config_file)
+            self.load_config_file()
+
+    def _load_compiled_file_configuration(self, config_file=None):
+        """read, validate and dispatch values from the configuration file in a
+        single pass using the compiled schema. The configuration file parser
+        is left untouched.
+        """
+        self._add_help_options()
+        config_file = self._config_file_path(config_file)
+        if not (config_file and exists(config_file)):
+            if not self.quiet:
+                msg = 'No config file found, using default configuration'
+                print(msg, file=sys.stderr)
+            return
+        schema = self.compiled_schema()
+        for option, value in _config_file_items(config_file):
+            try:
+                provider, validator, attrname, optdict = schema[option]
+                if validator is None:
+                    provider.set_option(option, value, optdict=optdict)
+                else:
+                    setattr(provider.config, attrname, validator(value))
+            except (KeyError, OptionError):
+                # TODO handle here undeclared options appearing in the config file
+                continue
+
+    def _config_file_path(self, config_file):
+        if config_file is None:
+            config_file = self.config_file
+        if config_file is not None:
+            config_file = expanduser(config_file)
+        return config_file
 
     def read_config_file(self, config_file=None):
         """read the configuration file but do not load it (i.e. dispatching
         values to each options provider)
         """
+        self._add_help_options()
+        config_file = self._config_file_path(config_file)
+        if config_file and exists(config_file):
+            parser = self.cfgfile_parser
+            parser.read([config_file])
+            # normalize sections'title
+            for sect, values in list(parser._sections.items()):
+                if not sect.isupper() and values:
+                    parser._sections[sect.upper()] = values
+        elif not self.quiet:
+            msg = 'No config file found, using default configuration'
+            print(msg, file=sys.stderr)
+            return
+
+    def _add_help_options(self):
+        """add --long-help, --long-long-help... options according to the
+        maximum help level
+        """
         helplevel = 1
         while helplevel <= self._maxlevel:
             opt = '-'.join(['long'] * helplevel) + '-help'
@@ -630,21 +806,102 @@ class OptionsManagerMixIn(object):
             self.add_optik_option(provider, self.cmdline_parser, opt, optdict)
             provider.options += ( (opt, optdict), )
             helplevel += 1
+
+    # live reload ############################################################
+
+    def watch(self, config_file=None, polling=False):
+        """start watching the configuration file: modifications made to it
+        will then be taken into account by `reload_config_file`.
+
+        Nothing is done in the background: the application has to call
+        `reload_config_file` when it's ready to get new values, e.g.
+        periodically from its main loop. On Linux, this call is cheap since
+        modifications are notified through inotify unless `polling` is true,
+        see :class:`logilab.common.fileutils.FilesWatcher`.
+        """
+        from logilab.common.fileutils import FilesWatcher
+        config_file = self._config_file_path(config_file)
         if config_file is None:
-            config_file = self.config_file
-        if config_file is not None:
-            config_file = expanduser(config_file)
-        if config_file and exists(config_file):
-            parser = self.cfgfile_parser
-            parser.read([config_file])
-            # normalize sections'title
-            for sect, values in list(parser._sections.items()):
-                if not sect.isupper() and values:
-                    parser._sections[sect.upper()] = values
-        elif not self.quiet:
-            msg = 'No config file found, using default configuration'
-            print(msg, file=sys.stderr)
-            return
+            raise ValueError('no configuration file to watch')
+        self.stop_watching()
+        config_file = abspath(config_file)
+        self._watcher = FilesWatcher([config_file], polling=polling)
+        self._watched_file = config_file
+        self._watched_values = self._config_file_values(config_file)
+
+    def stop_watching(self):
+        """stop watching the configuration file"""
+        if self._watcher is not None:
+            self._watcher.close()
+            self._watcher = None
+
+    def reload_config_file(self):
+        """if the watched configuration file has been modified, set options
+        whose value changed (options removed from the file get back their
+        default value) and return their names, in the file's order.
+
+        New values are validated and set on copies of the providers' `config`
+        object, which then replace the original ones in one step: an invalid
+        edit leaves the configuration untouched, and code reading the
+        configuration meanwhile never sees some of the new values only.
+        Options which have to go through their provider's `set_option` (see
+        `compiled_schema`) are set afterwards, once all values are known to be
+        valid.
+        """
+        if self._watcher is None or not self._watcher.changes():
+            return []
+        # the file may have been modified without its mtime and size changing
+        _CONFIG_FILE_CACHE.pop(self._watched_file, None)
+        values = self._config_file_values(self._watched_file)
+        schema = self.compiled_schema()
+        changes = []
+        for opt, value in values.items():
+            if self._watched_values.get(opt) != value:
+                changes.append((opt, value))
+        for opt in self._watched_values:
+            if opt not in values:
+                provider, optdict = schema[opt][0], schema[opt][3]
+                default = provider.option_default(opt, optdict)
+                if default is not REQUIRED:
+                    changes.append((opt, default))
+        # [(provider, copy of its config)] with the new values set
+        staged = []
+        configs = {}
+        delayed = []
+        for opt, value in changes:
+            provider, validator, attrname, optdict = schema[opt]
+            if validator is None:
+                if value is not None:
+                    _validate(value, optdict, opt)
+                delayed.append((provider, opt, value, optdict))
+                continue
+            config = configs.get(id(provider))
+            if config is None:
+                config = configs[id(provider)] = copy(provider.config)
+                staged.append((provider, config))
+            if value is not None:
+                value = validator(value)
+            setattr(config, attrname, value)
+        for provider, config in staged:
+            provider.config = config
+        for provider, opt, value, optdict in delayed:
+            provider.set_option(opt, value, optdict=optdict)
+        self._watched_values = values
+        return [opt for opt, value in changes]
+
+    def _config_file_values(self, config_file):
+        """return an ordered dictionary of known options values found in the
+        given configuration file (if it exists)
+        """
+        values = OrderedDict()
+        if exists(config_file):
+            schema = self.compiled_schema()
+            for opt, value in _config_file_items(config_file):
+                if opt in schema:
+                    # move to the end to keep the file's order
+                    values.pop(opt, None)
+                    values[opt] = value
+        return values
 
     def input_config(self, onlysection=None, inputlevel=0, stream=None):
         """interactively get configuration values by asking to the user and generate
@@ -682,8 +939,11 @@ class OptionsManagerMixIn(object):
         """
         for opt, opt_value in kwargs.items():
             opt = opt.replace('_', '-')
-            provider = self._all_options[opt]
-            provider.set_option(opt, opt_value)
+            if self.use_compiled_schema:
+                self._compiled_set_option(opt, opt_value)
+            else:
+                provider = self._all_options[opt]
+                provider.set_option(opt, opt_value)
 
     def load_command_line_configuration(self, args=None):
         """override configuration according to command line parameters
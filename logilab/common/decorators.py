@@ -23,6 +23,9 @@ __docformat__ = "restructuredtext en"
 
 import sys
 import types
+import weakref
+from collections import namedtuple
+from threading import Event, RLock
 from time import clock, time
 from inspect import isgeneratorfunction
 
@@ -37,42 +40,120 @@ from logilab.common.compat import method_type
 
 # XXX rewrite so we can use the decorator syntax when keyarg has to be specified
 
+CacheInfo = namedtuple('CacheInfo', 'hits misses maxsize currsize')
+
 class cached_decorator(object):
-    def __init__(self, cacheattr=None, keyarg=None):
+    def __init__(self, cacheattr=None, keyarg=None, maxsize=None, ttl=None,
+                 weakkeys=False, concurrency=None, backend=None):
+        assert not ((ttl or backend is not None) and keyarg == 0), \
+               'ttl and backend are not supported with keyarg=0'
+        assert not (weakkeys and backend is not None), \
+               'weakkeys is not supported with a backend'
+        assert not ((ttl or maxsize) and backend is not None), \
+               'ttl and maxsize are not supported with a backend, whose size ' \
+               'is set on its creation'
+        assert concurrency in (None, 'singleflight'), \
+               'unknown concurrency mode %r' % concurrency
         self.cacheattr = cacheattr
+        self.concurrency = concurrency
         self.keyarg = keyarg
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.weakkeys = weakkeys
+        self.backend = backend
     def __call__(self, callableobj=None):
         assert not isgeneratorfunction(callableobj), \
                'cannot cache generator function: %s' % callableobj
-        if len(getfullargspec(callableobj).args) == 1 or self.keyarg == 0:
-            cache = _SingleValueCache(callableobj, self.cacheattr)
+        options = {'maxsize': self.maxsize, 'ttl': self.ttl,
+                   'weakkeys': self.weakkeys, 'concurrency': self.concurrency,
+                   'backend': self.backend}
+        if self.keyarg == 0 or (len(getfullargspec(callableobj).args) == 1
+                                and not self.ttl and self.backend is None):
+            cache = _SingleValueCache(callableobj, self.cacheattr,
+                                      self.concurrency)
         elif self.keyarg:
-            cache = _MultiValuesKeyArgCache(callableobj, self.keyarg, self.cacheattr)
+            cache = _MultiValuesKeyArgCache(callableobj, self.keyarg,
+                                            self.cacheattr, **options)
         else:
-            cache = _MultiValuesCache(callableobj, self.cacheattr)
+            cache = _MultiValuesCache(callableobj, self.cacheattr, **options)
         return cache.closure()
 
 class _SingleValueCache(object):
-    def __init__(self, callableobj, cacheattr=None):
+    maxsize = 1
+
+    def __init__(self, callableobj, cacheattr=None, concurrency=None):
         self.callable = callableobj
         if cacheattr is None:
             self.cacheattr = '_%s_cache_' % callableobj.__name__
         else:
             assert cacheattr != callableobj.__name__
             self.cacheattr = cacheattr
+        self.concurrency = concurrency
+        self.hits = self.misses = 0
+        # computations in progress in 'singleflight' mode, and the lock
+        # protecting them and the cache writes (reentrant since the cache may
+        # have to be created on the holder while writing to it)
+        self._flights = {}
+        self._lock = RLock()
 
     def __call__(__me, self, *args):
         try:
-            return self.__dict__[__me.cacheattr]
+            value = self.__dict__[__me.cacheattr]
         except KeyError:
+            __me.misses += 1
+            if __me.concurrency == 'singleflight':
+                return __me._singleflight(
+                    self, None,
+                    lambda: self.__dict__[__me.cacheattr],
+                    lambda: __me.callable(self, *args),
+                    lambda value: setattr(self, __me.cacheattr, value))
             value = __me.callable(self, *args)
             setattr(self, __me.cacheattr, value)
             return value
+        __me.hits += 1
+        return value
+
+    def _singleflight(self, holder, key, lookup, compute, store):
+        """Return the value for `key`, calling `compute` only if no other
+        thread is already computing it, else waiting for its result (or
+        exception). The value is stored in the cache through `store`.
+        """
+        flightkey = (id(holder), key)
+        with self._lock:
+            try:
+                # the value may have been stored since the caller's lookup
+                return lookup()
+            except KeyError:
+                pass
+            flight = self._flights.get(flightkey)
+            if flight is None:
+                flight = self._flights[flightkey] = _Flight()
+                leader = True
+            else:
+                leader = False
+        if not leader:
+            flight.done.wait()
+            if flight.exc_info is not None:
+                six.reraise(*flight.exc_info)
+            return flight.value
+        try:
+            flight.value = compute()
+            with self._lock:
+                store(flight.value)
+        except BaseException:
+            flight.exc_info = sys.exc_info()
+            raise
+        finally:
+            with self._lock:
+                del self._flights[flightkey]
+            flight.done.set()
+        return flight.value
 
     def closure(self):
         def wrapped(*args, **kwargs):
             return self.__call__(*args, **kwargs)
         wrapped.cache_obj = self
+        wrapped.cache_info = self.cache_info
         try:
             wrapped.__doc__ = self.callable.__doc__
             wrapped.__name__ = self.callable.__name__
@@ -81,43 +162,215 @@ class _SingleValueCache(object):
         return wrapped
 
     def clear(self, holder):
-        holder.__dict__.pop(self.cacheattr, None)
+        # holder may be a class, whose __dict__ is read-only
+        if self.cacheattr in holder.__dict__:
+            delattr(holder, self.cacheattr)
+
+    def currsize(self, holder):
+        return int(self.cacheattr in holder.__dict__)
+
+    def cache_info(self, holder=None):
+        """Return a :class:`CacheInfo` named tuple with hits and misses
+        counted over all holders, and the number of values currently cached
+        for `holder` (None if no holder is given).
+        """
+        currsize = None if holder is None else self.currsize(holder)
+        return CacheInfo(self.hits, self.misses, self.maxsize, currsize)
 
 
 class _MultiValuesCache(_SingleValueCache):
+    def __init__(self, callableobj, cacheattr=None, maxsize=None, ttl=None,
+                 weakkeys=False, concurrency=None, backend=None):
+        super(_MultiValuesCache, self).__init__(callableobj, cacheattr,
+                                                concurrency)
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.weakkeys = weakkeys
+        self.backend = backend
+        # (cache, key) of entries whose key has been garbage collected
+        self._dead = []
+
+    def _new_cache(self):
+        if self.backend is not None:
+            return _BackendCache(self.backend.namespace('%s.%s' % (
+                self.callable.__module__,
+                getattr(self.callable, '__qualname__', self.callable.__name__))))
+        if self.ttl:
+            from logilab.common.cache import TTLCache
+            return TTLCache(self.maxsize or sys.maxsize, self.ttl)
+        if self.maxsize:
+            from logilab.common.cache import Cache
+            return Cache(self.maxsize)
+        return {}
+
     def _get_cache(self, holder):
-        try:
-            _cache = holder.__dict__[self.cacheattr]
-        except KeyError:
-            _cache = {}
-            setattr(holder, self.cacheattr, _cache)
+        # holder may be a class (e.g. with @classmethod), whose __dict__ is
+        # read-only: the cache has to be set using setattr
+        _cache = holder.__dict__.get(self.cacheattr)
+        if _cache is None:
+            if self.concurrency == 'singleflight':
+                with self._lock:
+                    # don't overwrite a cache set by another thread meanwhile
+                    _cache = holder.__dict__.get(self.cacheattr)
+                    if _cache is None:
+                        _cache = self._new_cache()
+                        setattr(holder, self.cacheattr, _cache)
+            else:
+                _cache = self._new_cache()
+                setattr(holder, self.cacheattr, _cache)
         return _cache
 
+    def _key(self, args, kwargs):
+        return args
+
+    def _compute(self, holder, args, kwargs):
+        return self.callable(holder, *args)
+
+    def _weaken(self, key, callback):
+        return tuple(_weakref(arg, callback) for arg in key)
+
+    def _lookup(self, _cache, key):
+        if self.weakkeys:
+            return _cache[self._weaken(key, None)]
+        return _cache[key]
+
+    def _store(self, _cache, key, value):
+        if self.weakkeys:
+            weakkey = []
+            def forget(ref, _cache=_cache):
+                # don't touch the cache here, the garbage collector may be
+                # running while its lock is held
+                self._dead.append((_cache, weakkey[0]))
+            weakkey.append(self._weaken(key, forget))
+            key = weakkey[0]
+        _cache[key] = value
+
     def __call__(__me, self, *args, **kwargs):
+        while __me._dead:
+            _cache, key = __me._dead.pop()
+            _cache.pop(key, None)
         _cache = __me._get_cache(self)
+        key = __me._key(args, kwargs)
         try:
-            return _cache[args]
+            value = __me._lookup(_cache, key)
         except KeyError:
-            _cache[args] = __me.callable(self, *args)
-            return _cache[args]
+            __me.misses += 1
+            if __me.concurrency == 'singleflight':
+                # fetch the cache again under the lock, another thread may
+                # have set it on the holder meanwhile
+                return __me._singleflight(
+                    self, key,
+                    lambda: __me._lookup(__me._get_cache(self), key),
+                    lambda: __me._compute(self, args, kwargs),
+                    lambda value: __me._store(__me._get_cache(self), key, value))
+            value = __me._compute(self, args, kwargs)
+            __me._store(_cache, key, value)
+            return value
+        __me.hits += 1
+        return value
+
+    def clear(self, holder):
+        if self.backend is not None:
+            _cache = holder.__dict__.get(self.cacheattr)
+            if _cache is not None:
+                _cache.clear()
+        super(_MultiValuesCache, self).clear(holder)
+
+    def currsize(self, holder):
+        return len(holder.__dict__.get(self.cacheattr, ()))
 
 class _MultiValuesKeyArgCache(_MultiValuesCache):
-    def __init__(self, callableobj, keyarg, cacheattr=None):
-        super(_MultiValuesKeyArgCache, self).__init__(callableobj, cacheattr)
+    def __init__(self, callableobj, keyarg, cacheattr=None, **kwargs):
+        super(_MultiValuesKeyArgCache, self).__init__(callableobj, cacheattr,
+                                                      **kwargs)
         self.keyarg = keyarg
 
-    def __call__(__me, self, *args, **kwargs):
-        _cache = __me._get_cache(self)
-        key = args[__me.keyarg-1]
-        try:
-            return _cache[key]
-        except KeyError:
-            _cache[key] = __me.callable(self, *args, **kwargs)
-            return _cache[key]
+    def _key(self, args, kwargs):
+        return args[self.keyarg-1]
+
+    def _compute(self, holder, args, kwargs):
+        return self.callable(holder, *args, **kwargs)
+
+    def _weaken(self, key, callback):
+        return _weakref(key, callback)
+
+
+class _BackendCache(object):
+    """View of a holder on a backend namespace, remembering the keys it used
+    so that clearing it doesn't affect other holders.
+    """
+    __slots__ = ('namespace', 'keys')
+
+    def __init__(self, namespace):
+        self.namespace = namespace
+        self.keys = set()
+
+    def __getitem__(self, key):
+        value = self.namespace[key]
+        self.keys.add(key)
+        return value
+
+    def __setitem__(self, key, value):
+        self.namespace[key] = value
+        self.keys.add(key)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def clear(self):
+        for key in self.keys:
+            self.namespace.pop(key, None)
+        self.keys.clear()
+
+
+class _Flight(object):
+    """A computation shared by concurrent callers of a cached function."""
+    __slots__ = ('done', 'value', 'exc_info')
+
+    def __init__(self):
+        self.done = Event()
+        self.value = self.exc_info = None
+
+
+def _weakref(obj, callback=None):
+    """Return a weak reference to `obj`, or `obj` itself if it can't be weakly
+    referenced.
+    """
+    try:
+        return weakref.ref(obj, callback)
+    except TypeError:
+        return obj
 
 
 def cached(callableobj=None, keyarg=None, **kwargs):
-    """Simple decorator to cache result of method call."""
+    """Simple decorator to cache result of method call.
+
+    Results are stored on the instance, in an unbounded dictionary unless the
+    following arguments are given to bound it:
+
+    * `maxsize`, the maximum number of results cached per instance, the least
+      recently used ones being evicted first;
+
+    * `ttl`, the number of seconds after which a result expires.
+
+    If `weakkeys` is true, arguments used as key are weakly referenced when
+    possible, and results are forgotten once one of them is garbage collected.
+
+    If `concurrency` is 'singleflight', threads missing the same key while it
+    is being computed wait for this computation and share its result (or
+    exception) instead of computing it again. Cache writes are then
+    serialized.
+
+    `backend` is a :class:`logilab.common.cache.PersistentCache` in which
+    results are stored instead of the instance, in a namespace proper to the
+    decorated function. They are then shared by all instances and processes
+    using this backend: the instance isn't part of the key. Clearing the
+    cache of an instance removes the results it used from the backend. The
+    backend's size applies, `maxsize` and `ttl` can't be given.
+
+    The decorated function has a `cache_info(holder=None)` method returning
+    hits, misses, maximum size and current size of the cache for `holder`.
+    """
     kwargs['keyarg'] = keyarg
     decorator = cached_decorator(**kwargs)
     if callableobj is None:
@@ -181,6 +434,12 @@ def clear_cache(obj, funcname):
     """
     get_cache_impl(obj, funcname).clear(obj)
 
+def cache_info(obj, funcname):
+    """Return a :class:`CacheInfo` named tuple for the cache handled by the
+    :func:`cached` decorator on method `funcname` of `obj`.
+    """
+    return get_cache_impl(obj, funcname).cache_info(obj)
+
 def copy_cache(obj, funcname, cacheobj):
     """Copy cache for <funcname> from cacheobj to obj."""
     cacheattr = get_cache_impl(obj, funcname).cacheattr
@@ -20,7 +20,7 @@
 :group path manipulation: first_level_directory, relative_path, is_binary,\
 get_by_ext, remove_dead_links
 :group file manipulation: norm_read, norm_open, lines, stream_lines, lines,\
-write_open_mode, ensure_fs_mode, export
+write_open_mode, ensure_fs_mode, export, FilesWatcher
 :sort: path manipulation, file manipulation
 """
 
@@ -29,8 +29,11 @@ from __future__ import print_function
 __docformat__ = "restructuredtext en"
 
 import io
+import os
 import sys
+import errno
 import shutil
+import struct
 import mimetypes
 from os.path import isabs, isdir, islink, split, exists, normpath, join
 from os.path import abspath
@@ -319,7 +322,7 @@ def stream_lines(stream, comments=None):
 
 def export(from_dir, to_dir,
            blacklist=BASE_BLACKLIST, ignore_ext=IGNORED_EXTENSIONS,
-           verbose=0):
+           verbose=0, incremental=False, checksum=False, workers=0):
     """Make a mirror of `from_dir` in `to_dir`, omitting directories and
     files listed in the black list or ending with one of the given
     extensions.
@@ -344,12 +347,35 @@ def export(from_dir, to_dir,
     :param verbose:
       flag indicating whether information about exported files should be
       printed to stderr, default to False
+
+    :type incremental: bool
+    :param incremental:
+      flag indicating whether files already exported with the same size and
+      modification time (to the second) should be left untouched, default to
+      False
+
+    :type checksum: bool
+    :param checksum:
+      flag indicating whether files already exported with the same size and
+      content should be left untouched, whatever their modification time,
+      default to False
+
+    :type workers: int
+    :param workers:
+      number of threads copying files concurrently, default to 0 (no thread)
+
+    :rtype: dict
+    :return:
+      a manifest of exported files, mapping their path relative to
+      `from_dir` to 'created', 'updated' or 'unchanged'
     """
     try:
         mkdir(to_dir)
     except OSError:
         pass # FIXME we should use "exists" if the point is about existing dir
              # else (permission problems?) shouldn't return / raise ?
+    ignore_ext = tuple(ignore_ext)
+    tasks = []
     for directory, dirnames, filenames in walk(from_dir):
         for norecurs in blacklist:
             try:
@@ -364,16 +390,95 @@ def export(from_dir, to_dir,
                     mkdir(dest)
         for filename in filenames:
             # don't include binary files
-            # endswith does not accept tuple in 2.4
-            if any([filename.endswith(ext) for ext in ignore_ext]):
+            if filename.endswith(ignore_ext):
                 continue
             src = join(directory, filename)
             dest = to_dir + src[len(from_dir):]
-            if verbose:
-                print(src, '->', dest, file=sys.stderr)
-            if exists(dest):
-                remove(dest)
-            shutil.copy2(src, dest)
+            tasks.append((src, dest, incremental, checksum))
+    if workers and tasks:
+        from multiprocessing.pool import ThreadPool
+        pool = ThreadPool(workers)
+        try:
+            results = pool.imap_unordered(_export_file, tasks)
+            manifest = _export_manifest(from_dir, results, verbose)
+        finally:
+            pool.terminate()
+    else:
+        manifest = _export_manifest(from_dir, map(_export_file, tasks), verbose)
+    return manifest
+
+
+def _export_manifest(from_dir, results, verbose):
+    manifest = {}
+    for src, dest, status in results:
+        if verbose and status != 'unchanged':
+            print(src, '->', dest, file=sys.stderr)
+        manifest[src[len(from_dir):].lstrip(sep)] = status
+    return manifest
+
+
+def _export_file(task):
+    """copy a file for `export`, given a (source, destination, incremental,
+    checksum) tuple, and return (source, destination, status)
+    """
+    src, dest, incremental, checksum = task
+    try:
+        deststat = stat(dest)
+    except OSError:
+        deststat = None
+    if deststat is not None:
+        if incremental or checksum:
+            srcstat = stat(src)
+            if srcstat.st_size == deststat.st_size:
+                if checksum:
+                    unchanged = _file_digest(src) == _file_digest(dest)
+                else:
+                    unchanged = int(srcstat.st_mtime) == int(deststat.st_mtime)
+                if unchanged:
+                    return src, dest, 'unchanged'
+        remove(dest)
+    _copy_file(src, dest)
+    return src, dest, deststat is None and 'created' or 'updated'
+
+
+def _file_digest(path, blocksize=1 << 20):
+    import hashlib
+    digest = hashlib.sha1()
+    with open(path, 'rb') as stream:
+        for block in iter(lambda: stream.read(blocksize), b''):
+            digest.update(block)
+    return digest.digest()
+
+
+def _copy_file(src, dest):
+    """like `shutil.copy2`, but copying the content in the kernel using
+    `os.copy_file_range` or `os.sendfile` when available
+    """
+    copy_range = getattr(os, 'copy_file_range', None)
+    sendfile = getattr(os, 'sendfile', None)
+    if copy_range is None and sendfile is None:
+        shutil.copy2(src, dest)
+        return
+    with open(src, 'rb') as fsrc:
+        with open(dest, 'wb') as fdest:
+            infd, outfd = fsrc.fileno(), fdest.fileno()
+            size = os.fstat(infd).st_size
+            offset = 0
+            try:
+                while offset < size:
+                    if copy_range is not None:
+                        copied = copy_range(infd, outfd, size - offset)
+                    else:
+                        copied = sendfile(outfd, infd, offset, size - offset)
+                    if not copied:
+                        break
+                    offset += copied
+            except OSError:
+                if offset:
+                    raise
+                # not supported by the file systems, copy in user space
+                shutil.copyfileobj(fsrc, fdest)
+    shutil.copystat(src, dest)
 
 
 def remove_dead_links(directory, verbose=0):
@@ -395,3 +500,282 @@ def remove_dead_links(directory, verbose=0):
                     print('remove dead link', src)
                 remove(src)
 
+
+
+# inotify(7) flags
+_IN_MODIFY = 0x2
+_IN_ATTRIB = 0x4
+_IN_CLOSE_WRITE = 0x8
+_IN_MOVED_FROM = 0x40
+_IN_MOVED_TO = 0x80
+_IN_CREATE = 0x100
+_IN_DELETE = 0x200
+_IN_Q_OVERFLOW = 0x4000
+_IN_IGNORED = 0x8000
+_IN_ISDIR = 0x40000000
+_IN_NONBLOCK = 0o4000
+_IN_CLOEXEC = 0o2000000
+_IN_WATCH_MASK = (_IN_MODIFY | _IN_ATTRIB | _IN_CLOSE_WRITE | _IN_MOVED_FROM
+                  | _IN_MOVED_TO | _IN_CREATE | _IN_DELETE)
+_INOTIFY_EVENT = struct.Struct('iIII')
+
+_LIBC = []
+
+def _libc():
+    """return the C library if it provides inotify, else None"""
+    if not _LIBC:
+        libc = None
+        if sys.platform.startswith('linux'):
+            try:
+                import ctypes
+                import ctypes.util
+                libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6',
+                                   use_errno=True)
+                libc.inotify_init1, libc.inotify_add_watch, libc.inotify_rm_watch
+            except (ImportError, OSError, AttributeError):
+                libc = None
+        _LIBC.append(libc)
+    return _LIBC[0]
+
+
+class FilesWatcher(object):
+    """Watch files and directories (recursively) for modifications.
+
+    On Linux, modifications are notified by the kernel through inotify, so
+    that getting them costs in proportion to the number of modifications.
+    Elsewhere, or if `polling` is true, modification dates of watched files
+    are compared to the ones they had on the previous call. This is also the
+    case for directories which can't be watched through inotify, e.g. once
+    the maximum number of watches is reached (see :attr:`degraded`)::
+
+      watcher = FilesWatcher(['/etc/hosts', '/usr/lib/python3/dist-packages'])
+      ...
+      for path in watcher.changes():
+          ...
+    """
+
+    def __init__(self, paths, polling=False):
+        self.paths = [abspath(path) for path in paths]
+        self._fd = None
+        # {directory: watched file names or None for the whole directory
+        #  tree} of directories which couldn't be watched through inotify
+        self._polled = {}
+        # {directory: file names} of directories of watched trees, to know
+        # which files were removed along with a directory
+        self._files = {}
+        if not polling and _libc() is not None:
+            fd = _libc().inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+            if fd >= 0:
+                self._fd = fd
+                # {watch descriptor: (directory, watched file names or
+                #                     None for the whole directory tree)}
+                self._watches = {}
+                for path in self.paths:
+                    if isdir(path):
+                        self._watch_tree(path)
+                    else:
+                        self._watch_file(path)
+                self._mdates = self._polled_snapshot()
+                return
+        self._mdates = self._snapshot()
+
+    @property
+    def polling(self):
+        """true if modifications are detected by polling"""
+        return self._fd is None
+
+    @property
+    def degraded(self):
+        """true if some directories couldn't be watched through inotify and
+        are polled instead
+        """
+        return bool(self._polled)
+
+    def close(self):
+        """stop watching"""
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+            self._polled = {}
+            self._files = {}
+            self._mdates = {}
+
+    def __del__(self):
+        self.close()
+
+    def changes(self):
+        """return the set of paths of files modified, created or removed since
+        the previous call (or since the watcher's creation)
+        """
+        if self._fd is None:
+            return self._poll(self._snapshot())
+        changed = set()
+        for wd, mask, name in self._read_events():
+            if mask & _IN_Q_OVERFLOW:
+                # events were lost, consider everything has changed
+                for path in self.paths:
+                    if isdir(path):
+                        self._watch_tree(path)
+                changed.update(self._snapshot())
+                continue
+            if mask & _IN_IGNORED:
+                # watched directory removed
+                if wd in self._watches:
+                    directory, names = self._watches.pop(wd)
+                    self._files.pop(directory, None)
+                continue
+            try:
+                directory, names = self._watches[wd]
+            except KeyError:
+                continue
+            if names is not None and name not in names:
+                continue
+            path = join(directory, name)
+            if mask & _IN_ISDIR:
+                if names is not None:
+                    continue
+                if mask & (_IN_CREATE | _IN_MOVED_TO):
+                    changed.update(self._watch_tree(path))
+                elif mask & (_IN_DELETE | _IN_MOVED_FROM):
+                    changed.update(self._unwatch_tree(path))
+            else:
+                if names is None:
+                    files = self._files.setdefault(directory, set())
+                    if mask & (_IN_DELETE | _IN_MOVED_FROM):
+                        files.discard(name)
+                    else:
+                        files.add(name)
+                changed.add(path)
+        if self._polled:
+            changed.update(self._poll(self._polled_snapshot()))
+        return changed
+
+    def _poll(self, mdates):
+        """return paths whose modification date in `mdates` differs from the
+        previous one, and remember `mdates` for the next call
+        """
+        changed = set(path for path, mdate in mdates.items()
+                      if self._mdates.get(path) != mdate)
+        changed.update(set(self._mdates) - set(mdates))
+        self._mdates = mdates
+        return changed
+
+    def _read_events(self):
+        """read available inotify events, yielding (watch descriptor, mask,
+        name)
+        """
+        while True:
+            try:
+                data = os.read(self._fd, 65536)
+            except OSError as ex:
+                if ex.errno in (errno.EAGAIN, errno.EINTR):
+                    return
+                raise
+            if not data:
+                return
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = _INOTIFY_EVENT.unpack_from(data, offset)
+                offset += _INOTIFY_EVENT.size
+                name = data[offset:offset + length].rstrip(b'\0')
+                offset += length
+                if not isinstance(name, str):
+                    name = name.decode(sys.getfilesystemencoding())
+                yield wd, mask, name
+
+    def _add_watch(self, directory, names):
+        path = directory
+        if not isinstance(path, bytes):
+            path = path.encode(sys.getfilesystemencoding())
+        wd = _libc().inotify_add_watch(self._fd, path, _IN_WATCH_MASK)
+        if wd < 0:
+            # most likely the maximum number of watches has been reached,
+            # fallback to polling this directory
+            if directory in self._polled:
+                oldnames = self._polled[directory]
+                if oldnames is None or names is None:
+                    names = None
+                else:
+                    names = oldnames | names
+            self._polled[directory] = names
+            return
+        if wd in self._watches:
+            olddirectory, oldnames = self._watches[wd]
+            if oldnames is None or names is None:
+                names = None
+            else:
+                names = oldnames | names
+        self._watches[wd] = (directory, names)
+
+    def _watch_tree(self, directory):
+        """watch the `directory` tree and return the paths of its files"""
+        filepaths = []
+        for dirpath, dirnames, filenames in walk(directory):
+            self._add_watch(dirpath, None)
+            self._files[dirpath] = set(filenames)
+            filepaths += [join(dirpath, filename) for filename in filenames]
+        return filepaths
+
+    def _unwatch_tree(self, directory):
+        """stop watching the `directory` tree, which was moved or removed,
+        and return the paths of the files it held
+        """
+        def in_tree(path):
+            return path == directory or path.startswith(directory + sep)
+        filepaths = []
+        for dirpath in [path for path in self._files if in_tree(path)]:
+            filepaths += [join(dirpath, filename)
+                          for filename in self._files.pop(dirpath)]
+        for wd, (dirpath, names) in list(self._watches.items()):
+            if names is None and in_tree(dirpath):
+                # a moved directory is still watched at its new place
+                _libc().inotify_rm_watch(self._fd, wd)
+                del self._watches[wd]
+        return filepaths
+
+    def _watch_file(self, filepath):
+        directory, name = split(filepath)
+        self._add_watch(directory, frozenset((name,)))
+
+    def _snapshot(self):
+        """return {filepath: modification date} for watched files"""
+        filepaths = []
+        for path in self.paths:
+            if isdir(path):
+                filepaths += _walk_files(path)
+            else:
+                filepaths.append(path)
+        return _mdates(filepaths)
+
+    def _polled_snapshot(self):
+        """return {filepath: modification date} for files in directories which
+        couldn't be watched through inotify
+        """
+        trees = [directory for directory, names in self._polled.items()
+                 if names is None]
+        filepaths = []
+        for directory, names in self._polled.items():
+            if names is not None:
+                filepaths += [join(directory, name) for name in names]
+            # subdirectories of a polled tree are walked along with it
+            elif not any(directory.startswith(tree + sep) for tree in trees):
+                filepaths += _walk_files(directory)
+        return _mdates(filepaths)
+
+
+def _mdates(filepaths):
+    """return {filepath: modification date} for existing `filepaths`"""
+    mdates = {}
+    for filepath in filepaths:
+        try:
+            mdates[filepath] = stat(filepath).st_mtime
+        except OSError:
+            continue
+    return mdates
+
+
+def _walk_files(directory):
+    """return paths of files in the `directory` tree"""
+    return [join(dirpath, filename)
+            for dirpath, dirnames, filenames in walk(directory)
+            for filename in filenames]
@@ -280,3 +280,18 @@ def has_path(graph_dict, fromnode, tonode, path=None):
     path.pop()
     return None
 
+
+def get_reachable(graph_dict, vertices):
+    """given a dictionary representing an ordered graph (i.e. key are vertices
+    and values is a list of destination vertices representing edges), return
+    the set of vertices reachable from the given ones, including them
+    """
+    reachable = set()
+    stack = list(vertices)
+    while stack:
+        vertice = stack.pop()
+        if vertice in reachable:
+            continue
+        reachable.add(vertice)
+        stack.extend(graph_dict.get(vertice, ()))
+    return reachable
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+# copyright 2026 LOGILAB S.A. (Paris, FRANCE), all rights reserved.
+# contact http://www.logilab.fr/ -- mailto:contact@logilab.fr
+#
+# This file is part of logilab-common.
+#
+# logilab-common is free software: you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License as published by the Free
+# Software Foundation, either version 2.1 of the License, or (at your option) any
+# later version.
+#
+# logilab-common is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License along
+# with logilab-common.  If not, see <http://www.gnu.org/licenses/>.
+"""Proxies to modules and module attributes, imported when first used.
+
+This module only depends on the standard library, so that it can be used to
+defer the imports of other modules at no cost.
+"""
+
+__docformat__ = "restructuredtext en"
+
+import sys
+from importlib import import_module
+
+
+class LazyObject(object):
+    """Proxy to the `obj` attribute of the module `module`, imported when
+    the proxy is first used.
+    """
+    def __init__(self, module, obj):
+        self.module = module
+        self.obj = obj
+        self._imported = None
+
+    def _getobj(self):
+        if self._imported is None:
+           self._imported = getattr(import_module(self.module), self.obj)
+        return self._imported
+
+    def __getattribute__(self, attr):
+        try:
+            return super(LazyObject, self).__getattribute__(attr)
+        except AttributeError as ex:
+            return getattr(self._getobj(), attr)
+
+    def __call__(self, *args, **kwargs):
+        return self._getobj()(*args, **kwargs)
+
+
+class LazyModule(LazyObject):
+    """Proxy to the module `name`, imported when one of its attributes is
+    first accessed (see :func:`lazy_import`).
+    """
+    def __init__(self, name):
+        object.__setattr__(self, 'module', name)
+        object.__setattr__(self, 'obj', None)
+        object.__setattr__(self, '_imported', None)
+
+    def _getobj(self):
+        module = object.__getattribute__(self, '_imported')
+        if module is None:
+            module = import_module(object.__getattribute__(self, 'module'))
+            object.__setattr__(self, '_imported', module)
+        return module
+
+    def __getattribute__(self, attr):
+        return getattr(object.__getattribute__(self, '_getobj')(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(object.__getattribute__(self, '_getobj')(), attr, value)
+
+    def __delattr__(self, attr):
+        delattr(object.__getattribute__(self, '_getobj')(), attr)
+
+    def __dir__(self):
+        return dir(object.__getattribute__(self, '_getobj')())
+
+    def __repr__(self):
+        module = object.__getattribute__(self, '_imported')
+        if module is None:
+            return '<lazy module %r>' % object.__getattribute__(self, 'module')
+        return repr(module)
+
+
+def lazy_import(name):
+    """return the module `name` if it's already imported, else a
+    :class:`LazyModule` proxy importing it when it's first used. Use it in
+    place of an import statement for modules only needed by some code paths:
+
+    >>> optparse = lazy_import('optparse')
+    """
+    try:
+        return sys.modules[name]
+    except KeyError:
+        return LazyModule(name)
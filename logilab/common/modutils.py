@@ -32,24 +32,36 @@ __docformat__ = "restructuredtext en"
 
 import sys
 import os
-from os.path import (splitext, join, abspath, isdir, dirname, exists,
-                     basename, expanduser, normcase, realpath)
-from imp import find_module, load_module, C_BUILTIN, PY_COMPILED, PKG_DIRECTORY
+import re
+import time
+from os.path import (splitext, join, abspath, isabs, isdir, islink, dirname,
+                     exists, basename, expanduser, normcase, realpath)
+from imp import (find_module, load_module, get_suffixes, is_frozen,
+                 C_BUILTIN, PY_COMPILED, PKG_DIRECTORY)
 from distutils.sysconfig import get_config_var, get_python_lib, get_python_version
 from distutils.errors import DistutilsPlatformError
 
-from six import PY3
-from six.moves import map, range
+from six import PY3, string_types
+from six.moves import map, range, builtins
 
 try:
     import zipimport
 except ImportError:
     zipimport = None
 
+try:
+    from os import scandir
+except ImportError:
+    try:
+        from scandir import scandir
+    except ImportError:
+        scandir = None
+
 ZIPFILE = object()
 
 from logilab.common import STD_BLACKLIST, _handle_blacklist
 from logilab.common.deprecation import deprecated
+from logilab.common.lazy import LazyObject, LazyModule, lazy_import
 
 # Notes about STD_LIB_DIR
 # Consider arch-specific installation for STD_LIB_DIR definition
@@ -75,32 +87,214 @@ EXT_LIB_DIR = get_python_lib()
 
 BUILTIN_MODULES = dict.fromkeys(sys.builtin_module_names, True)
 
+_timer = getattr(time, 'perf_counter', time.time)
+
 
 class NoSourceFile(Exception):
     """exception raised when we are not able to get a python
     source file for a precompiled file
     """
 
-class LazyObject(object):
-    def __init__(self, module, obj):
-        self.module = module
-        self.obj = obj
-        self._imported = None
-
+class _LazyTopLevelModule(LazyModule):
+    """Proxy to the top level package of the module `name`, importing the
+    latter when one of its attributes is first accessed, as ``import name``
+    would.
+    """
     def _getobj(self):
-        if self._imported is None:
-           self._imported = getattr(load_module_from_name(self.module),
-                                    self.obj)
-        return self._imported
+        module = object.__getattribute__(self, '_imported')
+        if module is None:
+            name = object.__getattribute__(self, 'module')
+            __import__(name)
+            module = sys.modules[name.split('.')[0]]
+            object.__setattr__(self, '_imported', module)
+        return module
 
-    def __getattribute__(self, attr):
-        try:
-            return super(LazyObject, self).__getattribute__(attr)
-        except AttributeError as ex:
-            return getattr(self._getobj(), attr)
 
-    def __call__(self, *args, **kwargs):
-        return self._getobj()(*args, **kwargs)
+class ImportRecord(object):
+    """Import of module `name` (and of `modules`, e.g. its parent packages)
+    recorded by an :class:`ImportProfiler`.
+
+    `time` is the import duration in seconds, including imports of
+    `children` records, `memory` the memory usage increase in bytes, or None
+    if it couldn't be measured.
+    """
+    def __init__(self, name=None):
+        self.name = name
+        self.modules = []
+        self.time = 0.
+        self.memory = None
+        self.children = []
+
+    @property
+    def self_time(self):
+        """import duration without the time spent importing children"""
+        return self.time - sum(child.time for child in self.children)
+
+    def __repr__(self):
+        return '<ImportRecord %s %.3fms>' % (self.name, self.time * 1000)
+
+
+class ImportProfiler(object):
+    """Context manager recording imports happening while it's active, and
+    the tree of which module imported which:
+
+    .. sourcecode:: python
+
+        with ImportProfiler(lazy=('optparse',)) as profiler:
+            import logilab.common.configuration
+        print(profiler.table())
+
+    Modules whose name is in `lazy` are replaced by a :class:`LazyModule`
+    when imported by a plain `import name` statement. If `memory` is true,
+    memory allocations are traced during imports to get their memory usage
+    increase (python >= 3.4), else the increase of the process' maximum
+    resident set size is used where available.
+
+    Only imports going through the `__import__` builtin are recorded.
+    """
+    def __init__(self, lazy=(), memory=False):
+        self.lazy = frozenset(lazy)
+        self.trace_memory = memory
+        self.root = ImportRecord()
+        self._stack = [self.root]
+        self._import = None
+        self._memory_usage = None
+        self._stop_tracing = False
+
+    def __enter__(self):
+        self._memory_usage = self._memory_function()
+        self._import = builtins.__import__
+        builtins.__import__ = self._profiled_import
+        return self
+
+    def __exit__(self, exctype, value, traceback):
+        builtins.__import__ = self._import
+        if self._stop_tracing:
+            import tracemalloc
+            tracemalloc.stop()
+            self._stop_tracing = False
+
+    def _memory_function(self):
+        if self.trace_memory:
+            try:
+                import tracemalloc
+            except ImportError:
+                pass
+            else:
+                if not tracemalloc.is_tracing():
+                    tracemalloc.start()
+                    self._stop_tracing = True
+                return lambda: tracemalloc.get_traced_memory()[0]
+        try:
+            import resource
+        except ImportError:
+            return lambda: None
+        # ru_maxrss is in kilobytes, except on macOS
+        unit = 1 if sys.platform == 'darwin' else 1024
+        return lambda: resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * unit
+
+    def _profiled_import(self, name, globals=None, locals=None, fromlist=(),
+                         level=0):
+        if (name in self.lazy and not fromlist and level <= 0
+                and name not in sys.modules):
+            if '.' in name:
+                # `import a.b` binds `a`
+                return _LazyTopLevelModule(name)
+            return LazyModule(name)
+        targets = [target for target in _import_targets(name, globals,
+                                                        fromlist, level)
+                   if target not in sys.modules]
+        if not targets:
+            return self._import(name, globals, locals, fromlist, level)
+        record = ImportRecord()
+        parent = self._stack[-1]
+        self._stack.append(record)
+        memory = self._memory_usage()
+        start = _timer()
+        try:
+            return self._import(name, globals, locals, fromlist, level)
+        finally:
+            record.time = _timer() - start
+            if memory is not None:
+                record.memory = self._memory_usage() - memory
+            self._stack.pop()
+            record.modules = [target for target in targets
+                              if target in sys.modules]
+            if record.modules:
+                record.name = record.modules[-1]
+                parent.children.append(record)
+            else:
+                # failed import, or implicit relative import candidate
+                parent.children += record.children
+
+    def records(self, record=None, depth=0):
+        """generate (depth, record) for recorded imports, depth first"""
+        for child in (record or self.root).children:
+            yield depth, child
+            for item in self.records(child, depth + 1):
+                yield item
+
+    def table(self):
+        """return a :class:`logilab.common.table.Table` of recorded imports,
+        module names being indented according to their depth in the imports
+        tree
+        """
+        from logilab.common.table import Table
+        table = Table(default_value='',
+                      col_names=['module', 'time (ms)', 'self (ms)',
+                                 'memory (kB)'])
+        for depth, record in self.records():
+            table.append_row(['  ' * depth + record.name,
+                              '%.3f' % (record.time * 1000),
+                              '%.3f' % (record.self_time * 1000),
+                              '' if record.memory is None
+                              else '%d' % (record.memory // 1024)])
+        return table
+
+    def report(self, title='Imports'):
+        """return a :mod:`logilab.common.ureports` layout of recorded
+        imports
+        """
+        from logilab.common.ureports import Section, Table, Text
+        table = self.table()
+        cells = [Text(name) for name in table.col_names]
+        for row in table:
+            cells += [Text(cell) for cell in row]
+        return Section(title, children=[Table(cols=len(table.col_names),
+                                              rheaders=1, children=cells)])
+
+
+def _import_targets(name, globals, fromlist, level):
+    """return names of the modules which an import may load, first those
+    imported, then those which may be imported from it with `fromlist`
+    """
+    names = []
+    if level != 0 and globals:
+        # relative import
+        package = globals.get('__package__')
+        if package is None:
+            package = globals.get('__name__', '')
+            if '__path__' not in globals:
+                package = package.rpartition('.')[0]
+        if package:
+            if level > 0:
+                bits = package.rsplit('.', level - 1)
+                base = bits[0] if len(bits) >= level else ''
+            else:
+                # python 2 implicit relative import
+                base = package
+            if base:
+                names.append(base + '.' + name if name else base)
+    if level <= 0 and name:
+        names.append(name)
+    targets = []
+    for modname in names:
+        parts = modname.split('.')
+        targets += ['.'.join(parts[:i]) for i in range(1, len(parts) + 1)]
+        for attr in fromlist or ():
+            if attr != '*':
+                targets.append(modname + '.' + attr)
+    return targets
 
 
 def load_module_from_name(dotted_name, path=None, use_sys=True):
@@ -387,7 +581,7 @@ def get_module_part(dotted_name, context_file=None):
     return dotted_name
 
 
-def get_modules(package, src_directory, blacklist=STD_BLACKLIST):
+def get_modules(package, src_directory, blacklist=STD_BLACKLIST, workers=0):
     """given a package directory return a list of all available python
     modules in the package and its subpackages
 
@@ -403,31 +597,36 @@ def get_modules(package, src_directory, blacklist=STD_BLACKLIST):
       optional list of files or directory to ignore, default to
       the value of `logilab.common.STD_BLACKLIST`
 
+    :type workers: int
+    :param workers:
+      number of threads listing directories concurrently, which may help on
+      network filesystems, default to 0 (no thread)
+
     :rtype: list
     :return:
       the list of all available python modules in the package and its
       subpackages
     """
-    modules = []
-    for directory, dirnames, filenames in os.walk(src_directory):
-        _handle_blacklist(blacklist, dirnames, filenames)
-        # check for __init__.py
-        if not '__init__.py' in filenames:
-            dirnames[:] = ()
-            continue
+    return list(walk_modules(package, src_directory, blacklist, workers))
+
+
+def walk_modules(package, src_directory, blacklist=STD_BLACKLIST, workers=0):
+    """generate the same module names as :func:`get_modules`, while walking
+    the package directory
+    """
+    for directory, filenames in walk_packages(src_directory, blacklist,
+                                              workers):
         if directory != src_directory:
             dir_package = directory[len(src_directory):].replace(os.sep, '.')
-            modules.append(package + dir_package)
+            yield package + dir_package
         for filename in filenames:
             if _is_python_file(filename) and filename != '__init__.py':
                 src = join(directory, filename)
                 module = package + src[len(src_directory):-3]
-                modules.append(module.replace(os.sep, '.'))
-    return modules
+                yield module.replace(os.sep, '.')
 
 
-
-def get_module_files(src_directory, blacklist=STD_BLACKLIST):
+def get_module_files(src_directory, blacklist=STD_BLACKLIST, workers=0):
     """given a package directory return a list of all available python
     module's files in the package and its subpackages
 
@@ -440,23 +639,134 @@ def get_module_files(src_directory, blacklist=STD_BLACKLIST):
       optional list of files or directory to ignore, default to the value of
       `logilab.common.STD_BLACKLIST`
 
+    :type workers: int
+    :param workers:
+      number of threads listing directories concurrently, which may help on
+      network filesystems, default to 0 (no thread)
+
     :rtype: list
     :return:
       the list of all available python module's files in the package and
       its subpackages
     """
-    files = []
-    for directory, dirnames, filenames in os.walk(src_directory):
-        _handle_blacklist(blacklist, dirnames, filenames)
-        # check for __init__.py
-        if not '__init__.py' in filenames:
-            dirnames[:] = ()
-            continue
+    return list(walk_module_files(src_directory, blacklist, workers))
+
+
+def walk_module_files(src_directory, blacklist=STD_BLACKLIST, workers=0):
+    """generate the same file paths as :func:`get_module_files`, while
+    walking the package directory
+    """
+    for directory, filenames in walk_packages(src_directory, blacklist,
+                                              workers):
         for filename in filenames:
             if _is_python_file(filename):
-                src = join(directory, filename)
-                files.append(src)
-    return files
+                yield join(directory, filename)
+
+
+def walk_packages(src_directory, blacklist=STD_BLACKLIST, workers=0,
+                  followlinks=False):
+    """walk the package directory `src_directory` top-down like `os.walk`,
+    not descending into directories without an `__init__.py` file, and
+    generate (directory, file names) for each package directory.
+
+    Directories are listed using `os.scandir` when available, so that no
+    additional system call is needed to know whether an entry is a
+    directory. If `workers` is greater than 0, subdirectories are listed
+    concurrently by as many threads, ahead of the walk.
+
+    :type blacklist: list or tuple
+    :param blacklist:
+      optional list of files or directory to ignore, default to the value of
+      `logilab.common.STD_BLACKLIST`
+
+    :type followlinks: bool
+    :param followlinks:
+      whether to descend into symbolic links to directories
+    """
+    if not workers:
+        return _walk_packages(src_directory, blacklist, followlinks,
+                              _scan_directory)
+    return _walk_packages_threaded(src_directory, blacklist, followlinks,
+                                   workers)
+
+
+def _walk_packages_threaded(src_directory, blacklist, followlinks, workers):
+    from multiprocessing.pool import ThreadPool
+    pool = ThreadPool(workers)
+    pending = {}
+    def scan(directory, followlinks):
+        try:
+            result = pending.pop(directory)
+        except KeyError:
+            result = _scan_directory(directory, followlinks)
+        else:
+            result = result.get()
+        dirnames, filenames = result
+        if '__init__.py' in filenames:
+            # list subdirectories ahead of the walk
+            for dirname in dirnames:
+                if dirname not in blacklist:
+                    subdirectory = join(directory, dirname)
+                    pending[subdirectory] = pool.apply_async(
+                        _scan_directory, (subdirectory, followlinks))
+        return result
+    try:
+        for item in _walk_packages(src_directory, blacklist, followlinks, scan):
+            yield item
+    finally:
+        pool.terminate()
+
+
+def _walk_packages(directory, blacklist, followlinks, scan):
+    dirnames, filenames = scan(directory, followlinks)
+    _handle_blacklist(blacklist, dirnames, filenames)
+    # check for __init__.py
+    if not '__init__.py' in filenames:
+        return
+    yield directory, filenames
+    for dirname in dirnames:
+        for item in _walk_packages(join(directory, dirname), blacklist,
+                                   followlinks, scan):
+            yield item
+
+
+def _scan_directory(directory, followlinks):
+    """return names of subdirectories to walk and of files in `directory`,
+    like `os.walk`
+    """
+    dirnames, filenames = [], []
+    try:
+        entries = _list_directory(directory)
+    except OSError:
+        pass # like os.walk, ignore unreadable directories
+    else:
+        for name, is_dir, is_link in entries:
+            if not is_dir:
+                filenames.append(name)
+            elif followlinks or not is_link:
+                dirnames.append(name)
+    return dirnames, filenames
+
+
+def _list_directory(directory):
+    """return a list of (name, is directory, is symbolic link) for entries of
+    `directory`, using `os.scandir` to avoid additional system calls when
+    available
+    """
+    if scandir is None:
+        result = []
+        for name in os.listdir(directory):
+            path = join(directory, name)
+            result.append((name, isdir(path), islink(path)))
+        return result
+    result = []
+    for entry in scandir(directory):
+        try:
+            is_dir = entry.is_dir()
+        except OSError:
+            is_dir = False
+        result.append((entry.name, is_dir, entry.is_symlink()))
+    return result
 
 
 def get_source_file(filename, include_no_ext=False):
@@ -536,8 +846,16 @@ def is_standard_module(modname, std_path=(STD_LIB_DIR,)):
 
     Note: this function is known to return wrong values when inside virtualenv.
     See https://www.logilab.org/ticket/294756.
+
+    With the default `std_path`, the answer is usually found in a table of
+    the standard modules of the running interpreter, built once per process
+    (see :func:`standard_modules_table`).
     """
     modname = modname.split('.')[0]
+    if tuple(std_path) == (STD_LIB_DIR,):
+        result = _is_standard_from_table(modname)
+        if result is not None:
+            return result
     try:
         filename = file_from_modpath([modname])
     except ImportError as ex:
@@ -559,6 +877,171 @@ def is_standard_module(modname, std_path=(STD_LIB_DIR,)):
 
 
 
+# standard modules table ######################################################
+
+# only needed to build or load the table
+json = lazy_import('json')
+hashlib = lazy_import('hashlib')
+
+# {(sys.path, current directory): (abspaths of sys.path entries, {absolute
+#  directory: index in sys.path}) or None if the table can't be used}
+_SYS_PATH_LAYOUTS = {}
+_STANDARD_TABLE = []
+
+# directory where the standard modules table is kept between runs, taken from
+# the LOGILAB_STDLIB_TABLE_DIR environment variable. If None, the table is
+# only kept in memory.
+STD_TABLE_DIR = os.environ.get('LOGILAB_STDLIB_TABLE_DIR') or None
+
+# files and directories which can't be imported (e.g. python-config.py) are
+# left out of the table
+_MODULE_NAME_RGX = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+
+def standard_modules_table(cachedir=None):
+    """return a dictionary {module name: directory} of the top level modules
+    and packages found in the standard library directory (`STD_LIB_DIR`) and
+    its non package subdirectories (e.g. lib-dynload), the site-packages
+    directory (`EXT_LIB_DIR`) excepted, or None if `STD_LIB_DIR` doesn't
+    exist.
+
+    If `cachedir` (by default `STD_TABLE_DIR`) isn't None, the table is kept
+    in a JSON file into this directory and built again when the interpreter
+    or any of these directories changes. Else it is built on each call.
+    """
+    table = _standard_table(cachedir)
+    return table and table['modules']
+
+
+def _standard_table(cachedir=None):
+    """return the standard modules table as a dictionary with 'modules' and
+    'directories' (scanned directories and their modification date) keys,
+    see `standard_modules_table`
+    """
+    if cachedir is None:
+        cachedir = STD_TABLE_DIR
+    stdlib = abspath(STD_LIB_DIR)
+    if not isdir(stdlib):
+        return None
+    interpreter = [sys.executable, sys.version, stdlib, abspath(EXT_LIB_DIR)]
+    if cachedir is not None:
+        tablepath = join(cachedir, 'stdlib-%s.json' % hashlib.sha1(
+            repr(interpreter).encode('utf-8')).hexdigest()[:16])
+        try:
+            with open(tablepath) as stream:
+                table = json.load(stream)
+        except (IOError, OSError, ValueError):
+            pass
+        else:
+            if (table.get('interpreter') == interpreter
+                    and _mtimes_unchanged(table['directories'])):
+                return table
+    directories = {stdlib: _mtime(stdlib)}
+    modules = {}
+    for name, is_dir, is_link in sorted(_list_directory(stdlib)):
+        path = join(stdlib, name)
+        if (is_dir and name != '__pycache__'
+                and not path.startswith(abspath(EXT_LIB_DIR))
+                and _has_init(path) is None):
+            directories[path] = _mtime(path)
+    # modules of the standard library directory itself come first
+    for directory in sorted(directories, key=lambda x: (x != stdlib, x)):
+        for name, is_dir, is_link in _list_directory(directory):
+            if is_dir:
+                if _has_init(join(directory, name)) is None:
+                    continue
+            else:
+                for suffix in _SUFFIXES:
+                    if name.endswith(suffix):
+                        name = name[:-len(suffix)]
+                        break
+                else:
+                    continue
+            if _MODULE_NAME_RGX.match(name):
+                modules.setdefault(name, directory)
+    table = {'interpreter': interpreter, 'directories': directories,
+             'modules': modules}
+    if cachedir is None:
+        return table
+    try:
+        if not isdir(cachedir):
+            os.makedirs(cachedir)
+        with open(tablepath, 'w') as stream:
+            json.dump(table, stream)
+    except (IOError, OSError):
+        pass # read-only file system, the table will be built again
+    return table
+
+
+def _is_standard_from_table(modname):
+    """return True or False if the standard modules table tells whether
+    `modname` is a standard module as `is_standard_module` would, or None if
+    it can't
+    """
+    if (modname in BUILTIN_MODULES and not _is_namespace(modname)):
+        # builtin modules are found before looking at sys.path
+        return True
+    if modname == 'xml' or _is_namespace(modname) or is_frozen(modname):
+        return None
+    if not _STANDARD_TABLE:
+        _STANDARD_TABLE.append(_standard_table())
+    table = _STANDARD_TABLE[0]
+    if table is None:
+        return None
+    layout = _sys_path_layout(table)
+    if layout is None:
+        return None
+    abspaths, indexes = layout
+    directory = table['modules'].get(modname)
+    if directory is None:
+        # every standard directory in sys.path is in the table
+        return False
+    try:
+        index = indexes[directory]
+    except KeyError:
+        return None
+    # ensure the module isn't shadowed by a module of a previous entry
+    for entry in abspaths[:index]:
+        mtime = _mtime(entry)
+        if mtime is None:
+            continue
+        names = _directory_modules(entry, mtime)
+        if names is None or modname in names:
+            return None
+    return True
+
+
+def _sys_path_layout(table):
+    """return (abspaths of sys.path entries, {directory: index in sys.path})
+    if all standard directories in sys.path are known to the table, else
+    None
+    """
+    key = (tuple(sys.path), os.getcwd())
+    try:
+        return _SYS_PATH_LAYOUTS[key]
+    except KeyError:
+        pass
+    directories = table['directories']
+    stdlib, extlib = abspath(STD_LIB_DIR), abspath(EXT_LIB_DIR)
+    abspaths = []
+    indexes = {}
+    layout = (abspaths, indexes)
+    for entry in sys.path:
+        if not isinstance(entry, string_types):
+            layout = None
+            break
+        entry = abspath(entry)
+        if (entry.startswith(stdlib) and not entry.startswith(extlib)
+                and entry not in directories and exists(entry)):
+            # standard directory unknown to the table
+            layout = None
+            break
+        indexes.setdefault(entry, len(abspaths))
+        abspaths.append(entry)
+    _SYS_PATH_LAYOUTS[key] = layout
+    return layout
+
+
 def is_relative(modname, from_file):
     """return true if the given module name is relative to the given
     file name
@@ -652,6 +1135,35 @@ def _module_file(modpath, path=None):
     :rtype: tuple(int, str)
     :return: the module type flag and the file path for a module
     """
+    if _is_namespace(modpath[0]) and modpath[0] in sys.modules:
+        # depends on sys.modules content, don't cache
+        return _resolve_module_file(modpath, path, {})
+    # relative directories in path depend on the current directory
+    key = (tuple(modpath), path if path is None else tuple(path),
+           tuple(sys.path), os.getcwd())
+    try:
+        result, consulted = _MODULE_FILE_CACHE[key]
+    except KeyError:
+        pass
+    else:
+        if _mtimes_unchanged(consulted):
+            if isinstance(result, ImportError):
+                raise ImportError(*result.args)
+            return result
+    consulted = {}
+    try:
+        result = _resolve_module_file(list(modpath), path, consulted)
+    except ImportError as ex:
+        _MODULE_FILE_CACHE[key] = (ex, consulted)
+        raise
+    _MODULE_FILE_CACHE[key] = (result, consulted)
+    return result
+
+
+def _resolve_module_file(modpath, path, consulted):
+    """uncached implementation of `_module_file`, filling `consulted` with
+    {path: modification date} of directories and files the result depends on
+    """
     # egg support compat
     try:
         pic = sys.path_importer_cache
@@ -688,14 +1200,17 @@ def _module_file(modpath, path=None):
         # >>> imp.find_module('posix')
         # (None, None, ('', '', 6))
         try:
-            _, mp_filename, mp_desc = find_module(modname, path)
+            _, mp_filename, mp_desc = _find_module(modname, path, consulted)
         except ImportError:
             if checkeggs:
+                _record_mtimes(consulted, [filepath for filepath, importer
+                                           in pic.items()
+                                           if importer is not None])
                 return _search_zip(modpath, pic)[:2]
             raise
         else:
             if checkeggs and mp_filename:
-                fullabspath = [abspath(x) for x in _path]
+                fullabspath = _abspaths(_path)
                 try:
                     pathindex = fullabspath.index(dirname(abspath(mp_filename)))
                     emtype, emp_filename, zippath = _search_zip(modpath, pic)
@@ -731,6 +1246,112 @@ def _module_file(modpath, path=None):
                     path = [mp_filename]
     return mtype, mp_filename
 
+
+# module resolution cache ######################################################
+
+# {(modpath, path, sys.path, cwd): (result or ImportError, {path: mdate})}
+_MODULE_FILE_CACHE = {}
+# {directory: (modification date, set of names of modules it may hold)}
+_DIRECTORY_INDEX = {}
+# {(path, current directory): absolute paths}
+_ABSPATHS = {}
+_SUFFIXES = tuple(suffix for suffix, mode, mtype in get_suffixes())
+
+
+def clear_resolution_cache():
+    """clear the cache of module file resolution, which is otherwise
+    invalidated when modification dates of directories it depends on change
+    """
+    _MODULE_FILE_CACHE.clear()
+    _DIRECTORY_INDEX.clear()
+    _ABSPATHS.clear()
+    _SYS_PATH_LAYOUTS.clear()
+    del _STANDARD_TABLE[:]
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
+
+
+def _record_mtimes(consulted, paths):
+    for path in paths:
+        if path not in consulted:
+            consulted[path] = _mtime(path)
+
+
+def _mtimes_unchanged(consulted):
+    for path, mtime in consulted.items():
+        if _mtime(path) != mtime:
+            return False
+    return True
+
+
+def _abspaths(path):
+    key = (tuple(path), os.getcwd())
+    try:
+        return _ABSPATHS[key]
+    except KeyError:
+        result = _ABSPATHS[key] = [abspath(x) for x in path]
+        return result
+
+
+def _directory_modules(directory, mtime):
+    """return names of modules and packages which may be found in
+    `directory` whose modification date is `mtime`, or None if it can't be
+    listed
+    """
+    try:
+        index_mtime, names = _DIRECTORY_INDEX[directory]
+    except KeyError:
+        pass
+    else:
+        if index_mtime == mtime:
+            return names
+    try:
+        filenames = os.listdir(directory)
+    except (OSError, TypeError):
+        names = None
+    else:
+        names = set(filenames)
+        for filename in filenames:
+            for suffix in _SUFFIXES:
+                if filename.endswith(suffix):
+                    names.add(filename[:-len(suffix)])
+    _DIRECTORY_INDEX[directory] = (mtime, names)
+    return names
+
+
+def _find_module(modname, path, consulted):
+    """`imp.find_module` equivalent, only searching directories of `path`
+    (sys.path if None) which may hold `modname` according to their index,
+    recording their modification dates into `consulted`
+    """
+    if path is None:
+        if modname in BUILTIN_MODULES or is_frozen(modname):
+            return find_module(modname)
+        path = sys.path
+    candidates = []
+    for entry in path:
+        if not isinstance(entry, string_types):
+            candidates.append(entry)
+            continue
+        directory = entry if isabs(entry) else abspath(entry)
+        mtime = consulted.get(directory)
+        if mtime is None:
+            mtime = consulted[directory] = _mtime(directory)
+        if mtime is None:
+            continue
+        names = _directory_modules(directory, mtime)
+        if names is None or modname in names:
+            candidates.append(entry)
+    if not candidates:
+        raise ImportError('No module named %s' % modname)
+    return find_module(modname, candidates)
+
+
 def _is_python_file(filename):
     """return true if the given filename should be considered as a python file
 
@@ -746,8 +1367,17 @@ def _has_init(directory):
     """if the given directory has a valid __init__ file, return its path,
     else return None
     """
+    absdirectory = directory if isabs(directory) else abspath(directory)
+    mtime = _mtime(absdirectory)
+    if mtime is None:
+        return None
+    # use the directory index rather than checking each possible file
+    names = _directory_modules(absdirectory, mtime)
     mod_or_pack = join(directory, '__init__')
     for ext in PY_SOURCE_EXTS + ('pyc', 'pyo'):
-        if exists(mod_or_pack + '.' + ext):
+        if names is None:
+            if exists(mod_or_pack + '.' + ext):
+                return mod_or_pack + '.' + ext
+        elif '__init__.' + ext in names:
             return mod_or_pack + '.' + ext
     return None
@@ -108,10 +108,14 @@ logilab-pytest path/to/mytests.py -m '(not long and database) or regr'
 
 logilab-pytest one (will run both test_thisone and test_thatone)
 logilab-pytest path/to/mytests.py -s not (will skip test_notthisone)
+logilab-pytest --changed-since HEAD (only run tests affected by uncommitted changes)
 """
 
 ENABLE_DBC = False
 FILE_RESTART = ".pytest.restart"
+FILE_DURATIONS = ".pytest.durations"
+FILE_COLLECTION = ".pytest.collection"
+FILE_IMPORTS = ".pytest.imports"
 
 import os, sys, re
 import os.path as osp
@@ -124,6 +128,8 @@ from inspect import isgeneratorfunction, isclass
 from random import shuffle
 from itertools import dropwhile
 
+from six import StringIO
+
 from logilab.common.deprecation import deprecated
 from logilab.common.fileutils import abspath_listdir
 from logilab.common import textutils
@@ -205,9 +211,17 @@ class GlobalTestReport(object):
         self.ctime = 0
         self.modulescount = 0
         self.errmodules = []
+        # {filename: duration}
+        self.filedurations = {}
+        # {filename: {test id: duration}}
+        self.testdurations = {}
+        # {filename: [(test name, tags, generative)]}, see `collect_tests`
+        self.collected = {}
 
     def feed(self, filename, testresult, ttime, ctime):
         """integrates new test information into internal statistics"""
+        self.filedurations[filename] = ttime
+        self.testdurations[filename] = dict(getattr(testresult, 'durations', ()))
         ran = testresult.testsRun
         self.ran += ran
         self.skipped += len(getattr(testresult, 'skipped', ()))
@@ -285,21 +299,640 @@ def remove_local_modules_from_sys(testdir):
 
 
 
+# a test is considered to regress when it is this much slower than on the
+# previous run, and at least by this delay (in seconds)
+REGRESSION_RATIO = 2
+REGRESSION_MIN_DELAY = 0.1
+
+class TestDurations(object):
+    """durations of test files and test cases, persisted across runs in a
+    JSON file::
+
+      {"files": {filename: duration},
+       "tests": {filename: {test id: duration}}}
+    """
+
+    def __init__(self, path):
+        self.path = path
+        import json
+        try:
+            with open(path) as stream:
+                data = json.load(stream)
+        except (IOError, OSError, ValueError):
+            data = {}
+        self.files = data.get('files', {})
+        self.tests = data.get('tests', {})
+
+    def longest_first(self, filenames):
+        """return `filenames` sorted from the longest to the shortest to test,
+        unknown ones first since they may be long ones
+        """
+        files = self.files
+        return sorted(filenames,
+                      key=lambda filename: -files.get(filename, float('inf')))
+
+    def regressions(self, tests):
+        """return a list of (test id, previous duration, duration) for tests
+        of the given {filename: {test id: duration}} dictionary that are
+        noticeably slower than on the previous run, slowest first
+        """
+        regressions = []
+        for filename, durations in tests.items():
+            previous = self.tests.get(filename, {})
+            for testid, duration in durations.items():
+                before = previous.get(testid)
+                if (before is not None and duration > before * REGRESSION_RATIO
+                    and duration - before > REGRESSION_MIN_DELAY):
+                    regressions.append((testid, before, duration))
+        return sorted(regressions, key=lambda info: -info[2])
+
+    def update(self, files, tests):
+        """record durations of a run, given {filename: duration} and
+        {filename: {test id: duration}} dictionaries
+        """
+        self.files.update(files)
+        self.tests.update(tests)
+
+    def save(self):
+        import json
+        try:
+            with open(self.path, 'w') as stream:
+                json.dump({'files': self.files, 'tests': self.tests}, stream)
+        except (IOError, OSError):
+            print("Error while saving test durations into",
+                  osp.abspath(self.path), file=sys.__stderr__)
+
+
+def _file_hash(path):
+    import hashlib
+    with open(path, 'rb') as stream:
+        return hashlib.sha1(stream.read()).hexdigest()
+
+class TestCollection(object):
+    """tests found in test files, persisted across runs in a JSON file::
+
+      {filename: {"mtime": modification time, "hash": sha1 of the content,
+                  "tests": [[test name, [tags], generative]]}}
+
+    so that test files holding no test selected by the command line may be
+    skipped without being imported.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        import json
+        try:
+            with open(path) as stream:
+                self.files = json.load(stream)
+        except (IOError, OSError, ValueError):
+            self.files = {}
+
+    def tests(self, filename):
+        """return the list of (test name, tags, generative) of `filename`, or
+        None if it is unknown or has been modified since it was collected
+        """
+        entry = self.files.get(filename)
+        if entry is None:
+            return None
+        try:
+            mtime = os.stat(filename).st_mtime
+            if mtime != entry['mtime']:
+                # touched, but maybe not modified
+                if _file_hash(filename) != entry['hash']:
+                    return None
+                entry['mtime'] = mtime
+        except (IOError, OSError):
+            return None
+        return entry['tests']
+
+    def update(self, filename, tests):
+        """record the list of (test name, tags, generative) of `filename`"""
+        try:
+            self.files[filename] = {'mtime': os.stat(filename).st_mtime,
+                                    'hash': _file_hash(filename),
+                                    'tests': tests}
+        except (IOError, OSError):
+            self.files.pop(filename, None)
+
+    def save(self):
+        import json
+        try:
+            with open(self.path, 'w') as stream:
+                json.dump(self.files, stream)
+        except (IOError, OSError):
+            print("Error while saving test collection into",
+                  osp.abspath(self.path), file=sys.__stderr__)
+
+
+def collect_tests(module):
+    """return a list of (test name, tags, generative) for each test method of
+    `module`, where test name is 'ClassName.method_name'.
+
+    Return None if the module's tests can't be described that way (it defines
+    a suite or holds tests which aren't :class:`testlib.TestCase` methods).
+    """
+    if callable(getattr(module, 'suite', None)):
+        return None
+    collected = []
+    tests = [NonStrictTestLoader().loadTestsFromModule(module)]
+    while tests:
+        test = tests.pop(0)
+        if isinstance(test, unittest.TestSuite):
+            tests[:0] = list(test)
+            continue
+        if not isinstance(test, testlib.TestCase):
+            return None
+        meth = test._get_test_method()
+        tags = getattr(meth, 'tags', testlib.Tags())
+        if tags.inherit:
+            tags = tags | getattr(test.__class__, 'tags', testlib.Tags())
+        collected.append(['%s.%s' % (test.__class__.__name__, test._testMethodName),
+                          sorted(tags), isgeneratorfunction(meth)])
+    return collected
+
+
+def _project_files(directory, extension=''):
+    """return absolute paths of files below `directory` ending with
+    `extension`, ignoring STD_BLACKLIST directories
+    """
+    for dirname, dirs, files in os.walk(osp.abspath(directory)):
+        dirs[:] = [subdir for subdir in dirs if subdir not in STD_BLACKLIST]
+        for filename in files:
+            if filename.endswith(extension):
+                yield osp.join(dirname, filename)
+
+def module_imports(filename):
+    """return a list of [module name, level, [imported names]] for each
+    import statement of python file `filename`, where level is the number of
+    leading dots of relative imports
+    """
+    import ast
+    try:
+        with open(filename, 'rb') as stream:
+            with warnings.catch_warnings():
+                # don't report invalid escape sequences and the like
+                warnings.simplefilter('ignore')
+                tree = ast.parse(stream.read(), filename)
+    except (IOError, OSError, SyntaxError, TypeError, ValueError):
+        return []
+    imports = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            imports += [[alias.name, 0, []] for alias in node.names]
+        elif isinstance(node, ast.ImportFrom):
+            imports.append([node.module or '', node.level or 0,
+                            [alias.name for alias in node.names
+                             if alias.name != '*']])
+    return imports
+
+def _imported_files(filename, modname, level, names):
+    """return the set of files of modules and packages which may be loaded by
+    an import statement of `filename` (see `module_imports`)
+    """
+    from logilab.common.modutils import file_from_modpath
+    parts = modname and modname.split('.') or []
+    files = set()
+    if level:
+        directory = osp.dirname(filename)
+        for _ in range(level - 1):
+            directory = osp.dirname(directory)
+        path, context = [directory], None
+        if osp.isfile(osp.join(directory, '__init__.py')):
+            files.add(osp.join(directory, '__init__.py'))
+    else:
+        path, context = None, filename
+    # importing a module loads its parent packages
+    for i in range(len(parts)):
+        try:
+            files.add(file_from_modpath(parts[:i+1], path, context))
+        except ImportError:
+            break
+    else:
+        # imported names may be modules too
+        for name in names:
+            try:
+                files.add(file_from_modpath(parts + [name], path, context))
+            except ImportError:
+                continue
+    return set(osp.abspath(filename) for filename in files if filename)
+
+
+class ImportGraph(object):
+    """python files of a project and the project files they import, persisted
+    across runs in a JSON file::
+
+      {filename: {"mtime": modification time,
+                  "imports": [[module name, level, [imported names]]],
+                  "files": [imported project files]}}
+
+    Updating the graph only parses files modified since the previous update,
+    and imports are only resolved again when files have been added or removed.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        import json
+        try:
+            with open(path) as stream:
+                self.files = json.load(stream)
+        except (IOError, OSError, ValueError):
+            self.files = {}
+
+    def update(self, directory):
+        """update the graph according to python files found below
+        `directory`
+        """
+        files = {}
+        for filename in _project_files(directory, '.py'):
+            try:
+                mtime = os.stat(filename).st_mtime
+            except OSError:
+                continue
+            entry = self.files.get(filename)
+            if entry is None or entry['mtime'] != mtime:
+                entry = {'mtime': mtime, 'imports': module_imports(filename),
+                         'files': None}
+            files[filename] = entry
+        resolve_all = set(files) != set(self.files)
+        # modutils registers directories it searches into
+        # sys.path_importer_cache, which prevents python 3 from importing
+        # modules from them afterwards
+        importers = set(sys.path_importer_cache)
+        try:
+            for filename, entry in files.items():
+                if resolve_all or entry['files'] is None:
+                    imported = set()
+                    for modname, level, names in entry['imports']:
+                        imported |= _imported_files(filename, modname, level,
+                                                    names)
+                    entry['files'] = sorted(imported.intersection(files))
+        finally:
+            for path in set(sys.path_importer_cache) - importers:
+                del sys.path_importer_cache[path]
+        self.files = files
+
+    def dependents(self, filenames):
+        """return the set of `filenames` and of project files importing one
+        of them, even indirectly
+        """
+        from logilab.common.graph import get_reachable
+        importers = {}
+        for filename, entry in self.files.items():
+            for imported in entry['files'] or ():
+                importers.setdefault(imported, []).append(filename)
+        return get_reachable(importers, filenames)
+
+    def save(self):
+        import json
+        try:
+            with open(self.path, 'w') as stream:
+                json.dump(self.files, stream)
+        except (IOError, OSError):
+            print("Error while saving import graph into",
+                  osp.abspath(self.path), file=sys.__stderr__)
+
+
+def _command_output(command, cwd):
+    """return lines printed by `command` run from `cwd`, or None if it failed
+    """
+    from subprocess import Popen, PIPE
+    try:
+        process = Popen(command, cwd=cwd, stdout=PIPE, stderr=PIPE)
+    except OSError:
+        return None
+    output = process.communicate()[0]
+    if process.returncode:
+        return None
+    if not isinstance(output, str):
+        output = output.decode(sys.getfilesystemencoding() or 'utf-8')
+    return output.splitlines()
+
+def changed_files(since, directory):
+    """return the set of absolute paths of files below `directory` changed
+    since `since`, either a timestamp or a revision of the git or mercurial
+    repository holding `directory`.
+
+    :raise ValueError: if `since` is neither a timestamp nor a known revision
+    """
+    try:
+        timestamp = float(since)
+    except ValueError:
+        pass
+    else:
+        changed = set()
+        for filename in _project_files(directory):
+            try:
+                if os.stat(filename).st_mtime > timestamp:
+                    changed.add(filename)
+            except OSError:
+                continue
+        return changed
+    for rootcmd, commands in (
+            (['git', 'rev-parse', '--show-toplevel'],
+             (['git', 'diff', '--name-only', since, '--'],
+              ['git', 'ls-files', '--others', '--exclude-standard'])),
+            (['hg', 'root'],
+             (['hg', 'status', '--no-status', '--rev', since],))):
+        root = _command_output(rootcmd, directory)
+        if not root:
+            continue
+        root = root[0].strip()
+        changed = set()
+        for command in commands:
+            output = _command_output(command, root)
+            if output is None:
+                raise ValueError('unknown revision %r' % since)
+            changed.update(osp.normpath(osp.join(root, filename))
+                           for filename in output if filename)
+        # express paths from `directory`, which may be a symbolic link
+        realdir = osp.realpath(directory)
+        relpaths = [osp.relpath(osp.realpath(filename), realdir)
+                    for filename in changed]
+        return set(osp.join(osp.abspath(directory), relpath)
+                   for relpath in relpaths
+                   if relpath.split(os.sep)[0] != os.pardir)
+    raise ValueError('%r is not a timestamp and %s is not in a git or '
+                     'mercurial repository' % (since, directory))
+
+
+def slowest_tests(tests, count):
+    """return a list of the `count` slowest (test id, duration) of the given
+    {filename: {test id: duration}} dictionary
+    """
+    durations = [item for filedurations in tests.values()
+                 for item in filedurations.items()]
+    return sorted(durations, key=lambda item: -item[1])[:count]
+
+
+class _TestFileResult(object):
+    """picklable summary of a test result, sent by worker processes to be
+    fed to the main process' :class:`GlobalTestReport`
+    """
+
+    def __init__(self, result):
+        self.testsRun = result.testsRun
+        self.failures = [(str(test), err) for test, err in result.failures]
+        self.errors = [(str(test), err) for test, err in result.errors]
+        self.skipped = [(str(test), str(reason))
+                        for test, reason in getattr(result, 'skipped', ())]
+        self.durations = list(getattr(result, 'durations', ()))
+        self.successful = result.wasSuccessful()
+
+    def wasSuccessful(self):
+        return self.successful
+
+
+# tester used by a worker process
+_WORKER_TESTER = None
+
+def _init_worker(testercls, cvg, options):
+    global _WORKER_TESTER
+    _WORKER_TESTER = testercls(cvg, options)
+
+def _worker_testfile(filename):
+    """run `filename` in a worker process and return a tuple
+    (filename, status, result, ttime, ctime, output, collected tests)
+
+    where status is one of 'ok' (result is then a :class:`_TestFileResult`),
+    'skipped', 'error' (module couldn't be tested) or 'exit' (result is then
+    the exit code).
+    """
+    tester = _WORKER_TESTER
+    tester.report = report = GlobalTestReport()
+    # capture the whole output so that it may be printed at once
+    output = StringIO()
+    stdout, stderr, __stderr__ = sys.stdout, sys.stderr, sys.__stderr__
+    sys.stdout = sys.stderr = sys.__stderr__ = output
+    modules = sys.modules.copy()
+    try:
+        try:
+            prog = tester.testfile(filename, batchmode=True)
+        except SystemExit as exc:
+            return filename, 'exit', exc.code, 0, 0, output.getvalue(), None
+    finally:
+        sys.stdout, sys.stderr, sys.__stderr__ = stdout, stderr, __stderr__
+        # isolate test modules from the ones of the next file
+        remove_local_modules_from_sys(osp.dirname(filename))
+        for modname, module in modules.items():
+            sys.modules.setdefault(modname, module)
+    if prog is None:
+        status = report.errors and 'error' or 'skipped'
+        return filename, status, None, 0, 0, output.getvalue(), None
+    return (filename, 'ok', _TestFileResult(prog.result), report.ttime,
+            report.ctime, output.getvalue(), report.collected.get(filename))
+
+
 class PyTester(object):
     """encapsulates testrun logic"""
 
+    # file where test durations are kept across runs, see `TestDurations`
+    durations_file = FILE_DURATIONS
+    # file where tests found in test files are kept across runs, see
+    # `TestCollection`
+    collection_file = FILE_COLLECTION
+    # file where the import graph of the project is kept across runs, see
+    # `ImportGraph`
+    imports_file = FILE_IMPORTS
+
     def __init__(self, cvg, options):
         self.report = GlobalTestReport()
         self.cvg = cvg
         self.options = options
         self.firstwrite = True
         self._errcode = None
+        self._affected = None
 
     def show_report(self):
         """prints the report and returns appropriate exitcode"""
         # everything has been ran, print report
         print("*" * 79)
         print(self.report)
+        # only keep files across runs for options using them
+        if self.using_durations():
+            self.record_durations()
+        if self.filtering():
+            self.record_collection()
+
+    def using_durations(self):
+        """return true if command line options use durations of previous
+        runs or report durations
+        """
+        options = self.options
+        return bool(getattr(options, 'durations', None)
+                    or getattr(options, 'longest_first', False)
+                    or self.jobs > 1)
+
+    def record_collection(self):
+        """save tests found in the test files that have been ran"""
+        if not self.report.collected:
+            return
+        collection = TestCollection(self.collection_file)
+        for filename, tests in self.report.collected.items():
+            collection.update(filename, tests)
+        collection.save()
+
+    def filtering(self):
+        """return true if command line options select some tests only"""
+        options = self.options
+        return bool(getattr(options, 'tags_pattern', None)
+                    or getattr(options, 'skipped', None)
+                    or getattr(options, 'test_pattern', None))
+
+    def is_selected(self, name, tags, generative=False):
+        """return true if the test named `name` ('ClassName.method_name') with
+        the given tags may be selected by command line options. Like the test
+        runner does, patterns only apply to inner tests of generative ones.
+        """
+        options = self.options
+        tags_pattern = getattr(options, 'tags_pattern', None)
+        if tags_pattern and not testlib.Tags(*tags).match(tags_pattern):
+            return False
+        if generative:
+            return True
+        skipped = getattr(options, 'skipped', None)
+        if skipped and any(pattern.strip() in name
+                           for pattern in skipped.split(', ')):
+            return False
+        test_pattern = getattr(options, 'test_pattern', None)
+        if test_pattern and test_pattern not in name:
+            return False
+        return True
+
+    def select_testfiles(self, filenames):
+        """return the test files among `filenames` which may hold tests
+        selected by command line options, according to tests previously
+        found in them. Unknown or modified files are always selected.
+        """
+        if getattr(self.options, 'changed_since', None):
+            filenames = self.changed_testfiles(filenames)
+        if not self.filtering():
+            return filenames
+        collection = TestCollection(self.collection_file)
+        selected = []
+        for filename in filenames:
+            tests = collection.tests(filename)
+            if tests is None or any(self.is_selected(*test) for test in tests):
+                selected.append(filename)
+        return selected
+
+    def changed_testfiles(self, filenames):
+        """return the files among `filenames` which may be affected by changes
+        made since the --changed-since option value: changed files, files
+        importing a changed module (even indirectly) and test files of test
+        directories holding changed data files.
+        """
+        if self._affected is None:
+            here = os.getcwd()
+            changed = changed_files(self.options.changed_since, here)
+            graph = ImportGraph(self.imports_file)
+            # also use the previous graph, where removed modules were known
+            affected = graph.dependents(changed)
+            graph.update(here)
+            graph.save()
+            affected |= graph.dependents(changed)
+            datafiles = [filename for filename in changed
+                         if not filename.endswith('.py')]
+            self._affected = affected, datafiles
+        affected, datafiles = self._affected
+        selected = []
+        for filename in filenames:
+            testdir = osp.join(osp.dirname(filename), '')
+            if filename in affected or any(datafile.startswith(testdir)
+                                           for datafile in datafiles):
+                selected.append(filename)
+        return selected
+
+    def list_tests(self, filenames):
+        """print tests of `filenames` selected by command line options,
+        importing only test files unknown or modified since they were last
+        collected
+        """
+        collection = TestCollection(self.collection_file)
+        for filename in sorted(filenames):
+            tests = collection.tests(filename)
+            if tests is None:
+                tests = self.collect_testfile(filename)
+                if tests is None:
+                    continue
+                collection.update(filename, tests)
+            for name, tags, generative in tests:
+                if self.is_selected(name, tags, generative):
+                    if tags:
+                        print('%s %s [%s]' % (filename, name, ', '.join(tags)))
+                    else:
+                        print(filename, name)
+        collection.save()
+
+    def collect_testfile(self, filename):
+        """import test file `filename` and return the list of tests it holds
+        (see `collect_tests`)
+        """
+        here = os.getcwd()
+        dirname = osp.dirname(filename)
+        if dirname:
+            os.chdir(dirname)
+        try:
+            try:
+                module = __import__(osp.basename(filename)[:-3])
+            except testlib.SkipTest:
+                return None
+            except Exception:
+                print('unhandled exception occurred while collecting', filename,
+                      file=sys.stderr)
+                traceback.print_exc(file=sys.stderr)
+                return None
+            return collect_tests(module)
+        finally:
+            if dirname:
+                os.chdir(here)
+                remove_local_modules_from_sys(dirname)
+
+    def find_testfiles(self):
+        """return test files of every test directory found from the current
+        working directory, or of this directory if there is none
+        """
+        here = os.getcwd()
+        testfiles = []
+        for dirname in self._testdirs(here):
+            testfiles += [filename for filename in abspath_listdir(dirname)
+                          if this_is_a_testfile(filename)]
+        if not testfiles:
+            testfiles = [filename for filename in abspath_listdir(here)
+                         if this_is_a_testfile(filename)]
+        return testfiles
+
+    def _testdirs(self, here):
+        for dirname, dirs, _ in os.walk(here):
+            for skipped in STD_BLACKLIST:
+                if skipped in dirs:
+                    dirs.remove(skipped)
+            basename = osp.basename(dirname)
+            if this_is_a_testdir(basename):
+                yield dirname
+                dirs[:] = []
+
+    def record_durations(self):
+        """save durations of the tests that have been ran, after having
+        printed the slowest ones and the ones that regressed since the
+        previous run if asked to
+        """
+        report = self.report
+        if not report.filedurations:
+            return
+        durations = TestDurations(self.durations_file)
+        count = getattr(self.options, 'durations', None)
+        if count:
+            print()
+            print('%s slowest tests:' % count)
+            for testid, duration in slowest_tests(report.testdurations, count):
+                print('  %8.3fs  %s' % (duration, testid))
+            regressions = durations.regressions(report.testdurations)
+            if regressions:
+                print('regressions since the previous run:')
+                for testid, before, duration in regressions:
+                    print('  %8.3fs -> %.3fs  %s' % (before, duration, testid))
+        durations.update(report.filedurations, report.testdurations)
+        durations.save()
 
     def get_errcode(self):
         # errcode set explicitly
@@ -316,17 +949,19 @@ class PyTester(object):
         which can be considered as a testdir and runs every test there
         """
         here = os.getcwd()
-        for dirname, dirs, _ in os.walk(here):
-            for skipped in STD_BLACKLIST:
-                if skipped in dirs:
-                    dirs.remove(skipped)
-            basename = osp.basename(dirname)
-            if this_is_a_testdir(basename):
-                print("going into", dirname)
-                # we found a testdir, let's explore it !
-                if not self.testonedir(dirname, exitfirst):
-                    break
-                dirs[:] = []
+        testfiles = []
+        for dirname in self._testdirs(here):
+            if self.jobs > 1:
+                # run test files of every testdir at once
+                testfiles += [filename for filename in abspath_listdir(dirname)
+                              if this_is_a_testfile(filename)]
+                continue
+            print("going into", dirname)
+            # we found a testdir, let's explore it !
+            if not self.testonedir(dirname, exitfirst):
+                break
+        if testfiles:
+            self.parallel_testfiles(self.select_testfiles(testfiles), exitfirst)
         if self.report.ran == 0:
             print("no test dir found testing here:", here)
             # if no test was found during the visit, consider
@@ -340,8 +975,15 @@ class PyTester(object):
         return true when all tests has been executed, false if exitfirst and
         some test has failed.
         """
-        files = abspath_listdir(testdir)
-        shuffle(files)
+        files = self.select_testfiles(abspath_listdir(testdir))
+        if self.jobs > 1:
+            return self.parallel_testfiles(
+                [filename for filename in files if this_is_a_testfile(filename)],
+                exitfirst)
+        if getattr(self.options, 'longest_first', False):
+            files = TestDurations(self.durations_file).longest_first(files)
+        else:
+            shuffle(files)
         for filename in files:
             if this_is_a_testfile(filename):
                 if self.options.exitfirst and not self.options.restart:
@@ -363,6 +1005,51 @@ class PyTester(object):
         remove_local_modules_from_sys(testdir)
         return True
 
+    @property
+    def jobs(self):
+        """number of worker processes test files are dispatched to"""
+        from multiprocessing import current_process
+        if current_process().daemon:
+            # we are ourselves a worker process, which can't have children
+            return 1
+        return getattr(self.options, 'jobs', None) or 1
+
+    def parallel_testfiles(self, filenames, exitfirst=False):
+        """runs each test file in `filenames` in one of `jobs` worker
+        processes, longest ones (according to previous runs) first.
+
+        Results are fed to the report as soon as a file has been tested, and
+        its output is printed at once.
+
+        return true when all tests has been executed, false if exitfirst and
+        some test has failed.
+        """
+        from multiprocessing import Pool
+        filenames = TestDurations(self.durations_file).longest_first(filenames)
+        pool = Pool(min(self.jobs, len(filenames)) or 1, _init_worker,
+                    (self.__class__, self.cvg, self.options))
+        try:
+            for filename, status, result, ttime, ctime, output, tests in \
+                    pool.imap_unordered(_worker_testfile, filenames):
+                sys.stderr.write(output)
+                if status == 'exit':
+                    self.errcode = result
+                    raise SystemExit(result)
+                if status == 'skipped':
+                    self.report.skip_module(filename)
+                elif status == 'error':
+                    self.report.failed_to_test_module(filename)
+                else:
+                    self.report.feed(filename, result, ttime, ctime)
+                    if tests is not None:
+                        self.report.collected[filename] = tests
+                if exitfirst and (status != 'ok' or not result.wasSuccessful()):
+                    return False
+        finally:
+            pool.terminate()
+            pool.join()
+        return True
+
     def testfile(self, filename, batchmode=False):
         """runs every test in `filename`
 
@@ -409,6 +1096,9 @@ class PyTester(object):
             tend, cend = time(), clock()
             ttime, ctime = (tend - tstart), (cend - cstart)
             self.report.feed(filename, testprog.result, ttime, ctime)
+            tests = collect_tests(testprog.module)
+            if tests is not None:
+                self.report.collected[filename] = tests
             return testprog
         finally:
             if dirname:
@@ -595,6 +1285,23 @@ def make_parser():
                       help="Profile execution and store data in the given file")
     parser.add_option('-m', '--match', default=None, dest='tags_pattern',
                       help="only execute test whose tag match the current pattern")
+    parser.add_option('-j', '--jobs', default=0, dest='jobs', type='int',
+                      help="run test files in the given number of worker "
+                      "processes")
+    parser.add_option('--durations', default=0, dest='durations', type='int',
+                      metavar='N',
+                      help="print the N slowest tests and the ones which "
+                      "regressed since the previous run")
+    parser.add_option('--list', default=False, dest='list', action='store_true',
+                      help="list selected tests instead of running them")
+    parser.add_option('--changed-since', default=None, dest='changed_since',
+                      metavar='REV',
+                      help="only run test files affected by changes made since "
+                      "the given git or mercurial revision, or timestamp")
+    parser.add_option('--longest-first', default=False, dest='longest_first',
+                      action='store_true',
+                      help="run the longest test files (according to previous "
+                      "runs) first instead of in random order")
 
     if DJANGO_FOUND:
         parser.add_option('-J', '--django', dest='django', default=False,
@@ -625,6 +1332,13 @@ def parseargs(parser):
     # restart implies exitfirst
     if options.restart:
         options.exitfirst = True
+    if options.jobs > 1:
+        if options.restart:
+            parser.error("--restart can't be used with --jobs")
+        if options.pdb:
+            parser.error("--pdb can't be used with --jobs")
+    # used to skip test files holding no matching test
+    options.test_pattern = args and args[0] or None
     # append additional args to the new sys.argv and let unittest_main
     # do the rest
     newargs += args
@@ -646,6 +1360,24 @@ def run():
         tester = DjangoTester(cvg, options)
     else:
         tester = testercls(cvg, options)
+    if options.changed_since and not explicitfile:
+        try:
+            # compute files affected by changes once for all
+            tester.changed_testfiles([])
+        except ValueError as exc:
+            parser.error(str(exc))
+    if options.list:
+        if explicitfile:
+            filenames = [osp.abspath(explicitfile)]
+        elif options.testdir:
+            filenames = [filename for filename in abspath_listdir(options.testdir)
+                         if this_is_a_testfile(filename)]
+        else:
+            filenames = tester.find_testfiles()
+        if not explicitfile:
+            filenames = tester.select_testfiles(filenames)
+        tester.list_tests(filenames)
+        sys.exit(0)
     if explicitfile:
         cmd, args = tester.testfile, (explicitfile,)
     elif options.testdir:
@@ -949,6 +1681,20 @@ class SkipAwareTestResult(unittest._TextTestResult):
         self.colorize = colorize
         self.pdbclass = Debugger
         self.verbose = verbosity > 1
+        # [(test id, duration)]
+        self.durations = []
+        self._teststart = None
+
+    def startTest(self, test):
+        super(SkipAwareTestResult, self).startTest(test)
+        self._teststart = time()
+
+    def stopTest(self, test):
+        super(SkipAwareTestResult, self).stopTest(test)
+        # skipped tests are stopped without having been started
+        if self._teststart is not None:
+            self.durations.append((test.id(), time() - self._teststart))
+            self._teststart = None
 
     def descrs_for(self, flavour):
         return getattr(self, '%s_descrs' % flavour.lower())
@@ -52,6 +52,9 @@ build predicates:
 
 You'll eventually find one concrete predicate: :class:`yes`
 
+Predicate trees are compiled into a single function by :func:`compile_predicate`
+once registration is completed (see :meth:`Registry.compile_selectors`).
+
 .. autoclass:: RegistryStore
 .. autoclass:: Registry
 
@@ -63,6 +66,7 @@ Predicates
 .. autoclass:: AndPredicate
 .. autoclass:: OrPredicate
 .. autoclass:: NotPredicate
+.. autofunction:: compile_predicate
 
 Debugging
 ---------
@@ -80,19 +84,26 @@ from __future__ import print_function
 
 __docformat__ = "restructuredtext en"
 
+import ast
 import sys
+import json
 import pkgutil
 import types
 import weakref
 import traceback as tb
-from os import listdir, stat
-from os.path import join, isdir, exists
+from functools import partial
+from os import stat
+from threading import RLock
+from os.path import join, isdir, exists, dirname
 from logging import getLogger
 from warnings import warn
 
-from six import string_types, add_metaclass
+from six import string_types, add_metaclass, exec_
+from six.moves import builtins
 
-from logilab.common.modutils import modpath_from_file
+from logilab.common.cache import Cache
+from logilab.common.fileutils import FilesWatcher
+from logilab.common.modutils import modpath_from_file, _list_directory
 from logilab.common.logging_ext import set_log_methods
 from logilab.common.decorators import classproperty
 from logilab.common.deprecation import deprecated
@@ -156,15 +167,152 @@ def _toload_info(path, extrapath, _toload=None):
     if _toload is None:
         assert isinstance(path, list)
         _toload = {}, []
+    for filepath in _python_files(path):
+        modname = _modname_from_path(filepath, extrapath)
+        _toload[0][modname] = filepath
+        _toload[1].append((filepath, modname))
+    return _toload
+
+
+def _python_files(path):
+    """generate python files in `path` (a list of files and directories),
+    descending into package directories
+    """
     for fileordir in path:
-        if isdir(fileordir) and exists(join(fileordir, '__init__.py')):
-            subfiles = [join(fileordir, fname) for fname in listdir(fileordir)]
-            _toload_info(subfiles, extrapath, _toload)
+        if isdir(fileordir):
+            for filepath in _package_files(fileordir):
+                yield filepath
         elif fileordir[-3:] == '.py':
-            modname = _modname_from_path(fileordir, extrapath)
-            _toload[0][modname] = fileordir
-            _toload[1].append((fileordir, modname))
-    return _toload
+            yield fileordir
+
+
+def _package_files(directory):
+    """generate python files in the package `directory`, if it's one, and its
+    subpackages, in directory listing order
+    """
+    try:
+        entries = _list_directory(directory)
+    except OSError:
+        return
+    if not any(name == '__init__.py' for name, is_dir, is_link in entries):
+        return
+    for name, is_dir, is_link in entries:
+        path = join(directory, name)
+        if is_dir:
+            for filepath in _package_files(path):
+                yield filepath
+        elif name[-3:] == '.py':
+            yield path
+
+
+# static scan of modules, for lazy registration
+
+_BUILTIN_NAMES = frozenset(dir(builtins))
+_REGISTRATION_ATTRS = ('__regid__', '__registry__', '__registries__')
+_UNKNOWN = object()
+
+def _scan_module(filepath):
+    """Statically scan the python module at `filepath` and return a tuple
+    (eager, provides) where `eager` tells whether the module has to be loaded
+    to know its registrable objects, and `provides` is a list of (registry
+    name or None if unknown, identifier) of the objects it may register.
+    """
+    with open(filepath, 'rb') as stream:
+        source = stream.read()
+    try:
+        tree = ast.parse(source, filepath)
+    except SyntaxError:
+        return True, [] # let the import report the error
+    classes = {}
+    provides = set()
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.ClassDef)):
+            if node.name == 'registration_callback':
+                return True, []
+            if isinstance(node, ast.FunctionDef):
+                continue
+            info = classes[node.name] = _scan_class(node, classes)
+            if node.name.startswith('_') or info.get('__abstract__') is True:
+                continue
+            regid = info.get('__regid__')
+            if regid is _UNKNOWN or (regid is None and info['external']):
+                return True, []
+            if not regid or not isinstance(regid, string_types):
+                continue
+            registries = info.get('__registries__')
+            if registries is None and isinstance(info.get('__registry__'),
+                                                 string_types):
+                registries = (info['__registry__'],)
+            if (not isinstance(registries, (tuple, list)) or not registries
+                    or not all(isinstance(reg, string_types)
+                               for reg in registries)):
+                registries = (None,)
+            for regname in registries:
+                provides.add((regname, regid))
+            continue
+        for subnode in ast.walk(node):
+            # registrable instances are given __module__=__name__ or built
+            # from classes of the module, classes may be defined in
+            # conditional blocks
+            if isinstance(subnode, ast.ClassDef) or (
+                    isinstance(subnode, ast.Call)
+                    and ((isinstance(subnode.func, ast.Name)
+                          and subnode.func.id in classes)
+                         or any(keyword.arg == '__module__'
+                                for keyword in subnode.keywords))) or (
+                    isinstance(subnode, ast.Name)
+                    and subnode.id == 'registration_callback'):
+                return True, []
+    return False, sorted(provides, key=lambda x: (x[0] or '', x[1]))
+
+def _scan_class(node, classes):
+    """return a dictionary of registration attributes of the class defined by
+    the `node` ast node, given `classes` previously defined in the module.
+    Values which can't be statically computed are set to _UNKNOWN, and the
+    'external' key tells whether the class has ancestors defined elsewhere.
+    """
+    info = {'external': False}
+    for stmt in node.body:
+        if isinstance(stmt, ast.Assign):
+            for target in stmt.targets:
+                if isinstance(target, ast.Name) and (
+                        target.id in _REGISTRATION_ATTRS
+                        or target.id == '__abstract__'):
+                    try:
+                        info[target.id] = ast.literal_eval(stmt.value)
+                    except ValueError:
+                        info[target.id] = _UNKNOWN
+        elif (isinstance(stmt, ast.FunctionDef)
+              and stmt.name in _REGISTRATION_ATTRS):
+            info[stmt.name] = _UNKNOWN
+    for base in node.bases:
+        if isinstance(base, ast.Name) and base.id in classes:
+            baseinfo = classes[base.id]
+            for attr in _REGISTRATION_ATTRS:
+                if attr in baseinfo:
+                    info.setdefault(attr, baseinfo[attr])
+            info['external'] = info['external'] or baseinfo['external']
+        elif not (isinstance(base, ast.Name) and base.id in _BUILTIN_NAMES):
+            info['external'] = True
+    return info
+
+def _load_manifest(path):
+    """return {filepath: (mdate, eager, provides)} stored in the manifest file
+    at `path`, or an empty dictionary
+    """
+    if path is None:
+        return {}
+    try:
+        with open(path) as stream:
+            scans = json.load(stream)
+    except (IOError, OSError, ValueError):
+        return {}
+    return dict((filepath, (mdate, eager, [tuple(item) for item in provides]))
+                for filepath, (mdate, eager, provides) in scans.items())
+
+def _save_manifest(path, scans):
+    with open(path, 'w') as stream:
+        json.dump(scans, stream)
 
 
 class RegistrableObject(object):
@@ -261,15 +409,55 @@ class Registry(dict):
     .. automethod:: select_or_none
     .. automethod:: possible_objects
     .. automethod:: object_by_id
+
+    Selection results may be cached by overriding the
+    :meth:`context_fingerprint` method, to avoid evaluating predicates of all
+    candidates again and again for identical contexts:
+
+    .. automethod:: context_fingerprint
+    .. automethod:: selection_cache_stats
+
+    Candidates may also be filtered before their predicates are evaluated,
+    using the index keys declared by predicates (see
+    :meth:`Predicate.index_keys`) and the context values given by
+    :meth:`context_index_values`:
+
+    .. automethod:: context_index_values
+    .. automethod:: build_indexes
     """
+    # maximum number of selection results cached when context_fingerprint()
+    # is implemented
+    selection_cache_size = 1000
+    # names of the context arguments which may be given positionally to
+    # selection methods, used by context_index_values() for the 'kwargs'
+    # index (e.g. ('req',))
+    positional_context = ()
+
     def __init__(self, debugmode):
         super(Registry, self).__init__()
         self.debugmode = debugmode
+        self._selection_cache = Cache(self.selection_cache_size)
+        # {id(selector): (selector, compiled selector)}
+        self._compiled_selectors = {}
+        # {id(objects): (objects, index name, {value: [objects]}, [objects])}
+        self._indexes = {}
+        # function loading objects registered lazily, given an identifier or
+        # None for all objects, set by the store (see
+        # RegistryStore.register_modnames)
+        self._lazy_loader = None
+
+    def _load_lazy_objects(self, oid=None):
+        """load objects registered lazily with identifier `oid`, or all of
+        them if None
+        """
+        if self._lazy_loader is not None:
+            self._lazy_loader(oid)
 
     def __getitem__(self, name):
         """return the registry (list of implementation objects) associated to
         this name
         """
+        self._load_lazy_objects(name)
         try:
             return super(Registry, self).__getitem__(name)
         except KeyError:
@@ -277,6 +465,47 @@ class Registry(dict):
             exc.__traceback__ = sys.exc_info()[-1]
             raise exc
 
+    def get(self, name, default=None):
+        self._load_lazy_objects(name)
+        return super(Registry, self).get(name, default)
+
+    def __contains__(self, name):
+        self._load_lazy_objects(name)
+        return super(Registry, self).__contains__(name)
+
+    def __iter__(self):
+        self._load_lazy_objects()
+        return super(Registry, self).__iter__()
+
+    def __len__(self):
+        self._load_lazy_objects()
+        return super(Registry, self).__len__()
+
+    def keys(self):
+        self._load_lazy_objects()
+        return super(Registry, self).keys()
+
+    def values(self):
+        self._load_lazy_objects()
+        return super(Registry, self).values()
+
+    def items(self):
+        self._load_lazy_objects()
+        return super(Registry, self).items()
+
+    if sys.version_info < (3, 0):
+        def iterkeys(self):
+            self._load_lazy_objects()
+            return super(Registry, self).iterkeys()
+
+        def itervalues(self):
+            self._load_lazy_objects()
+            return super(Registry, self).itervalues()
+
+        def iteritems(self):
+            self._load_lazy_objects()
+            return super(Registry, self).iteritems()
+
     @classmethod
     def objid(cls, obj):
         """returns a unique identifier for an object stored in the registry"""
@@ -290,13 +519,143 @@ class Registry(dict):
     def initialization_completed(self):
         """call method __registered__() on registered objects when the callback
         is defined"""
-        for objects in self.values():
+        # objects registered lazily are initialized once loaded
+        for objects in dict.values(self):
             for objectcls in objects:
                 registered = getattr(objectcls, '__registered__', None)
                 if registered:
                     registered(self)
         if self.debugmode:
             wrap_predicates(_lltrace)
+        else:
+            self.compile_selectors()
+        self.build_indexes()
+        self._selection_cache.clear()
+
+    def build_indexes(self, oids=None):
+        """build, for each list of objects sharing an identifier, an index of
+        these objects according to the index keys declared by their selector.
+        The index name used is the one constraining the most objects.
+
+        Objects registered later are not indexed, and their list of objects
+        isn't filtered until indexes are built again. If `oids` is given,
+        only lists of objects with these identifiers are indexed again.
+        """
+        if oids is None:
+            indexes = {}
+            objectslists = list(dict.values(self))
+        else:
+            indexes = self._indexes
+            objectslists = [dict.get(self, oid) for oid in oids
+                            if dict.get(self, oid)]
+        for objects in objectslists:
+            indexes.pop(id(objects), None)
+            keys = [(obj, _index_keys(obj.__select__)) for obj in objects]
+            counts = {}
+            for obj, objkeys in keys:
+                for name in set(name for name, values in objkeys):
+                    counts[name] = counts.get(name, 0) + 1
+            if not counts:
+                continue
+            indexname = max(sorted(counts), key=counts.get)
+            index, unindexed = {}, []
+            for obj, objkeys in keys:
+                for name, values in objkeys:
+                    if name == indexname:
+                        for value in values:
+                            index.setdefault(value, []).append(obj)
+                        break
+                else:
+                    unindexed.append(obj)
+            indexes[id(objects)] = (objects, indexname, index, unindexed)
+        self._indexes = indexes
+
+    def context_index_values(self, name, args, kwargs):
+        """return the values of the selection context given by `args` and
+        `kwargs` for the index `name`, or None if unknown (objects are then
+        not filtered).
+
+        The default implementation only knows about the 'kwargs' index, whose
+        values are the names of given keyword arguments which aren't None.
+        Positional arguments are named according to the `positional_context`
+        class attribute; objects are not filtered if there are more of them.
+        Override this method to support more indexes.
+        """
+        if name == 'kwargs':
+            if len(args) > len(self.positional_context):
+                # unknown names, any argument may have been given
+                return None
+            values = [key for key, value in kwargs.items() if value is not None]
+            values += [key for key, value in zip(self.positional_context, args)
+                       if value is not None]
+            return values
+        return None
+
+    def _filter_candidates(self, objects, args, kwargs):
+        """return the objects among `objects` which may be selected according
+        to their index keys
+        """
+        try:
+            indexedobjects, indexname, index, unindexed = self._indexes[id(objects)]
+        except KeyError:
+            return objects
+        if indexedobjects is not objects:
+            return objects
+        values = self.context_index_values(indexname, args, kwargs)
+        if values is None:
+            return objects
+        candidates = set(id(obj) for obj in unindexed)
+        for value in values:
+            candidates.update(id(obj) for obj in index.get(value, ()))
+        if len(candidates) == len(objects):
+            return objects
+        # keep registration order
+        return [obj for obj in objects if id(obj) in candidates]
+
+    def _objects_changed(self, objects):
+        """registered objects list `objects` has been modified, drop
+        selection data depending on it
+        """
+        self._selection_cache.clear()
+        self._indexes.pop(id(objects), None)
+
+    def compile_selectors(self, oids=None):
+        """compile the predicate trees of registered objects' selectors using
+        :func:`compile_predicate`. Compiled selectors are used instead of the
+        original ones, unless selection is being traced.
+
+        Objects registered later are selected using their original selector,
+        and selectors shouldn't be modified once compiled. If `oids` is given,
+        only selectors of objects with these identifiers are compiled, other
+        compiled selectors are kept.
+        """
+        if oids is None:
+            compiled = {}
+            objectslists = list(dict.values(self))
+        else:
+            compiled = self._compiled_selectors
+            objectslists = [dict.get(self, oid, ()) for oid in oids]
+        for objects in objectslists:
+            for obj in objects:
+                selector = obj.__select__
+                if isinstance(selector, Predicate) and not id(selector) in compiled:
+                    compiled[id(selector)] = (selector,
+                                              compile_predicate(selector))
+        self._compiled_selectors = compiled
+
+    def _late_initialization(self, oids):
+        """compile selectors and index objects with identifiers `oids`,
+        registered after initialization (e.g. lazily)
+        """
+        if not self.debugmode:
+            self.compile_selectors(oids)
+        self.build_indexes(oids)
+
+    def clear(self):
+        super(Registry, self).clear()
+        self._selection_cache.clear()
+        self._compiled_selectors = {}
+        self._indexes = {}
 
     def register(self, obj, oid=None, clear=False):
         """base method to add an object in the registry"""
@@ -311,6 +670,7 @@ class Registry(dict):
             objects = self.setdefault(oid, [])
         assert not obj in objects, 'object %s is already registered' % obj
         objects.append(obj)
+        self._objects_changed(objects)
 
     def register_and_replace(self, obj, replaced):
         """remove <replaced> and register <obj>"""
@@ -321,10 +681,12 @@ class Registry(dict):
             replaced = self.objid(replaced)
         # prevent from misspelling
         assert obj is not replaced, 'replacing an object by itself: %s' % obj
+        self._load_lazy_objects(obj.__regid__)
         registered_objs = self.get(obj.__regid__, ())
         for index, registered in enumerate(registered_objs):
             if self.objid(registered) == replaced:
                 del registered_objs[index]
+                self._objects_changed(registered_objs)
                 break
         else:
             self.warning('trying to replace %s that is not registered with %s',
@@ -335,11 +697,13 @@ class Registry(dict):
         """remove object <obj> from this registry"""
         objid = self.objid(obj)
         oid = obj.__regid__
+        self._load_lazy_objects(oid)
         for registered in self.get(oid, ()):
             # use self.objid() to compare objects because vreg will probably
             # have its own version of the object, loaded through execfile
             if self.objid(registered) == objid:
                 self[oid].remove(registered)
+                self._objects_changed(self[oid])
                 break
         else:
             self.warning('can\'t remove %s, no id %s in the registry',
@@ -348,6 +712,7 @@ class Registry(dict):
     def all_objects(self):
         """return a list containing all objects in this registry.
         """
+        self._load_lazy_objects()
         result = []
         for objs in self.values():
             result += objs
@@ -395,12 +760,30 @@ class Registry(dict):
         """return an iterator on possible objects in this registry for the given
         context
         """
-        for objects in self.values():
+        self._load_lazy_objects()
+        for objects in list(self.values()):
             obj = self._select_best(objects,  *args, **kwargs)
             if obj is None:
                 continue
             yield obj
 
+    def context_fingerprint(self, args, kwargs):
+        """return a hashable fingerprint of the selection context given by
+        `args` and `kwargs`, or None if the selection result shouldn't be
+        cached.
+
+        Two contexts with the same fingerprint must lead to the selection of
+        the same object. Return None by default, override this method to
+        enable the selection cache.
+        """
+        return None
+
+    def selection_cache_stats(self):
+        """return a dictionary of statistics about the selection cache (hits,
+        misses, evictions, currsize, maxsize)
+        """
+        return self._selection_cache.stats()
+
     def _select_best(self, objects, *args, **kwargs):
         """return an instance of the most specific object according
         to parameters
@@ -409,9 +792,49 @@ class Registry(dict):
         it's costly when searching objects using `possible_objects`
         (e.g. searching for hooks).
         """
+        fingerprint = None
+        if TRACED_OIDS is None:
+            fingerprint = self.context_fingerprint(args, kwargs)
+        if fingerprint is None:
+            winner = self._select_winner(objects, args, kwargs)
+        else:
+            # the cache is cleared as soon as a registered objects list is
+            # modified. Keep a reference on the list to ensure its id isn't
+            # reused.
+            key = (id(objects), fingerprint)
+            try:
+                cachedobjects, winner = self._selection_cache[key]
+                if cachedobjects is not objects:
+                    raise KeyError(key)
+            except KeyError:
+                winner = self._select_winner(objects, args, kwargs)
+                self._selection_cache[key] = (objects, winner)
+        if winner is None:
+            return None
+        # return the result of calling the object
+        return self.selected(winner, args, kwargs)
+
+    def _select_winner(self, objects, args, kwargs):
+        """return the most specific object according to parameters, or None
+        if no object apply
+        """
         score, winners = 0, None
+        if self._indexes:
+            objects = self._filter_candidates(objects, args, kwargs)
+        compiled = self._compiled_selectors
+        if TRACED_OIDS is not None:
+            compiled = {}
         for obj in objects:
-            objectscore = obj.__select__(obj, *args, **kwargs)
+            selector = obj.__select__
+            if compiled:
+                try:
+                    origselector, compiledselector = compiled[id(selector)]
+                except KeyError:
+                    pass
+                else:
+                    if origselector is selector:
+                        selector = compiledselector
+            objectscore = selector(obj, *args, **kwargs)
             if objectscore > score:
                 score, winners = objectscore, [obj]
             elif objectscore > 0 and objectscore == score:
@@ -425,8 +848,7 @@ class Registry(dict):
                 # raise bare exception in debug mode
                 raise SelectAmbiguity(msg % (winners, args, kwargs.keys()))
             self.error(msg, winners, args, kwargs.keys())
-        # return the result of calling the object
-        return self.selected(winners[0], args, kwargs)
+        return winners[0]
 
     def selected(self, winner, args, kwargs):
         """override here if for instance you don't want "instanciation"
@@ -563,9 +985,25 @@ class RegistryStore(dict):
     key will be the class used when there is no specific class for a name.
     """
 
+    # set to true to watch files for changes instead of checking them all on
+    # each call to is_reload_needed / changed_files. Watchers hold a file
+    # descriptor until stop_watching() is called or the store is garbage
+    # collected.
+    watch_changes = False
+
     def __init__(self, debugmode=False):
         super(RegistryStore, self).__init__()
         self.debugmode = debugmode
+        # {tuple(path): FilesWatcher}, see is_reload_needed
+        self._watchers = {}
+        # files which may have changed since they have been loaded
+        self._dirtyfiles = set()
+        # held while loading lazily registered modules (reentrant since
+        # loaded modules may use the registries)
+        self._lazylock = RLock()
+        # keys of _lazymods loaded by the current thread, forgotten once it
+        # leaves the outermost _load_lazy_objects call
+        self._lazyloaded = None
 
     def reset(self):
         """clear all registries managed by this store"""
@@ -573,6 +1011,10 @@ class RegistryStore(dict):
         for subdict in self.values():
             subdict.clear()
         self._lastmodifs = {}
+        # {(registry name or None if unknown, oid): [modname]} of modules
+        # whose loading is delayed until objects with this identifier are
+        # selected
+        self._lazymods = {}
 
     def __getitem__(self, name):
         """return the registry (dictionary of class objects) associated to
@@ -581,6 +1023,12 @@ class RegistryStore(dict):
         try:
             return super(RegistryStore, self).__getitem__(name)
         except KeyError:
+            if getattr(self, '_lazymods', None):
+                # the registry may be created by lazily loaded modules whose
+                # registries are unknown
+                self._load_lazy_objects(None, None)
+                if name in self:
+                    return super(RegistryStore, self).__getitem__(name)
             exc = RegistryNotFound(name)
             exc.__traceback__ = sys.exc_info()[-1]
             raise exc
@@ -599,11 +1047,9 @@ class RegistryStore(dict):
             return self.REGISTRY_FACTORY[None]
 
     def setdefault(self, regid):
-        try:
-            return self[regid]
-        except RegistryNotFound:
+        if not regid in self:
             self[regid] = self.registry_class(regid)(self.debugmode)
-            return self[regid]
+        return self[regid]
 
     def register_all(self, objects, modname, butclasses=()):
         """register registrable objects into `objects`.
@@ -696,8 +1142,20 @@ class RegistryStore(dict):
             self.load_file(filepath, modname)
         self.initialization_completed()
 
-    def register_modnames(self, modnames):
-        """register all objects found in <modnames>"""
+    def register_modnames(self, modnames, lazy=False, manifest=None):
+        """register all objects found in <modnames>
+
+        If `lazy` is true, modules are statically scanned for the registries
+        and identifiers of the objects they define, and are only imported
+        once objects with one of these identifiers are selected (or when all
+        objects of one of their registries are needed). Modules whose objects
+        can't be determined this way, e.g. those defining a
+        `registration_callback` function, are imported immediately. Objects
+        created dynamically by other means won't be found.
+
+        `manifest` is the path of a file where the result of the scan is
+        kept, so that only modules modified since are scanned again.
+        """
         self.reset()
         self._loadedmods = {}
         self._toloadmods = {}
@@ -709,10 +1167,202 @@ class RegistryStore(dict):
                 filepath = filepath[:-1]
             self._toloadmods[modname] = filepath
             toload.append((filepath, modname))
+        if lazy:
+            toload = self._register_lazily(toload, manifest)
         for filepath, modname in toload:
             self.load_file(filepath, modname)
         self.initialization_completed()
 
+    def _register_lazily(self, toload, manifest=None):
+        """record modules in `toload` whose loading may be delayed, and return
+        those which have to be loaded now
+        """
+        scans = _load_manifest(manifest)
+        changed = False
+        eagerly = []
+        for filepath, modname in toload:
+            mdate = self._mdate(filepath)
+            scan = scans.get(filepath)
+            if scan is None or scan[0] != mdate:
+                scan = scans[filepath] = (mdate,) + _scan_module(filepath)
+                changed = True
+            mdate, eager, provides = scan
+            if eager:
+                eagerly.append((filepath, modname))
+                continue
+            for regname, oid in provides:
+                self._lazymods.setdefault((regname, oid), []).append(modname)
+                if regname is not None:
+                    self.setdefault(regname)
+            self._lastmodifs[filepath] = mdate
+        if manifest is not None and changed:
+            _save_manifest(manifest, scans)
+        for regname, registry in self.items():
+            registry._lazy_loader = partial(self._load_lazy_objects, regname)
+        return eagerly
+
+    def _load_lazy_objects(self, regname, oid):
+        """load modules delayed until objects with identifier `oid` (all
+        objects if None) of registry `regname` (all registries if None) are
+        needed
+        """
+        lazymods = self._lazymods
+        if not lazymods or (oid is not None and (regname, oid) not in lazymods
+                            and (None, oid) not in lazymods):
+            # nothing to load, or the objects have already been registered
+            return
+        # other threads needing these objects wait until they are registered
+        with self._lazylock:
+            outermost = self._lazyloaded is None
+            if outermost:
+                self._lazyloaded = set()
+            try:
+                if oid is None:
+                    keys = [key for key in lazymods
+                            if regname is None or key[0] in (regname, None)]
+                else:
+                    keys = [(regname, oid), (None, oid)]
+                keys = [key for key in keys if key not in self._lazyloaded]
+                self._lazyloaded.update(keys)
+                modnames = []
+                for key in keys:
+                    modnames += lazymods.get(key, ())
+                if not modnames:
+                    return
+                loadedbefore = set(self._loadedmods)
+                for modname in modnames:
+                    self.load_file(self._toloadmods[modname], modname)
+                for registry in self.values():
+                    if registry._lazy_loader is None:
+                        # created by the loaded modules
+                        registry._lazy_loader = partial(
+                            self._load_lazy_objects,
+                            self._registry_name(registry))
+                self._late_registration_completed(
+                    set(self._loadedmods) - loadedbefore)
+            finally:
+                if outermost:
+                    # forget about modules once their objects have been
+                    # registered, or their loading failed
+                    for key in self._lazyloaded:
+                        lazymods.pop(key, None)
+                    self._lazyloaded = None
+
+    def _registry_name(self, registry):
+        for regname, reg in self.items():
+            if reg is registry:
+                return regname
+
+    def _late_registration_completed(self, modnames):
+        """call method __registered__() on objects of modules `modnames`,
+        registered after initialization, then compile and index them
+        """
+        for registry in self.values():
+            oids = set()
+            for oid, objects in list(dict.items(registry)):
+                for obj in objects:
+                    if obj.__module__ not in modnames:
+                        continue
+                    oids.add(oid)
+                    registered = getattr(obj, '__registered__', None)
+                    if registered:
+                        registered(registry)
+            if oids:
+                registry._late_initialization(oids)
+
+    def reload_modules(self, modnames):
+        """reload modules `modnames` (e.g. as returned by
+        :meth:`changed_modules`) and loaded modules depending on them, and
+        return the set of names of reloaded modules.
+
+        Objects of these modules are unregistered, the modules are imported
+        again and their objects registered again, without resetting the
+        whole registries. Modules which have been removed are only
+        unregistered, and new modules are registered.
+
+        Module A is considered to depend on module B if A's namespace holds
+        B or objects defined in B, such as classes imported from B.
+        """
+        reloaded = self._module_dependents(modnames)
+        toload = []
+        for modname in sorted(reloaded):
+            self._unregister_module(modname)
+            filepath = self._toloadmods.get(modname)
+            if filepath is None and modname not in sys.modules:
+                # new module
+                loader = pkgutil.find_loader(modname)
+                if loader is not None:
+                    filepath = loader.get_filename()
+                    if filepath[-4:] in ('.pyc', '.pyo'):
+                        filepath = filepath[:-1]
+            sys.modules.pop(modname, None)
+            if filepath is None:
+                continue # helper module, not registered
+            if not exists(filepath):
+                # removed module
+                self._toloadmods.pop(modname, None)
+                self._lastmodifs.pop(filepath, None)
+                continue
+            self._toloadmods[modname] = filepath
+            toload.append((filepath, modname))
+        for filepath, modname in toload:
+            self.load_file(filepath, modname)
+        self._late_registration_completed(reloaded)
+        return reloaded
+
+    def _module_dependents(self, modnames):
+        """return the set of `modnames` and names of loaded modules depending,
+        directly or not, on them
+        """
+        dependents = {}
+        for modname in self._loadedmods:
+            module = sys.modules.get(modname)
+            if module is None:
+                continue
+            for value in list(vars(module).values()):
+                if isinstance(value, types.ModuleType):
+                    depname = value.__name__
+                else:
+                    depname = getattr(value, '__module__', None)
+                if (isinstance(depname, string_types) and depname != modname
+                        # packages hold their submodules
+                        and not depname.startswith(modname + '.')):
+                    dependents.setdefault(depname, set()).add(modname)
+        result = set()
+        stack = list(modnames)
+        while stack:
+            modname = stack.pop()
+            if modname not in result:
+                result.add(modname)
+                stack.extend(dependents.get(modname, ()))
+        return result
+
+    def _unregister_module(self, modname):
+        """unregister objects of module `modname` and forget it's been
+        loaded
+        """
+        for obj in self._loadedmods.pop(modname, {}).values():
+            if not self.is_registrable(obj):
+                continue
+            for regname in obj_registries(obj):
+                if regname not in self:
+                    continue
+                registry = self[regname]
+                objid = registry.objid(obj)
+                objects = dict.get(registry, obj.__regid__, ())
+                for registered in objects:
+                    if registry.objid(registered) == objid:
+                        registry.unregister(registered)
+                        break
+                if not objects and dict.__contains__(registry, obj.__regid__):
+                    del registry[obj.__regid__]
+        lazymods = getattr(self, '_lazymods', {})
+        for key, lazymodnames in list(lazymods.items()):
+            if modname in lazymodnames:
+                lazymodnames.remove(modname)
+                if not lazymodnames:
+                    del lazymods[key]
+
     def initialization_completed(self):
         """call initialization_completed() on all known registries"""
         for reg in self.values():
@@ -730,26 +1380,101 @@ class RegistryStore(dict):
 
     def is_reload_needed(self, path):
         """return True if something module changed and the registry should be
-        reloaded
+        reloaded. As before, removed modules don't require reloading, use
+        :meth:`changed_files` to get them.
         """
-        lastmodifs = self._lastmodifs
-        for fileordir in path:
-            if isdir(fileordir) and exists(join(fileordir, '__init__.py')):
-                if self.is_reload_needed([join(fileordir, fname)
-                                          for fname in listdir(fileordir)]):
-                    return True
-            elif fileordir[-3:] == '.py':
-                mdate = self._mdate(fileordir)
-                if mdate is None:
-                    continue # backup file, see _mdate implementation
-                elif "flymake" in fileordir:
-                    # flymake + pylint in use, don't consider these they will corrupt the registry
+        return any(exists(filepath) for filepath in self.changed_files(path))
+
+    def changed_files(self, path):
+        """return the set of python files in `path` (a list of files and
+        package directories) added, modified or removed since they have been
+        loaded.
+
+        If `watch_changes` is true, files are watched for modifications
+        from the first call for a given `path` (see
+        :class:`logilab.common.fileutils.FilesWatcher`), so that later calls
+        cost in proportion to the number of modified files rather than to the
+        number of files.
+        """
+        if not self.watch_changes:
+            return set(self._changed_files(_python_files(path)))
+        key = tuple(path)
+        watcher = self._watchers.get(key)
+        if watcher is None:
+            watcher = self._watchers[key] = FilesWatcher(path)
+            # changes happened before watching
+            self._dirtyfiles.update(_python_files(path))
+        else:
+            # files removed along with their package can only be recognized
+            # as loaded ones
+            self._dirtyfiles.update(filepath for filepath in watcher.changes()
+                                    if filepath in self._lastmodifs
+                                    or self._is_registry_file(filepath, path))
+        # forget files which have been reloaded or whose modifications don't
+        # matter
+        self._dirtyfiles = set(self._changed_files(self._dirtyfiles))
+        return set(self._dirtyfiles)
+
+    def changed_modules(self, path):
+        """return the set of names of modules in `path` added, modified or
+        removed since they have been loaded (see :meth:`changed_files`)
+        """
+        modnames = dict((filepath, modname) for modname, filepath
+                        in getattr(self, '_toloadmods', {}).items())
+        changed = set()
+        for filepath in self.changed_files(path):
+            modname = modnames.get(filepath)
+            if modname is None:
+                try:
+                    modname = '.'.join(modpath_from_file(filepath))
+                except ImportError:
+                    self.warning('no module name found for %s', filepath)
                     continue
-                if fileordir not in lastmodifs or lastmodifs[fileordir] < mdate:
-                    self.info('File %s changed since last visit', fileordir)
-                    return True
+            changed.add(modname)
+        return changed
+
+    def stop_watching(self):
+        """stop watching files for changes (see :meth:`changed_files`)"""
+        for watcher in self._watchers.values():
+            watcher.close()
+        self._watchers = {}
+        self._dirtyfiles = set()
+
+    def _is_registry_file(self, filepath, path):
+        """return True if `filepath` would be found by _python_files(path)"""
+        if filepath[-3:] != '.py':
+            return False
+        if filepath in path:
+            return True
+        directory = dirname(filepath)
+        while exists(join(directory, '__init__.py')):
+            if directory in path:
+                return True
+            parent = dirname(directory)
+            if parent == directory:
+                break
+            directory = parent
         return False
 
+    def _changed_files(self, filepaths):
+        """generate files in `filepaths` changed since they have been loaded"""
+        lastmodifs = self._lastmodifs
+        for filepath in filepaths:
+            if "flymake" in filepath:
+                # flymake + pylint in use, don't consider these they will corrupt the registry
+                continue
+            if not exists(filepath):
+                if filepath in lastmodifs:
+                    self.info('File %s removed since last visit', filepath)
+                    yield filepath
+                continue
+            mdate = self._mdate(filepath)
+            if mdate is None:
+                continue # backup file, see _mdate implementation
+            if filepath not in lastmodifs or lastmodifs[filepath] < mdate:
+                self.info('File %s changed since last visit', filepath)
+                yield filepath
+
     def load_file(self, filepath, modname):
         """ load registrable objects (if any) from a python file """
         if modname in self._loadedmods:
@@ -967,14 +1692,42 @@ def objectify_predicate(selector_func):
 
 _PREDICATES = {}
 
+def _predicate_cost(predicate):
+    return getattr(predicate, 'cost', None)
+
+def _ordered_selectors(selectors):
+    """return `selectors` of an :class:`AndPredicate` in the order they should
+    be called: runs of consecutive selectors declaring a cost are sorted by
+    increasing cost, other selectors keep their position
+    """
+    ordered, run = [], []
+    for selector in selectors:
+        if _predicate_cost(selector) is None:
+            ordered += sorted(run, key=_predicate_cost)
+            ordered.append(selector)
+            run = []
+        else:
+            run.append(selector)
+    ordered += sorted(run, key=_predicate_cost)
+    return ordered
+
+def _index_keys(predicate):
+    index_keys = getattr(predicate, 'index_keys', None)
+    if index_keys is None:
+        return ()
+    return index_keys()
+
 def wrap_predicates(decorator):
     for predicate in _PREDICATES.values():
         if not '_decorators' in predicate.__dict__:
             predicate._decorators = set()
+            # kept for compile_predicate()
+            predicate._undecorated_call = predicate.__dict__.get('__call__')
         if decorator in predicate._decorators:
             continue
         predicate._decorators.add(decorator)
         predicate.__call__ = decorator(predicate.__call__)
+        predicate._wrapped_call = predicate.__dict__['__call__']
 
 class PredicateMetaClass(type):
     def __new__(mcs, *args, **kwargs):
@@ -1037,6 +1790,30 @@ class Predicate(object):
     def __invert__(self):
         return NotPredicate(self)
 
+    def index_keys(self):
+        """return a sequence of (index name, values) constraints, telling the
+        predicate may only score for contexts whose values for each index
+        name (see :meth:`Registry.context_index_values`) include one of
+        `values`. They are used to filter out candidates before predicates
+        are evaluated.
+
+        For instance, a predicate requiring the 'rset' and 'entity' keyword
+        arguments may return::
+
+          (('kwargs', ('rset',)), ('kwargs', ('entity',)))
+
+        Return an empty tuple by default, meaning no constraint is known.
+        """
+        return ()
+
+    # relative cost of calling the predicate, used by compile_predicate() to
+    # call cheaper predicates of an AndPredicate first. Predicates declaring
+    # no cost are called in declaration order, and no predicate is moved
+    # across them. Only set it on predicates which don't depend on other
+    # predicates having been called, and which other predicates don't depend
+    # on.
+    cost = None
+
     # XXX (function | function) or (function & function) not managed yet
 
     def __call__(self, cls, *args, **kwargs):
@@ -1057,6 +1834,9 @@ class MultiPredicate(Predicate):
         return '%s(%s)' % (self.__class__.__name__,
                            ','.join(str(s) for s in self.selectors))
 
+    def index_keys(self):
+        return ()
+
     @classmethod
     def merge_selectors(cls, selectors):
         """deal with selector instanciation when necessary and merge
@@ -1096,6 +1876,11 @@ class MultiPredicate(Predicate):
 
 class AndPredicate(MultiPredicate):
     """and-chained selectors"""
+    def index_keys(self):
+        # all constraints of each selector must be satisfied
+        return tuple(key for selector in self.selectors
+                     for key in _index_keys(selector))
+
     def __call__(self, cls, *args, **kwargs):
         score = 0
         for selector in self.selectors:
@@ -1108,6 +1893,28 @@ class AndPredicate(MultiPredicate):
 
 class OrPredicate(MultiPredicate):
     """or-chained selectors"""
+    def index_keys(self):
+        # one constraint of each selector must be satisfied: keep names
+        # constrained by all selectors, accepting values of any of them
+        allvalues = None
+        for selector in self.selectors:
+            selvalues = {}
+            for name, values in _index_keys(selector):
+                selvalues.setdefault(name, values)
+            if allvalues is None:
+                allvalues = dict((name, set(values))
+                                 for name, values in selvalues.items())
+            else:
+                for name in list(allvalues):
+                    if name in selvalues:
+                        allvalues[name].update(selvalues[name])
+                    else:
+                        del allvalues[name]
+        if not allvalues:
+            return ()
+        return tuple((name, frozenset(values))
+                     for name, values in sorted(allvalues.items()))
+
     def __call__(self, cls, *args, **kwargs):
         for selector in self.selectors:
             partscore = selector(cls, *args, **kwargs)
@@ -1144,6 +1951,86 @@ class yes(Predicate): # pylint: disable=C0103
         return self.score
 
 
+# predicates compilation ######################################################
+
+_ONCE = (None,)
+
+# original __call__ method of predicate classes flattened by
+# compile_predicate()
+_FLATTENED_CALLS = dict((predcls, predcls.__dict__['__call__'])
+                        for predcls in (AndPredicate, OrPredicate, NotPredicate))
+
+def compile_predicate(predicate):
+    """Return a function equivalent to `predicate`, where the tree of
+    :class:`AndPredicate`, :class:`OrPredicate` and :class:`NotPredicate` is
+    flattened into a single function calling the leaf predicates, stopping as
+    soon as the score is known.
+
+    The children of an :class:`AndPredicate` are called in their original
+    order, except that consecutive children declaring a `cost` are called by
+    increasing cost. The `predicate` itself is returned
+    if it can't be compiled (e.g. the tree is too deep).
+
+    AND, OR and NOT predicates whose `__call__` method has been decorated
+    by :func:`wrap_predicates` are still flattened, the decorators being
+    only applied to leaf predicates. If their `__call__` method has been
+    replaced otherwise or overridden by a subclass, they are called like
+    leaf predicates.
+    """
+    namespace = {'_ONCE': _ONCE}
+    lines = ['def compiled(cls, *args, **kwargs):']
+    try:
+        _compile_predicate(predicate, 'score', lines, 1, namespace)
+        lines.append('    return score')
+        exec_('\n'.join(lines), namespace)
+    except (SyntaxError, RuntimeError):
+        # too many statically nested blocks, or maximum recursion depth
+        return predicate
+    compiled = namespace['compiled']
+    compiled.__name__ = 'compiled_%s' % predicate.__class__.__name__
+    compiled.__doc__ = str(predicate)
+    return compiled
+
+def _compile_predicate(predicate, var, lines, depth, namespace):
+    """append to `lines` the code, indented at `depth`, assigning to `var` the
+    score of `predicate`. Objects needed by this code are added to
+    `namespace`.
+    """
+    indent = '    ' * depth
+    predcls = predicate.__class__
+    call = predcls.__dict__.get('__call__')
+    if call is not None and call is predcls.__dict__.get('_wrapped_call'):
+        # decorated by wrap_predicates
+        call = predcls.__dict__['_undecorated_call']
+    if call is not _FLATTENED_CALLS.get(predcls):
+        # replaced __call__, call the predicate itself
+        predcls = None
+    if predcls is AndPredicate and predicate.selectors:
+        lines.append('%s%s = 0' % (indent, var))
+        lines.append('%sfor _ in _ONCE:' % indent)
+        partvars = []
+        for selector in _ordered_selectors(predicate.selectors):
+            # the number of lines is a cheap unique identifier
+            partvar = 's%s' % len(lines)
+            _compile_predicate(selector, partvar, lines, depth + 1, namespace)
+            lines.append('%s    if not %s: break' % (indent, partvar))
+            partvars.append(partvar)
+        lines.append('%s    %s = 0 + %s' % (indent, var, ' + '.join(partvars)))
+    elif predcls is OrPredicate:
+        lines.append('%sfor _ in _ONCE:' % indent)
+        for selector in predicate.selectors:
+            _compile_predicate(selector, var, lines, depth + 1, namespace)
+            lines.append('%s    if %s: break' % (indent, var))
+        lines.append('%s    %s = 0' % (indent, var))
+    elif predcls is NotPredicate:
+        _compile_predicate(predicate.selector, var, lines, depth, namespace)
+        lines.append('%s%s = int(not %s)' % (indent, var, var))
+    else:
+        name = 'p%s' % len(lines)
+        namespace[name] = predicate
+        lines.append('%s%s = %s(cls, *args, **kwargs)' % (indent, var, name))
+
+
 # deprecated stuff #############################################################
 
 @deprecated('[lgc 0.59] use Registry.objid class method instead')
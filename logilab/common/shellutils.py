@@ -24,6 +24,7 @@ from __future__ import print_function
 __docformat__ = "restructuredtext en"
 
 import os
+import re
 import glob
 import shutil
 import stat
@@ -35,7 +36,7 @@ import errno
 import string
 import random
 import subprocess
-from os.path import exists, isdir, islink, basename, join
+from os.path import exists, isdir, islink, basename, dirname, join
 
 from six import string_types
 from six.moves import range, input as raw_input
@@ -44,6 +45,14 @@ from logilab.common import STD_BLACKLIST, _handle_blacklist
 from logilab.common.compat import str_to_bytes
 from logilab.common.deprecation import deprecated
 
+try:
+    from os import scandir
+except ImportError:
+    try:
+        from scandir import scandir
+    except ImportError:
+        scandir = None
+
 
 class tempdir(object):
 
@@ -159,27 +168,13 @@ def find(directory, exts, exclude=False, blacklist=STD_BLACKLIST):
     """
     if isinstance(exts, string_types):
         exts = (exts,)
-    if exclude:
-        def match(filename, exts):
-            for ext in exts:
-                if filename.endswith(ext):
-                    return False
-            return True
-    else:
-        def match(filename, exts):
-            for ext in exts:
-                if filename.endswith(ext):
-                    return True
-            return False
-    files = []
-    for dirpath, dirnames, filenames in os.walk(directory):
-        _handle_blacklist(blacklist, dirnames, filenames)
+    if not exts and not exclude:
+        return []
+    files = ifind(directory, exts, exclude=exclude, blacklist=blacklist)
+    if basename(directory) in blacklist:
         # don't append files if the directory is blacklisted
-        dirname = basename(dirpath)
-        if dirname in blacklist:
-            continue
-        files.extend([join(dirpath, f) for f in filenames if match(f, exts)])
-    return files
+        files = (path for path in files if dirname(path) != directory)
+    return list(files)
 
 
 def globfind(directory, pattern, blacklist=STD_BLACKLIST):
@@ -204,10 +199,208 @@ def globfind(directory, pattern, blacklist=STD_BLACKLIST):
     :return:
       iterator over the list of all matching files
     """
-    for curdir, dirnames, filenames in os.walk(directory):
-        _handle_blacklist(blacklist, dirnames, filenames)
-        for fname in fnmatch.filter(filenames, pattern):
-            yield join(curdir, fname)
+    return ifind(directory, patterns=pattern, blacklist=blacklist)
+
+
+def ifind(directory, exts=(), patterns=(), exclude=False,
+          blacklist=STD_BLACKLIST, min_size=None, max_size=None,
+          newer_than=None, older_than=None, workers=0, followlinks=False):
+    """Recursively generate files found from `directory` whose name ends with
+    one of the given extensions or matches one of the given glob patterns,
+    while walking the directory.
+
+    Extensions and patterns are compiled into a single regular expression,
+    and directories are listed using `os.scandir` when available, so that no
+    additional system call is needed to know whether an entry is a
+    directory. Files are only stat'ed when filtering on their size or
+    modification time.
+
+    :type directory: str
+    :param directory:
+      directory where the search should start
+
+    :type exts: basestring or list or tuple
+    :param exts:
+      extensions or lists or extensions to search
+
+    :type patterns: basestring or list or tuple
+    :param patterns:
+      glob pattern or list of glob patterns (e.g *.py, foo*.py, etc.) to
+      search. If neither `exts` nor `patterns` are given, every file matches.
+
+    :type exclude: boolean
+    :param exclude:
+      if this argument is True, generate files NOT matching the given
+      extensions and patterns
+
+    :type blacklist: list or tuple
+    :param blacklist:
+      optional list of files or directory to ignore, default to the value of
+      `logilab.common.STD_BLACKLIST`
+
+    :type min_size: int
+    :param min_size: optional minimum size of files, in bytes
+
+    :type max_size: int
+    :param max_size: optional maximum size of files, in bytes
+
+    :type newer_than: float
+    :param newer_than:
+      optional timestamp files must have been modified after
+
+    :type older_than: float
+    :param older_than:
+      optional timestamp files must have been modified before
+
+    :type workers: int
+    :param workers:
+      number of threads listing directories (and stat'ing files)
+      concurrently, which may help on network filesystems, default to 0 (no
+      thread)
+
+    :type followlinks: bool
+    :param followlinks:
+      whether to descend into symbolic links to directories
+
+    :rtype: iterator
+    :return:
+      iterator over the matching files
+    """
+    regexp = _names_regexp(exts, patterns)
+    if regexp is None:
+        match = None
+    elif exclude:
+        match = lambda name: regexp.match(name) is None
+    else:
+        match = lambda name: regexp.match(name) is not None
+    accept = _stat_filter(min_size, max_size, newer_than, older_than)
+    def scan(directory):
+        return _scan_directory(directory, followlinks, match, accept)
+    if not workers:
+        return _find(directory, blacklist, scan)
+    return _find_threaded(directory, blacklist, scan, workers)
+
+
+def _names_regexp(exts, patterns):
+    """return a regular expression matching file names ending with one of
+    `exts` or matching one of the glob `patterns`, or None if there is none
+    """
+    if isinstance(exts, string_types):
+        exts = (exts,)
+    if isinstance(patterns, string_types):
+        patterns = (patterns,)
+    regexps = [fnmatch.translate(os.path.normcase(pattern))
+               for pattern in patterns]
+    if exts:
+        regexps.append('.*(?:%s)\\Z' % '|'.join(re.escape(ext)
+                                                 for ext in exts))
+    if not regexps:
+        return None
+    flags = re.DOTALL
+    if os.path.normcase('A') == 'a':
+        # case insensitive file system, as fnmatch does
+        flags |= re.IGNORECASE
+    return re.compile('|'.join(regexps), flags)
+
+
+def _stat_filter(min_size, max_size, newer_than, older_than):
+    """return a function telling if a directory entry fulfills the given size
+    and modification time bounds, or None if there is none
+    """
+    if min_size is None and max_size is None and \
+       newer_than is None and older_than is None:
+        return None
+    def accept(entry):
+        try:
+            stats = entry.stat()
+        except OSError:
+            return False
+        return ((min_size is None or stats.st_size >= min_size) and
+                (max_size is None or stats.st_size <= max_size) and
+                (newer_than is None or stats.st_mtime > newer_than) and
+                (older_than is None or stats.st_mtime < older_than))
+    return accept
+
+
+def _find(directory, blacklist, scan):
+    # depth first, top-down walk like os.walk, without recursion
+    stack = [directory]
+    while stack:
+        directory = stack.pop()
+        dirnames, filenames = scan(directory)
+        for filename in filenames:
+            if filename not in blacklist:
+                yield join(directory, filename)
+        stack.extend(join(directory, dirname) for dirname in reversed(dirnames)
+                     if dirname not in blacklist)
+
+
+def _find_threaded(directory, blacklist, scan, workers):
+    from multiprocessing.pool import ThreadPool
+    pool = ThreadPool(workers)
+    pending = {}
+    def prefetching_scan(directory):
+        try:
+            result = pending.pop(directory)
+        except KeyError:
+            result = scan(directory)
+        else:
+            result = result.get()
+        # list subdirectories ahead of the walk
+        for dirname in result[0]:
+            if dirname not in blacklist:
+                subdirectory = join(directory, dirname)
+                pending[subdirectory] = pool.apply_async(scan, (subdirectory,))
+        return result
+    try:
+        for path in _find(directory, blacklist, prefetching_scan):
+            yield path
+    finally:
+        pool.terminate()
+
+
+class _DirEntry(object):
+    """minimal `os.scandir` entry, used when it is not available"""
+
+    def __init__(self, directory, name):
+        self.name = name
+        self.path = join(directory, name)
+
+    def is_dir(self):
+        return isdir(self.path)
+
+    def is_symlink(self):
+        return islink(self.path)
+
+    def stat(self):
+        return os.stat(self.path)
+
+
+def _scan_directory(directory, followlinks, match, accept):
+    """return names of subdirectories to walk and of files matching the
+    `match` and `accept` functions (if not None) in `directory`
+    """
+    dirnames, filenames = [], []
+    try:
+        if scandir is None:
+            entries = [_DirEntry(directory, name)
+                       for name in os.listdir(directory)]
+        else:
+            entries = scandir(directory)
+        for entry in entries:
+            try:
+                is_dir = entry.is_dir()
+            except OSError:
+                is_dir = False
+            if is_dir:
+                if followlinks or not entry.is_symlink():
+                    dirnames.append(entry.name)
+            elif ((match is None or match(entry.name)) and
+                  (accept is None or accept(entry))):
+                filenames.append(entry.name)
+    except OSError:
+        pass # like os.walk, ignore unreadable directories
+    return dirnames, filenames
 
 def unzip(archive, destdir):
     import zipfile
@@ -56,7 +56,7 @@ from shutil import rmtree
 from operator import itemgetter
 from inspect import isgeneratorfunction
 
-from six import PY2, add_metaclass, string_types
+from six import PY2, add_metaclass, string_types, reraise
 from six.moves import builtins, range, configparser, input
 
 from logilab.common.deprecation import class_deprecated, deprecated
@@ -331,6 +331,9 @@ class TestCase(unittest.TestCase):
     """A unittest.TestCase extension with some additional methods."""
     maxDiff = None
     tags = Tags()
+    # number of threads cases yielded by generative tests are dispatched to,
+    # see `parallel_generative`
+    generative_workers = 0
 
     def __init__(self, methodName='runTest'):
         super(TestCase, self).__init__(methodName)
@@ -448,6 +451,11 @@ class TestCase(unittest.TestCase):
             result.stopTest(self)
 
     def _proceed_generative(self, result, testfunc, runcondition=None):
+        workers = getattr(testfunc, 'generative_workers', self.generative_workers)
+        # debuggers need the traceback of the failure being reported
+        if workers > 1 and not getattr(result, 'pdbmode', False):
+            return self._proceed_generative_parallel(result, testfunc, workers,
+                                                     runcondition)
         # cancel startTest()'s increment
         result.testsRun -= 1
         success = True
@@ -486,6 +494,111 @@ class TestCase(unittest.TestCase):
             success = False
         return success
 
+    def _proceed_generative_parallel(self, result, testfunc, workers,
+                                     runcondition=None):
+        """same as `_proceed_generative` but yielded cases are run by a pool
+        of `workers` threads.
+
+        Outcomes are reported in the order cases were yielded, and at most
+        `workers` cases are run ahead of the reported ones, so that no more
+        case is started once the result should stop.
+        """
+        from collections import deque
+        from multiprocessing.pool import ThreadPool
+        # cancel startTest()'s increment
+        result.testsRun -= 1
+        pool = ThreadPool(workers)
+        pending = deque()
+        stopped = []
+        def call(func, args, kwargs):
+            if stopped:
+                return None
+            return self._call_generative_case(func, args, kwargs)
+        def report(maxpending):
+            """report outcomes of cases in order, until only `maxpending` cases
+            whose outcome isn't known yet are left
+            """
+            success = None
+            while pending and (len(pending) > maxpending or pending[0].ready()):
+                outcome = pending.popleft().get()
+                if stopped:
+                    continue
+                status, method, arg = outcome
+                if status is None:
+                    reraise(*arg)
+                result.testsRun += 1
+                if method is not None:
+                    getattr(result, method)(self, arg)
+                if status == 0:
+                    result.addSuccess(self)
+                success = status == 0
+                if result.shouldStop: # either on error or on exitfirst + error
+                    stopped.append(True)
+            return success
+        success = True
+        exc_info = None
+        try:
+            try:
+                for params in testfunc():
+                    if runcondition and not runcondition(testfunc,
+                            skipgenerator=False):
+                        if not (isinstance(params, InnerTest)
+                                and runcondition(params)):
+                            continue
+                    if not isinstance(params, (tuple, list)):
+                        params = (params, )
+                    func = params[0]
+                    args, kwargs = parse_generative_args(params[1:])
+                    pending.append(pool.apply_async(call, (func, args, kwargs)))
+                    status = report(workers)
+                    if status is not None:
+                        success = status
+                    if stopped:
+                        break
+            except KeyboardInterrupt:
+                stopped.append(True)
+                raise
+            except:
+                # an error occurs between two yield, reported once every
+                # case yielded so far has been
+                exc_info = self.__exc_info()
+            status = report(0)
+            if status is not None:
+                success = status
+        finally:
+            pool.terminate()
+            pool.join()
+        if exc_info is not None:
+            exc = exc_info[1]
+            if isinstance(exc, self.failureException):
+                result.addFailure(self, exc_info)
+            elif isinstance(exc, SkipTest):
+                result.addSkip(self, exc)
+                return success
+            else:
+                result.addError(self, exc_info)
+            success = False
+        return success
+
+    def _call_generative_case(self, func, args, kwargs):
+        """call a case yielded by a generative test and return its outcome as
+        a (status, result method, argument) tuple, as `_proceed` would report
+        it (status is None for exceptions to reraise)
+        """
+        try:
+            func(*args, **kwargs)
+        except self.failureException:
+            return 1, 'addFailure', self.__exc_info()
+        except KeyboardInterrupt:
+            return None, None, self.__exc_info()
+        except InnerTestSkipped as e:
+            return 1, 'addSkip', e
+        except SkipTest as e:
+            return 0, 'addSkip', e
+        except:
+            return 2, 'addError', self.__exc_info()
+        return 0, None, None
+
     def _proceed(self, result, testfunc, args=(), kwargs=None):
         """proceed the actual test
         returns 0 on success, 1 on failure, 2 on error
@@ -672,6 +785,18 @@ def tag(*args, **kwargs):
         return func
     return desc
 
+def parallel_generative(workers):
+    """decorator dispatching cases yielded by a generative test to a pool of
+    `workers` threads (see also `TestCase.generative_workers`).
+
+    Cases are run concurrently on the same test case instance, hence they
+    should not rely on its state (e.g. `set_description`).
+    """
+    def desc(func):
+        func.generative_workers = workers
+        return func
+    return desc
+
 def require_version(version):
     """ Compare version of python interpreter to the given one. Skip the test
     if older.
@@ -0,0 +1,94 @@
+# copyright 2003-2016 LOGILAB S.A. (Paris, FRANCE), all rights reserved.
+# contact http://www.logilab.fr/ -- mailto:contact@logilab.fr
+#
+# This file is part of logilab-common.
+#
+# logilab-common is free software: you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License as published by the Free
+# Software Foundation, either version 2.1 of the License, or (at your option) any
+# later version.
+#
+# logilab-common is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License along
+# with logilab-common.  If not, see <http://www.gnu.org/licenses/>.
+"""Benchmark of the hit, miss and evict cost of logilab.common.cache.Cache
+for various cache sizes, and of concurrent reads on Cache and ShardedCache.
+Run it with::
+
+  python test/bench_cache.py [number of operations]
+"""
+from __future__ import print_function
+
+import sys
+from threading import Thread
+from timeit import default_timer
+
+from logilab.common.cache import Cache, ShardedCache
+
+SIZES = (10, 100, 1000, 10000, 100000)
+
+
+def bench_hit(size, number):
+    cache = Cache(size)
+    cache.update((i, i) for i in range(size))
+    keys = [i % size for i in range(number)]
+    start = default_timer()
+    for key in keys:
+        cache[key]
+    return default_timer() - start
+
+def bench_miss(size, number):
+    cache = Cache(size)
+    cache.update((i, i) for i in range(size))
+    keys = list(range(size, size + number))
+    start = default_timer()
+    for key in keys:
+        try:
+            cache[key]
+        except KeyError:
+            pass
+    return default_timer() - start
+
+def bench_evict(size, number):
+    cache = Cache(size)
+    cache.update((i, i) for i in range(size))
+    keys = list(range(size, size + number))
+    start = default_timer()
+    for key in keys:
+        cache[key] = key
+    return default_timer() - start
+
+def bench_threads(cache, nthreads, number):
+    cache.update((i, i) for i in range(1000))
+    def worker():
+        for i in range(number // nthreads):
+            cache[i % 1000]
+    threads = [Thread(target=worker) for i in range(nthreads)]
+    start = default_timer()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return default_timer() - start
+
+
+def run(number=100000):
+    print('%8s %12s %12s %12s' % ('size', 'hit (us)', 'miss (us)', 'evict (us)'))
+    for size in SIZES:
+        timings = [func(size, number) * 1e6 / number
+                   for func in (bench_hit, bench_miss, bench_evict)]
+        print('%8d %12.3f %12.3f %12.3f' % ((size,) + tuple(timings)))
+    print()
+    print('%8s %12s %12s' % ('threads', 'Cache (us)', 'Sharded (us)'))
+    for nthreads in (1, 2, 4, 8):
+        timings = [bench_threads(cache, nthreads, number) * 1e6 / number
+                   for cache in (Cache(1000), ShardedCache(1000))]
+        print('%8d %12.3f %12.3f' % ((nthreads,) + tuple(timings)))
+
+
+if __name__ == '__main__':
+    run(*[int(arg) for arg in sys.argv[1:2]])
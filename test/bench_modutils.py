@@ -0,0 +1,88 @@
+# copyright 2003-2016 LOGILAB S.A. (Paris, FRANCE), all rights reserved.
+# contact http://www.logilab.fr/ -- mailto:contact@logilab.fr
+#
+# This file is part of logilab-common.
+#
+# logilab-common is free software: you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License as published by the Free
+# Software Foundation, either version 2.1 of the License, or (at your option) any
+# later version.
+#
+# logilab-common is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License along
+# with logilab-common.  If not, see <http://www.gnu.org/licenses/>.
+"""Benchmark of module resolution functions of logilab.common.modutils over
+the standard library modules, with and without the resolution cache. Run it
+with::
+
+  python test/bench_modutils.py [number of rounds]
+"""
+from __future__ import print_function
+
+import os
+import sys
+from os.path import join, isdir, exists
+from timeit import default_timer
+
+from logilab.common import modutils
+
+
+def stdlib_modules():
+    """return names of top level modules of the standard library"""
+    modnames = set(sys.builtin_module_names)
+    for directory in (modutils.STD_LIB_DIR,
+                      join(modutils.STD_LIB_DIR, 'lib-dynload')):
+        if not isdir(directory):
+            continue
+        for filename in os.listdir(directory):
+            filepath = join(directory, filename)
+            if isdir(filepath):
+                if exists(join(filepath, '__init__.py')):
+                    modnames.add(filename)
+            elif filename.endswith(('.py', '.so')):
+                modnames.add(filename.split('.')[0])
+    return sorted(modname for modname in modnames if '-' not in modname)
+
+
+def bench(func, modnames, rounds, cache):
+    """time calls to `func` for each module name, `cache` telling what is
+    kept between calls: nothing, the directory index or everything
+    """
+    start = default_timer()
+    for i in range(rounds):
+        for modname in modnames:
+            if cache == 'none':
+                modutils.clear_resolution_cache()
+            elif cache == 'index':
+                modutils._MODULE_FILE_CACHE.clear()
+            try:
+                func(modname)
+            except ImportError:
+                pass
+    return default_timer() - start
+
+
+FUNCTIONS = [
+    ('file_from_modpath', lambda modname: modutils.file_from_modpath([modname])),
+    ('get_module_part', lambda modname: modutils.get_module_part(modname + '.attr')),
+    ('is_standard_module', modutils.is_standard_module),
+    ]
+
+def run(rounds=10):
+    modnames = stdlib_modules()
+    print('%d standard modules, %d rounds' % (len(modnames), rounds))
+    print('%-20s %12s %12s %12s' % ('function', 'no cache (s)', 'index (s)',
+                                    'cached (s)'))
+    for name, func in FUNCTIONS:
+        print('%-20s %12.3f %12.3f %12.3f' % (
+            name, bench(func, modnames, rounds, 'none'),
+            bench(func, modnames, rounds, 'index'),
+            bench(func, modnames, rounds, 'all')))
+
+
+if __name__ == '__main__':
+    run(*[int(arg) for arg in sys.argv[1:2]])
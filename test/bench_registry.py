@@ -0,0 +1,200 @@
+# copyright 2003-2016 LOGILAB S.A. (Paris, FRANCE), all rights reserved.
+# contact http://www.logilab.fr/ -- mailto:contact@logilab.fr
+#
+# This file is part of logilab-common.
+#
+# logilab-common is free software: you can redistribute it and/or modify it under
+# the terms of the GNU Lesser General Public License as published by the Free
+# Software Foundation, either version 2.1 of the License, or (at your option) any
+# later version.
+#
+# logilab-common is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Lesser General Public License along
+# with logilab-common.  If not, see <http://www.gnu.org/licenses/>.
+"""Benchmarks of the registry:
+
+* interpreted vs compiled evaluation of deep predicate trees (see
+  logilab.common.registry.compile_predicate)
+
+* eager vs lazy registration of a synthetic tree of modules (see
+  RegistryStore.register_modnames)
+
+* full vs partial reload after a module change (see
+  RegistryStore.reload_modules)
+
+Run them with::
+
+  python test/bench_registry.py predicates [number of calls]
+  python test/bench_registry.py startup [number of modules]
+  python test/bench_registry.py reload [number of modules]
+"""
+from __future__ import print_function
+
+import os
+import sys
+import shutil
+import tempfile
+from os.path import join
+from timeit import default_timer
+
+from logilab.common.registry import (Predicate, RegistryStore,
+                                     compile_predicate)
+
+
+class score(Predicate):
+    def __init__(self, value):
+        self.value = value
+    def __call__(self, cls, *args, **kwargs):
+        return self.value
+
+
+def deep_tree(depth, width=3):
+    """return a predicate tree of the given depth alternating AND and OR
+    nodes, each of them with `width` children
+    """
+    if depth == 0:
+        return score(1)
+    children = [deep_tree(depth - 1, width) for i in range(width)]
+    if depth % 2:
+        selector = children[0]
+        for child in children[1:]:
+            selector = selector & child
+    else:
+        selector = children[0] | ~score(0)
+        for child in children[1:]:
+            selector = selector | child
+    return selector
+
+
+def bench(selector, number):
+    start = default_timer()
+    for i in range(number):
+        selector(None, 'arg', key='value')
+    return default_timer() - start
+
+
+def run_predicates(number=10000):
+    print('%6s %16s %16s %8s' % ('depth', 'interpreted (us)', 'compiled (us)',
+                                 'speedup'))
+    for depth in range(1, 8):
+        selector = deep_tree(depth)
+        interpreted = bench(selector, number) * 1e6 / number
+        compiled = bench(compile_predicate(selector), number) * 1e6 / number
+        print('%6d %16.3f %16.3f %8.2f' % (depth, interpreted, compiled,
+                                           interpreted / compiled))
+
+
+MODULE_TEMPLATE = '''
+from logilab.common.registry import RegistrableObject, yes
+
+class _Base(RegistrableObject):
+    __registry__ = 'reg%(reg)s'
+    __abstract__ = True
+
+%(classes)s
+'''
+
+CLASS_TEMPLATE = '''
+class Object%(num)s(_Base):
+    __regid__ = 'obj%(num)s'
+    __select__ = yes()
+
+    def method%(num)s(self, arg):
+        return [item * 2 for item in arg if item]
+'''
+
+def synthetic_tree(directory, nmodules, nclasses=5, nregistries=10):
+    """write a package of `nmodules` modules defining `nclasses` registrable
+    classes each into `directory` and return their module names
+    """
+    pkgdir = join(directory, 'benchpkg')
+    os.mkdir(pkgdir)
+    open(join(pkgdir, '__init__.py'), 'w').close()
+    modnames = []
+    for i in range(nmodules):
+        classes = ''.join(CLASS_TEMPLATE % {'num': '%s_%s' % (i, j)}
+                          for j in range(nclasses))
+        with open(join(pkgdir, 'mod%s.py' % i), 'w') as stream:
+            stream.write(MODULE_TEMPLATE % {'reg': i % nregistries,
+                                            'classes': classes})
+        modnames.append('benchpkg.mod%s' % i)
+    return modnames
+
+
+def purge_modules():
+    for modname in list(sys.modules):
+        if modname.startswith('benchpkg'):
+            del sys.modules[modname]
+
+
+def bench_startup(modnames, **kwargs):
+    """return the time needed to register `modnames` then select an object"""
+    purge_modules()
+    start = default_timer()
+    store = RegistryStore()
+    store.register_modnames(modnames, **kwargs)
+    store['reg0'].select('obj0_0')
+    return default_timer() - start
+
+
+def run_startup(nmodules=2000):
+    directory = tempfile.mkdtemp()
+    sys.path.insert(0, directory)
+    try:
+        modnames = synthetic_tree(directory, nmodules)
+        manifest = join(directory, 'manifest.json')
+        print('%d modules' % nmodules)
+        # compile modules once so that each run pays the same import cost
+        bench_startup(modnames)
+        print('%-32s %8.3f s' % ('eager', bench_startup(modnames)))
+        print('%-32s %8.3f s' % ('lazy, no manifest',
+                                 bench_startup(modnames, lazy=True)))
+        print('%-32s %8.3f s' % ('lazy, manifest (cold)',
+                                 bench_startup(modnames, lazy=True,
+                                               manifest=manifest)))
+        print('%-32s %8.3f s' % ('lazy, manifest (warm)',
+                                 bench_startup(modnames, lazy=True,
+                                               manifest=manifest)))
+    finally:
+        sys.path.remove(directory)
+        shutil.rmtree(directory)
+
+
+def run_reload(nmodules=2000):
+    directory = tempfile.mkdtemp()
+    sys.path.insert(0, directory)
+    try:
+        modnames = synthetic_tree(directory, nmodules)
+        path = [join(directory, 'benchpkg')]
+        changed = join(directory, 'benchpkg', 'mod0.py')
+        store = RegistryStore()
+        store.register_modnames(modnames)
+        store.is_reload_needed(path)
+        print('%d modules' % nmodules)
+        for label in ('full', 'partial'):
+            # trigger a change with a later modification date
+            mtime = os.stat(changed).st_mtime + 10
+            os.utime(changed, (mtime, mtime))
+            start = default_timer()
+            changes = store.changed_modules(path)
+            if label == 'full':
+                purge_modules()
+                store.register_modnames(modnames)
+            else:
+                store.reload_modules(changes)
+            store['reg0'].select('obj0_0')
+            print('%-32s %8.3f s' % (label, default_timer() - start))
+    finally:
+        sys.path.remove(directory)
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    benchmark = {'predicates': run_predicates,
+             'startup': run_startup,
+             'reload': run_reload}[sys.argv[1] if sys.argv[1:] else 'predicates']
+    benchmark(*[int(arg) for arg in sys.argv[2:3]])
@@ -18,7 +18,13 @@
 # with logilab-common.  If not, see <http://www.gnu.org/licenses/>.
 
 from logilab.common.testlib import TestCase, unittest_main, TestSuite
-from logilab.common.cache import Cache
+import os
+import shutil
+import tempfile
+from threading import Thread
+
+from logilab.common.cache import (Cache, ShardedCache, LFUCache, TTLCache,
+                                   CostCache, PersistentCache)
 
 class CacheTestCase(TestCase):
 
@@ -124,6 +130,339 @@ class CacheTestCase(TestCase):
         else:
             self.fail('excepted KeyError')
 
+    def test_pop(self):
+        """Checks that pop removes the key from the usage list"""
+        self.cache[1] = 'foo'
+        self.assertEqual(self.cache.pop(1), 'foo')
+        self.assertEqual(len(self.cache._usage), 0)
+        self.assertEqual(self.cache.pop(1, None), None)
+        self.assertRaises(KeyError, self.cache.pop, 1)
+
+    def test_popitem(self):
+        """Checks that popitem removes the least recently used item"""
+        self.cache[1] = 'foo'
+        self.cache[2] = 'bar'
+        self.cache[1]
+        self.assertEqual(self.cache.popitem(), (2, 'bar'))
+        self.assertEqual(self.cache.popitem(), (1, 'foo'))
+        self.assertEqual(len(self.cache._usage), 0)
+        self.assertRaises(KeyError, self.cache.popitem)
+
+    def test_setdefault(self):
+        """Checks that setdefault inserts missing keys and updates usage"""
+        self.assertEqual(self.cache.setdefault(1, 'foo'), 'foo')
+        self.cache[2] = 'bar'
+        self.assertEqual(self.cache.setdefault(1, 'baz'), 'foo')
+        self.assertEqual(self.cache._usage[-1], 1)
+        self.assertCountEqual(self.cache._usage, self.cache.keys())
+
+    def test_update(self):
+        """Checks that update inserts items in order, recycling old ones"""
+        self.cache[0] = 'zero'
+        self.cache.update([(1, 'foo'), (2, 'bar'), (3, 'baz')])
+        self.cache.update({4: 'foz'})
+        self.cache.update(five='fuz')
+        self.assertTrue(0 not in self.cache)
+        self.assertEqual(list(self.cache._usage), [1, 2, 3, 4, 'five'])
+        self.cache.update(self.cache)
+        self.assertEqual(len(self.cache), 5)
+        self.assertCountEqual(self.cache._usage, self.cache.keys())
+
+    def test_recycling_order(self):
+        """Checks that the least recently used element is removed first"""
+        for i in range(5):
+            self.cache[i] = i
+        self.cache[0]
+        self.cache[2] = 'two'
+        self.cache[5] = 5
+        self.cache[6] = 6
+        self.assertEqual(list(self.cache._usage), [4, 0, 2, 5, 6])
+        self.assertEqual(self.cache._usage[0], 4)
+        self.assertCountEqual(self.cache._usage, self.cache.keys())
+
+    def test_stats(self):
+        """Checks hits, misses and evictions statistics"""
+        for i in range(7):
+            self.cache[i] = i
+        self.cache[6]
+        self.cache.get(0)
+        self.assertRaises(KeyError, self.cache.__getitem__, 1)
+        self.assertEqual(self.cache.stats(),
+                         {'hits': 1, 'misses': 2, 'evictions': 2,
+                          'currsize': 5, 'maxsize': 5})
+
+
+class LFUCacheTestCase(TestCase):
+
+    def test_recycling(self):
+        """Checks that the least frequently used element is removed first"""
+        cache = LFUCache(3)
+        cache[1] = 'foo'
+        cache[2] = 'bar'
+        cache[3] = 'baz'
+        cache[1]
+        cache[1]
+        cache[3]
+        cache[4] = 'foz'
+        self.assertCountEqual(cache.keys(), [1, 3, 4])
+        self.assertEqual(list(cache._usage), [4, 3, 1])
+        cache[5] = 'fuz'
+        self.assertCountEqual(cache.keys(), [1, 3, 5])
+        self.assertEqual(cache.popitem(), (5, 'fuz'))
+        del cache[3]
+        self.assertEqual(list(cache._usage), [1])
+        self.assertEqual(cache.stats()['evictions'], 2)
+
+
+class TTLCacheTestCase(TestCase):
+
+    def setUp(self):
+        self.now = 0
+        self.cache = TTLCache(3, ttl=10, timer=lambda: self.now)
+
+    def test_expiration(self):
+        """Checks that entries expire lazily"""
+        self.cache[1] = 'foo'
+        self.now = 5
+        self.cache[2] = 'bar'
+        self.assertEqual(self.cache[1], 'foo')
+        self.now = 10
+        self.assertFalse(1 in self.cache)
+        self.assertRaises(KeyError, self.cache.__getitem__, 1)
+        self.assertEqual(self.cache[2], 'bar')
+        self.assertEqual(len(self.cache), 1)
+        self.now = 15
+        self.cache[3] = 'baz'
+        self.assertEqual(list(self.cache.keys()), [3])
+        self.assertEqual(self.cache.stats()['expirations'], 2)
+
+    def test_reset(self):
+        """Checks that setting an entry again restarts its time to live"""
+        self.cache[1] = 'foo'
+        self.now = 5
+        self.cache[1] = 'bar'
+        self.now = 12
+        self.assertEqual(self.cache[1], 'bar')
+        self.cache.clear()
+        self.assertFalse(self.cache._expires)
+
+
+class CostCacheTestCase(TestCase):
+
+    def test_recycling(self):
+        """Checks that entries are evicted when the maximum cost is reached"""
+        cache = CostCache(10, sizer=len)
+        cache['a'] = 'x' * 4
+        cache['b'] = 'x' * 4
+        cache['a']
+        cache['c'] = 'x' * 4
+        self.assertCountEqual(cache.keys(), ['a', 'c'])
+        self.assertEqual(cache.cost, 8)
+        cache['c'] = 'x'
+        self.assertEqual(cache.cost, 5)
+        cache['d'] = 'x' * 11
+        self.assertFalse('d' in cache)
+        self.assertEqual(cache.pop('a'), 'x' * 4)
+        self.assertEqual(cache.cost, 1)
+        stats = cache.stats()
+        self.assertEqual((stats['cost'], stats['maxcost'], stats['evictions']),
+                         (1, 10, 1))
+
+    def test_size(self):
+        """Checks that the number of entries may be bounded too"""
+        cache = CostCache(100, size=2, sizer=len)
+        for key in 'abc':
+            cache[key] = key
+        self.assertCountEqual(cache.keys(), ['b', 'c'])
+        self.assertEqual(cache.cost, 2)
+
+
+class ShardedCacheTestCase(TestCase):
+
+    def setUp(self):
+        self.cache = ShardedCache(10, shards=4)
+
+    def test_size_budget(self):
+        """Checks that the size budget is global to all shards"""
+        for i in range(100):
+            self.cache[i] = i
+        self.assertEqual(len(self.cache), 10)
+        self.assertEqual(self.cache.stats()['evictions'], 90)
+        self.assertEqual(self.cache.stats()['maxsize'], 10)
+        self.assertEqual(len(ShardedCache(2, shards=16)._shards), 2)
+        # entries are not limited by their shard
+        self.cache.clear()
+        self.assertEqual(self.cache._count, 0)
+        self.cache._shard = lambda key: self.cache._shards[0]
+        for i in range(10):
+            self.cache[i] = i
+        self.assertEqual(len(self.cache), 10)
+        self.assertEqual(len(self.cache._shards[0]), 10)
+
+    def test_largest_shard_eviction(self):
+        """Checks that entries are evicted from the largest shard"""
+        shards = self.cache._shards
+        self.cache._shard = lambda key: shards[key[0]]
+        for i in range(7):
+            self.cache[(0, i)] = i
+        for i in range(3):
+            self.cache[(1, i)] = i
+        self.cache[(1, 3)] = 3
+        self.assertEqual(len(shards[0]), 6)
+        self.assertFalse((0, 0) in self.cache)
+        self.assertEqual(len(shards[1]), 4)
+
+    def test_dict_api(self):
+        """Checks the dictionary like interface"""
+        self.cache['foo'] = 'bar'
+        self.cache.update({'spam': 'eggs'}, baz='qux')
+        self.assertEqual(self.cache['foo'], 'bar')
+        self.assertTrue('spam' in self.cache)
+        self.assertEqual(self.cache.get('nope'), None)
+        self.assertEqual(self.cache.setdefault('baz', None), 'qux')
+        self.assertCountEqual(self.cache.keys(), ['foo', 'spam', 'baz'])
+        self.assertCountEqual(self.cache.items(),
+                              [('foo', 'bar'), ('spam', 'eggs'), ('baz', 'qux')])
+        del self.cache['foo']
+        self.assertRaises(KeyError, self.cache.__getitem__, 'foo')
+        self.assertEqual(self.cache.pop('spam'), 'eggs')
+        self.assertEqual(self.cache.pop('spam', None), None)
+        self.assertRaises(KeyError, self.cache.pop, 'spam')
+        self.cache.clear()
+        self.assertEqual(len(self.cache), 0)
+
+    def test_threads(self):
+        """Checks concurrent access and contention counters"""
+        def worker(offset):
+            for i in range(1000):
+                self.cache[(offset + i) % 20] = i
+                self.cache.get(i % 20)
+        threads = [Thread(target=worker, args=(i,)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(self.cache), 10)
+        self.assertEqual(self.cache.stats()['currsize'], 10)
+        self.assertEqual(len(self.cache.contentions()), 4)
+        for shard in self.cache._shards:
+            self.assertCountEqual(shard._usage, shard.keys())
+
+
+class PersistentCacheTestCase(TestCase):
+
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tempdir, 'cache.sqlite')
+        self.cache = PersistentCache(self.path, size=3, version='1')
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir)
+
+    def test_dict_api(self):
+        """Checks the dictionary like interface"""
+        self.cache[('foo', 1)] = {'bar': [1, 2]}
+        self.assertEqual(self.cache[('foo', 1)], {'bar': [1, 2]})
+        self.assertTrue(('foo', 1) in self.cache)
+        self.assertEqual(self.cache.get('nope'), None)
+        self.assertEqual(self.cache.setdefault('spam', 'eggs'), 'eggs')
+        self.assertEqual(len(self.cache), 2)
+        del self.cache['spam']
+        self.assertRaises(KeyError, self.cache.__delitem__, 'spam')
+        self.assertEqual(self.cache.pop(('foo', 1)), {'bar': [1, 2]})
+        self.assertEqual(self.cache.pop(('foo', 1), None), None)
+        self.assertRaises(KeyError, self.cache.pop, ('foo', 1))
+        self.assertEqual(len(self.cache), 0)
+
+    def test_equal_keys(self):
+        """Checks that equal keys built differently share the same entry"""
+        first = {'a': 1, 'b': frozenset(['x', 'y', 'z'])}
+        second = {'b': set(['z', 'y', 'x'])}
+        second['a'] = 1.0
+        self.assertEqual(first, second)
+        self.cache[('foo', first)] = 'bar'
+        self.assertEqual(self.cache[('foo', second)], 'bar')
+        self.cache[set(range(100))] = 'range'
+        self.assertEqual(self.cache[set(range(99, -1, -1))], 'range')
+        self.cache[(True, 2)] = 'number'
+        self.assertEqual(self.cache[(1, 2.0)], 'number')
+        self.assertFalse(('foo', [first]) in self.cache)
+        self.assertFalse([1, 2] in self.cache)
+        self.assertEqual(len(self.cache), 3)
+
+    def test_shared(self):
+        """Checks that entries are shared through the database file"""
+        self.cache['foo'] = 'bar'
+        other = PersistentCache(self.path, size=3, version='1')
+        self.assertEqual(other['foo'], 'bar')
+        ns = other.namespace('ns')
+        self.assertFalse('foo' in ns)
+        ns['foo'] = 'baz'
+        self.assertEqual(self.cache['foo'], 'bar')
+        ns.clear()
+        self.assertEqual(len(ns), 0)
+        self.assertEqual(len(other), 1)
+
+    def test_version(self):
+        """Checks that entries set with another version are ignored"""
+        self.cache['foo'] = 'bar'
+        self.cache['spam'] = 'eggs'
+        other = PersistentCache(self.path, size=3, version='2')
+        self.assertFalse('foo' in other)
+        self.assertRaises(KeyError, other.__getitem__, 'foo')
+        other.purge()
+        self.assertFalse('spam' in self.cache)
+        self.assertFalse('foo' in self.cache)
+
+    def test_recycling(self):
+        """Checks that the least recently used entries are evicted"""
+        self.cache['a'] = 1
+        self.cache['b'] = 2
+        self.cache['c'] = 3
+        self.cache['a']
+        self.cache['d'] = 4
+        self.assertFalse('b' in self.cache)
+        self.assertEqual(len(self.cache), 3)
+        stats = self.cache.stats()
+        self.assertEqual((stats['hits'], stats['evictions'], stats['currsize']),
+                         (1, 1, 3))
+
+    def test_count(self):
+        """Checks that entries are counted without querying the database on
+        each insertion
+        """
+        self.cache.recount_interval = 1000
+        self.cache['a'] = 1
+        self.assertEqual(self.cache._cnx.count, 1)
+        self.cache['a'] = 2
+        ns = self.cache.namespace('ns')
+        ns['a'] = 1
+        self.assertEqual(self.cache._cnx.count, 2)
+        del ns['a']
+        self.cache.pop('nope', None)
+        self.assertEqual(self.cache._cnx.count, 1)
+        # entries inserted by another process are seen once recounting
+        other = PersistentCache(self.path, size=0, version='1')
+        other['b'] = other['c'] = other['d'] = 1
+        self.cache['e'] = 1
+        self.assertEqual(len(self.cache), 5)
+        self.cache.recount_interval = 1
+        self.cache['f'] = 1
+        self.assertEqual(self.cache._cnx.count, 3)
+        self.assertEqual(len(self.cache), 3)
+        self.assertFalse('a' in self.cache)
+
+    def test_atimes_batch(self):
+        """Checks that access times are written by batches"""
+        self.cache['a'] = 1
+        self.cache['b'] = 2
+        self.cache['a']
+        self.assertEqual(list(self.cache._cnx.atimes),
+                         [('', self.cache._hash('a'))])
+        self.cache._cnx.atimes_batch = 2
+        self.cache['b']
+        self.assertEqual(self.cache._cnx.atimes, {})
+
 
 if __name__ == "__main__":
     unittest_main()
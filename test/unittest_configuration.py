@@ -19,6 +19,8 @@ import tempfile
 import os
 from os.path import join, dirname, abspath
 import re
+import subprocess
+import sys
 
 from sys import version_info
 
@@ -30,7 +32,7 @@ from logilab.common.testlib import TestCase, unittest_main
 from logilab.common.optik_ext import OptionValueError
 from logilab.common.configuration import Configuration, OptionError, \
      OptionsManagerMixIn, OptionsProviderMixIn, Method, read_old_config, \
-     merge_options
+     merge_options, clear_config_file_cache
 
 DATA = join(dirname(abspath(__file__)), 'data')
 
@@ -448,6 +450,169 @@ diffgroup=pouet
 
 #opt-b-2=""")
 
+class CompiledSchemaConfigurationTC(ConfigurationTC):
+
+    def setUp(self):
+        super(CompiledSchemaConfigurationTC, self).setUp()
+        self.cfg.use_compiled_schema = True
+        self.file = tempfile.mktemp()
+
+    def tearDown(self):
+        clear_config_file_cache()
+        if os.path.exists(self.file):
+            os.remove(self.file)
+
+    def write(self, content):
+        mtime = os.path.exists(self.file) and os.stat(self.file).st_mtime
+        with open(self.file, 'w') as stream:
+            stream.write(content)
+        # ensure the modification date changes
+        mtime = max(mtime, os.stat(self.file).st_mtime) + 2
+        os.utime(self.file, (mtime, mtime))
+
+    def test_schema(self):
+        schema = self.cfg.compiled_schema()
+        provider, validator, attrname, optdict = schema['reset-value']
+        self.assertIs(provider, self.cfg)
+        self.assertEqual(attrname, 'value')
+        self.assertEqual(validator('toto'), 'toto')
+        self.assertEqual(schema['number'][1]('3'), 3)
+        self.assertRaises(OptionValueError, schema['number'][1], 'youpi')
+        self.assertRaises(OptionValueError, schema['choice'][1], 'youpi')
+        # named options are merged by the provider
+        self.assertIsNone(schema['named'][1])
+        self.assertIs(schema, self.cfg.compiled_schema())
+        cfg = Configuration(options=[('old', {'type': 'int'})])
+        self.assertEqual(list(cfg.compiled_schema()), ['old'])
+        cfg.register_options([('new', {'type': 'int'})])
+        self.assertEqual(sorted(cfg.compiled_schema()), ['new', 'old'])
+
+    def test_cached_file(self):
+        self.write('[Test]\nnumber=3\nchoice=ye\n')
+        self.cfg.load_file_configuration(self.file)
+        self.assertEqual(self.cfg['number'], 3)
+        self.assertEqual(self.cfg['choice'], 'ye')
+        other = MyConfiguration(name='test', options=OPTIONS)
+        other.use_compiled_schema = True
+        other.load_file_configuration(self.file)
+        self.assertEqual(other['number'], 3)
+        self.write('[Test]\nnumber=4\n')
+        self.cfg.load_file_configuration(self.file)
+        self.assertEqual(self.cfg['number'], 4)
+        self.assertEqual(self.cfg['choice'], 'ye')
+
+    def test_invalid_value(self):
+        self.write('[Test]\nvalue=tata\nnumber=youpi\n')
+        self.assertRaises(OptionValueError,
+                          self.cfg.load_file_configuration, self.file)
+        self.assertEqual(self.cfg['number'], 2)
+        self.assertEqual(self.cfg['value'], 'tata')
+
+    def test_set_option_overridden(self):
+        values = []
+        class NotifyingConfiguration(MyConfiguration):
+            def set_option(self, opt, value, action=None, optdict=None):
+                values.append((opt, value))
+                super(NotifyingConfiguration, self).set_option(opt, value, action, optdict)
+        cfg = NotifyingConfiguration(name='test', options=OPTIONS)
+        cfg.use_compiled_schema = True
+        del values[:]
+        self.write('[Test]\nnumber=3\n')
+        cfg.load_file_configuration(self.file)
+        self.assertEqual(values, [('number', '3')])
+        self.assertEqual(cfg['number'], 3)
+
+
+class WatchTC(TestCase):
+    polling = False
+
+    def setUp(self):
+        self.file = tempfile.mktemp()
+        self.write('[Test]\nnumber=3\nchoice=ye\n')
+        self.changes = []
+        changes = self.changes
+        class NotifyingConfiguration(MyConfiguration):
+            def set_option(self, opt, value, action=None, optdict=None):
+                changes.append(opt)
+                super(NotifyingConfiguration, self).set_option(opt, value, action, optdict)
+        self.cfg = NotifyingConfiguration(name='test', options=OPTIONS,
+                                          config_file=self.file)
+        self.cfg.load_file_configuration()
+        self.cfg.watch(polling=self.polling)
+        del self.changes[:]
+
+    def tearDown(self):
+        self.cfg.stop_watching()
+        clear_config_file_cache()
+        if os.path.exists(self.file):
+            os.remove(self.file)
+
+    def write(self, content):
+        mtime = os.path.exists(self.file) and os.stat(self.file).st_mtime
+        with open(self.file, 'w') as stream:
+            stream.write(content)
+        # ensure the modification date changes when polling
+        mtime = max(mtime, os.stat(self.file).st_mtime) + 2
+        os.utime(self.file, (mtime, mtime))
+
+    def test_no_change(self):
+        self.assertEqual(self.cfg.reload_config_file(), [])
+        self.write('[Test]\nchoice=ye\nnumber=3\n')
+        self.assertEqual(self.cfg.reload_config_file(), [])
+        self.assertEqual(self.changes, [])
+
+    def test_changed(self):
+        self.write('[Test]\nnumber=4\nchoice=ye\nvalue=tata\n')
+        self.assertEqual(self.cfg.reload_config_file(), ['number', 'value'])
+        self.assertEqual(self.changes, ['number', 'value'])
+        self.assertEqual(self.cfg['number'], 4)
+        self.assertEqual(self.cfg['value'], 'tata')
+        self.assertEqual(self.cfg.reload_config_file(), [])
+
+    def test_removed(self):
+        self.write('[Test]\nchoice=ye\n')
+        self.assertEqual(self.cfg.reload_config_file(), ['number'])
+        self.assertEqual(self.cfg['number'], 2)
+        os.remove(self.file)
+        self.assertEqual(self.cfg.reload_config_file(), ['choice'])
+        self.assertEqual(self.cfg['choice'], 'yo')
+
+    def test_invalid(self):
+        self.write('[Test]\nnumber=4\nchoice=youpi\n')
+        self.assertRaises(OptionValueError, self.cfg.reload_config_file)
+        self.assertEqual(self.changes, [])
+        self.assertEqual(self.cfg['number'], 3)
+        self.write('[Test]\nnumber=4\nchoice=yo\n')
+        self.assertEqual(self.cfg.reload_config_file(), ['number', 'choice'])
+        self.assertEqual(self.cfg['choice'], 'yo')
+
+
+    def test_swapped(self):
+        cfg = MyConfiguration(name='test', options=OPTIONS,
+                              config_file=self.file)
+        cfg.load_file_configuration()
+        cfg.watch(polling=self.polling)
+        try:
+            config = cfg.config
+            self.write('[Test]\nnumber=4\nchoice=yo\n')
+            self.assertEqual(cfg.reload_config_file(), ['number', 'choice'])
+            # values are set on a new config object
+            self.assertIsNot(cfg.config, config)
+            self.assertEqual((config.number, config.choice), (3, 'ye'))
+            self.assertEqual((cfg['number'], cfg['choice']), (4, 'yo'))
+            config = cfg.config
+            self.write('[Test]\nnumber=5\nchoice=youpi\n')
+            self.assertRaises(OptionValueError, cfg.reload_config_file)
+            self.assertIs(cfg.config, config)
+            self.assertEqual(cfg['number'], 4)
+        finally:
+            cfg.stop_watching()
+
+
+class PollingWatchTC(WatchTC):
+    polling = True
+
+
 class Linter(OptionsManagerMixIn, OptionsProviderMixIn):
     options = (
         ('profile', {'type' : 'yn', 'metavar' : '<y_or_n>',
@@ -505,5 +670,17 @@ class MergeTC(TestCase):
         self.assertEqual(merged[1][0], 'dothis')
         self.assertEqual(merged[1][1]['default'], True)
 
+
+class ImportTC(TestCase):
+
+    def test_deferred_imports(self):
+        modnames = ('distutils', 'logilab.common.modutils',
+                    'logilab.common.optik_ext', 'logilab.common.textutils')
+        output = subprocess.check_output(
+            [sys.executable, '-c',
+             'import sys, logilab.common.configuration\n'
+             'print(sorted(m for m in %r if m in sys.modules))' % (modnames,)])
+        self.assertEqual('[]', output.decode().strip())
+
 if __name__ == '__main__':
     unittest_main()
@@ -17,12 +17,19 @@
 # with logilab-common.  If not, see <http://www.gnu.org/licenses/>.
 """unit tests for the decorators module
 """
+import gc
+import os
+import shutil
 import sys
+import tempfile
+import time
 import types
+from threading import Event, Lock, Thread
 
 from logilab.common.testlib import TestCase, unittest_main
+from logilab.common.cache import Cache, TTLCache, PersistentCache
 from logilab.common.decorators import (monkeypatch, cached, clear_cache,
-                                       copy_cache, cachedproperty)
+                                       copy_cache, cachedproperty, cache_info)
 
 class DecoratorsTC(TestCase):
 
@@ -169,6 +176,217 @@ class DecoratorsTC(TestCase):
         copy_cache(foo2, 'foo', foo)
         self.assertEqual(foo2._foo, {(1,): None})
 
+    def test_cached_maxsize(self):
+        class Foo(object):
+            @cached(maxsize=2)
+            def foo(self, arg):
+                return arg * 2
+        foo = Foo()
+        for arg in (1, 2, 1, 3):
+            foo.foo(arg)
+        self.assertIsInstance(foo._foo_cache_, Cache)
+        self.assertCountEqual(foo._foo_cache_.keys(), [(1,), (3,)])
+        self.assertEqual(Foo.foo.cache_info(), (1, 3, 2, None))
+        self.assertEqual(cache_info(foo, 'foo'), (1, 3, 2, 2))
+        foo2 = Foo()
+        copy_cache(foo2, 'foo', foo)
+        self.assertEqual(foo2.foo(3), 6)
+        self.assertEqual(cache_info(foo2, 'foo').hits, 2)
+        clear_cache(foo, 'foo')
+        self.assertEqual(cache_info(foo, 'foo').currsize, 0)
+
+    def test_cached_ttl(self):
+        class Foo(object):
+            x = 0
+            @cached(ttl=60)
+            def foo(self):
+                self.x += 1
+                return self.x
+        foo = Foo()
+        self.assertEqual(foo.foo(), 1)
+        self.assertEqual(foo.foo(), 1)
+        self.assertIsInstance(foo._foo_cache_, TTLCache)
+        foo._foo_cache_._expires[()] = 0
+        self.assertEqual(foo.foo(), 2)
+        self.assertEqual(cache_info(foo, 'foo'), (1, 2, None, 1))
+
+    def test_cached_weakkeys(self):
+        class Key(object):
+            pass
+        class Foo(object):
+            @cached(weakkeys=True)
+            def foo(self, key, arg):
+                return arg
+            @cached(weakkeys=True, keyarg=1)
+            def bar(self, key):
+                return 42
+        foo = Foo()
+        key = Key()
+        self.assertEqual(foo.foo(key, 1), 1)
+        self.assertEqual(foo.foo(key, 1), 1)
+        self.assertEqual(foo.bar(key), 42)
+        self.assertEqual(cache_info(foo, 'foo'), (1, 1, None, 1))
+        del key
+        gc.collect()
+        foo.foo(1, 1)
+        foo.bar(1)
+        self.assertEqual(list(foo._foo_cache_), [(1, 1)])
+        self.assertEqual(list(foo._bar_cache_), [1])
+
+    def test_cached_single_info(self):
+        class Foo(object):
+            @cached
+            def foo(self):
+                return 42
+        foo = Foo()
+        foo.foo()
+        foo.foo()
+        self.assertEqual(cache_info(foo, 'foo'), (1, 1, 1, 1))
+        self.assertEqual(cache_info(Foo(), 'foo').currsize, 0)
+
+    def _run_threads(self, func, nthreads=16):
+        start = Event()
+        results = []
+        def worker():
+            start.wait()
+            try:
+                results.append(func())
+            except Exception as exc:
+                results.append(exc)
+        threads = [Thread(target=worker) for i in range(nthreads)]
+        for thread in threads:
+            thread.start()
+        start.set()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_cached_classmethod(self):
+        calls = []
+        class Foo(object):
+            @classmethod
+            @cached
+            def foo(cls, arg):
+                calls.append(arg)
+                return [arg]
+            @classmethod
+            @cached(concurrency='singleflight', maxsize=10)
+            def bar(cls, arg):
+                calls.append(arg)
+                return [arg]
+        # the cache is stored on the class, shared by its instances
+        for meth, expected in ((Foo.foo, [1, 2]), (Foo().foo, []),
+                               (Foo.bar, [1, 2]), (Foo().bar, [])):
+            del calls[:]
+            self.assertEqual(meth(1), [1])
+            self.assertEqual(meth(1), [1])
+            self.assertEqual(meth(2), [2])
+            self.assertEqual(calls, expected)
+        self.assertEqual(Foo._foo_cache_, {(1,): [1], (2,): [2]})
+        self.assertEqual(Foo.bar.cache_info(Foo).currsize, 2)
+        Foo.foo.cache_obj.clear(Foo)
+        self.assertFalse(hasattr(Foo, '_foo_cache_'))
+
+    def test_cached_singleflight(self):
+        calls = []
+        lock = Lock()
+        class Foo(object):
+            @cached(concurrency='singleflight')
+            def foo(self):
+                with lock:
+                    calls.append(None)
+                # give other threads a chance to miss the cache
+                for i in range(10000):
+                    pass
+                return object()
+            @cached(concurrency='singleflight', maxsize=10)
+            def bar(self, arg):
+                with lock:
+                    calls.append(arg)
+                for i in range(10000):
+                    pass
+                return [arg]
+        foo = Foo()
+        for i in range(20):
+            del calls[:]
+            clear_cache(foo, 'foo')
+            results = self._run_threads(foo.foo)
+            self.assertEqual(len(calls), 1)
+            self.assertEqual(len(set(id(result) for result in results)), 1)
+            del calls[:]
+            clear_cache(foo, 'bar')
+            results = self._run_threads(lambda: foo.bar(i % 3))
+            self.assertEqual(calls, [i % 3])
+            self.assertEqual(len(set(id(result) for result in results)), 1)
+        self.assertEqual(cache_info(foo, 'bar').currsize, 1)
+
+    def test_cached_singleflight_exception(self):
+        calls = []
+        lock = Lock()
+        entered = []
+        class Foo(object):
+            @cached(concurrency='singleflight')
+            def foo(self, arg):
+                exc = ValueError(arg)
+                calls.append(exc)
+                # let every thread join the flight before failing
+                while len(entered) < 16:
+                    time.sleep(0.001)
+                time.sleep(0.05)
+                raise exc
+        def call():
+            with lock:
+                entered.append(None)
+            return foo.foo(1)
+        foo = Foo()
+        for i in range(5):
+            del calls[:], entered[:]
+            results = self._run_threads(call)
+            # exceptions aren't cached, a single call failed for all threads
+            self.assertEqual(len(calls), 1)
+            self.assertEqual(16, len(results))
+            for result in results:
+                self.assertIs(result, calls[0])
+        self.assertEqual(cache_info(foo, 'foo').currsize, 0)
+
+    def test_cached_backend(self):
+        tempdir = tempfile.mkdtemp()
+        try:
+            backend = PersistentCache(os.path.join(tempdir, 'cache.sqlite'))
+            calls = []
+            class Foo(object):
+                @cached(backend=backend)
+                def foo(self, arg):
+                    calls.append(arg)
+                    return [arg]
+                @cached(backend=backend)
+                def bar(self):
+                    calls.append(None)
+                    return 42
+            self.assertEqual(Foo().foo(1), [1])
+            self.assertEqual(Foo().foo(1), [1])
+            self.assertEqual(Foo().bar(), 42)
+            self.assertEqual(Foo().bar(), 42)
+            self.assertEqual(calls, [1, None])
+            foo = Foo()
+            self.assertEqual(cache_info(foo, 'foo').currsize, 0)
+            foo.foo(1)
+            self.assertEqual(cache_info(foo, 'foo').currsize, 1)
+            # only results used by an instance are cleared
+            clear_cache(Foo(), 'foo')
+            self.assertEqual(Foo().foo(1), [1])
+            self.assertEqual(calls, [1, None])
+            clear_cache(foo, 'foo')
+            self.assertEqual(cache_info(foo, 'foo').currsize, 0)
+            self.assertEqual(Foo().foo(1), [1])
+            self.assertEqual(Foo().bar(), 42)
+            self.assertEqual(calls, [1, None, 1])
+            self.assertRaises(AssertionError, cached, backend=backend,
+                              maxsize=10)
+            self.assertRaises(AssertionError, cached, backend=backend, ttl=10)
+        finally:
+            shutil.rmtree(tempdir)
+
 
     def test_cachedproperty(self):
         class Foo(object):
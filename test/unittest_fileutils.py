@@ -21,10 +21,11 @@ import doctest
 import io
 import sys, os, tempfile, shutil
 from stat import S_IWRITE
-from os.path import join
+from os.path import join, exists
 
 from logilab.common.testlib import TestCase, unittest_main, unittest
 
+from logilab.common import fileutils
 from logilab.common.fileutils import *
 
 DATA_DIR = join(os.path.abspath(os.path.dirname(__file__)), 'data')
@@ -81,9 +82,79 @@ class ExportTC(TestCase):
         self.assertTrue(not exists(join(self.tempdir, '__init__.pyc')))
         self.assertTrue(not exists(join(self.tempdir, 'CVS')))
 
+    def test_manifest(self):
+        manifest = export(DATA_DIR, self.tempdir, verbose=0)
+        self.assertEqual(manifest['__init__.py'], 'created')
+        self.assertEqual(manifest[join('sub', 'momo.py')], 'created')
+        self.assertEqual(set(manifest.values()), set(['created']))
+        self.assertEqual(export(DATA_DIR, self.tempdir, verbose=0, workers=2),
+                         dict.fromkeys(manifest, 'updated'))
+        self.assertEqual(export(DATA_DIR, self.tempdir, incremental=True),
+                         dict.fromkeys(manifest, 'unchanged'))
+
     def tearDown(self):
         shutil.rmtree(self.tempdir)
 
+
+class IncrementalExportTC(TestCase):
+    workers = 0
+
+    def setUp(self):
+        self.srcdir = tempfile.mkdtemp()
+        self.destdir = tempfile.mkdtemp()
+        os.mkdir(join(self.srcdir, 'sub'))
+        for name in ('a.txt', 'b.txt', join('sub', 'c.txt')):
+            self.write(name, name)
+        self.export()
+
+    def tearDown(self):
+        shutil.rmtree(self.srcdir)
+        shutil.rmtree(self.destdir)
+
+    def write(self, name, content):
+        path = join(self.srcdir, name)
+        mtime = exists(path) and os.stat(path).st_mtime
+        with open(path, 'w') as stream:
+            stream.write(content)
+        # ensure the modification date changes
+        mtime = max(mtime, os.stat(path).st_mtime) + 2
+        os.utime(path, (mtime, mtime))
+
+    def export(self, **kwargs):
+        return export(self.srcdir, self.destdir, workers=self.workers, **kwargs)
+
+    def test_unchanged(self):
+        self.assertEqual(self.export(incremental=True),
+                         {'a.txt': 'unchanged', 'b.txt': 'unchanged',
+                          join('sub', 'c.txt'): 'unchanged'})
+
+    def test_changes(self):
+        self.write('a.txt', 'a.txt')
+        self.write('b.txt', 'modified')
+        self.write(join('sub', 'd.txt'), 'new' * 100000)
+        manifest = self.export(incremental=True)
+        self.assertEqual(manifest, {'a.txt': 'updated', 'b.txt': 'updated',
+                                    join('sub', 'c.txt'): 'unchanged',
+                                    join('sub', 'd.txt'): 'created'})
+        for name in manifest:
+            with open(join(self.srcdir, name)) as src:
+                with open(join(self.destdir, name)) as dest:
+                    self.assertEqual(src.read(), dest.read())
+            self.assertEqual(int(os.stat(join(self.srcdir, name)).st_mtime),
+                             int(os.stat(join(self.destdir, name)).st_mtime))
+
+    def test_checksum(self):
+        self.write('a.txt', 'a.txt')
+        self.write('b.txt', 'b.tx_')
+        self.assertEqual(self.export(checksum=True),
+                         {'a.txt': 'unchanged', 'b.txt': 'updated',
+                          join('sub', 'c.txt'): 'unchanged'})
+
+
+class ParallelIncrementalExportTC(IncrementalExportTC):
+    workers = 3
+
+
 class ProtectedFileTC(TestCase):
     def setUp(self):
         self.rpath = join(DATA_DIR, 'write_protected_file.txt')
@@ -135,6 +206,132 @@ class ProtectedFileTC(TestCase):
         self.assertTrue(not os.stat(self.rpath).st_mode & S_IWRITE)
 
 
+class FilesWatcherTC(TestCase):
+    polling = False
+
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+        self.subdir = join(self.tempdir, 'sub')
+        os.mkdir(self.subdir)
+        self.file = join(self.subdir, 'file.txt')
+        self.outfile = tempfile.mktemp()
+        for path in (self.file, self.outfile):
+            self.write(path, 'hop')
+        self.watcher = FilesWatcher([self.tempdir, self.outfile],
+                                    polling=self.polling)
+
+    def tearDown(self):
+        self.watcher.close()
+        shutil.rmtree(self.tempdir)
+        if exists(self.outfile):
+            os.remove(self.outfile)
+
+    def write(self, path, content):
+        mtime = exists(path) and os.stat(path).st_mtime
+        with open(path, 'w') as stream:
+            stream.write(content)
+        # ensure the modification date changes when polling
+        mtime = max(mtime, os.stat(path).st_mtime) + 2
+        os.utime(path, (mtime, mtime))
+
+    def test_polling(self):
+        if self.polling or not sys.platform.startswith('linux'):
+            self.assertTrue(self.watcher.polling)
+        else:
+            self.assertFalse(self.watcher.polling)
+        self.assertFalse(self.watcher.degraded)
+
+    def test_no_change(self):
+        self.assertEqual(set(), self.watcher.changes())
+
+    def test_close_on_collect(self):
+        watcher = FilesWatcher([self.tempdir], polling=self.polling)
+        fd = watcher._fd
+        del watcher
+        if fd is not None:
+            self.assertRaises(OSError, os.fstat, fd)
+
+    def test_modified(self):
+        self.write(self.file, 'hip')
+        self.write(self.outfile, 'hip')
+        self.assertEqual(set([self.file, self.outfile]), self.watcher.changes())
+        self.assertEqual(set(), self.watcher.changes())
+
+    def test_created_removed(self):
+        newdir = join(self.subdir, 'new')
+        os.mkdir(newdir)
+        newfile = join(newdir, 'new.txt')
+        self.write(newfile, 'hop')
+        os.remove(self.file)
+        self.assertEqual(set([self.file, newfile]), self.watcher.changes())
+        # new directories are watched
+        self.write(newfile, 'hip')
+        self.assertEqual(set([newfile]), self.watcher.changes())
+
+    def test_moved_directory(self):
+        movedir = join(self.tempdir, 'moved')
+        os.rename(self.subdir, movedir)
+        movedfile = join(movedir, 'file.txt')
+        self.assertEqual(set([self.file, movedfile]), self.watcher.changes())
+        self.write(movedfile, 'hip')
+        self.assertEqual(set([movedfile]), self.watcher.changes())
+
+    def test_moved_away(self):
+        outdir = tempfile.mkdtemp()
+        try:
+            outsubdir = join(outdir, 'sub')
+            os.rename(self.subdir, outsubdir)
+            self.assertEqual(set([self.file]), self.watcher.changes())
+            # not watched anymore
+            self.write(join(outsubdir, 'file.txt'), 'hip')
+            self.assertEqual(set(), self.watcher.changes())
+        finally:
+            shutil.rmtree(outdir)
+
+    def test_unwatched_sibling(self):
+        sibling = self.outfile + '.other'
+        try:
+            self.write(sibling, 'hop')
+            self.assertEqual(set(), self.watcher.changes())
+        finally:
+            os.remove(sibling)
+
+    def test_replaced(self):
+        tmpfile = self.outfile + '.new'
+        self.write(tmpfile, 'hip')
+        os.rename(tmpfile, self.outfile)
+        self.assertEqual(set([self.outfile]), self.watcher.changes())
+
+
+class PollingFilesWatcherTC(FilesWatcherTC):
+    polling = True
+
+
+class _NoWatchLibc(object):
+    """C library wrapper failing to add inotify watches"""
+    def __init__(self, libc):
+        self.inotify_init1 = libc.inotify_init1
+
+    def inotify_add_watch(self, fd, path, mask):
+        return -1
+
+
+@unittest.skipUnless(fileutils._libc(), 'inotify unavailable')
+class DegradedFilesWatcherTC(FilesWatcherTC):
+
+    def setUp(self):
+        self.libc = fileutils._LIBC[0]
+        fileutils._LIBC[0] = _NoWatchLibc(self.libc)
+        try:
+            super(DegradedFilesWatcherTC, self).setUp()
+        finally:
+            fileutils._LIBC[0] = self.libc
+
+    def test_polling(self):
+        self.assertFalse(self.watcher.polling)
+        self.assertTrue(self.watcher.degraded)
+
+
 if sys.version_info < (3, 0):
     def load_tests(loader, tests, ignore):
         from logilab.common import fileutils
@@ -18,7 +18,8 @@
 # with logilab-common.  If not, see <http://www.gnu.org/licenses/>.
 
 from logilab.common.testlib import TestCase, unittest_main
-from logilab.common.graph import get_cycles, has_path, ordered_nodes, UnorderableGraph
+from logilab.common.graph import (get_cycles, has_path, get_reachable,
+                                  ordered_nodes, UnorderableGraph)
 
 class getCyclesTC(TestCase):
 
@@ -46,6 +47,20 @@ class hasPathTC(TestCase):
     def test_cycle(self):
         self.assertEqual(has_path({'A': ['A']}, 'A', 'B'), None)
 
+class getReachableTC(TestCase):
+
+    def test_known(self):
+        graph = {'A': ['B'], 'B': ['C', 'D'], 'C': [], 'D': [], 'E': ['A']}
+        self.assertEqual(get_reachable(graph, ['B']), set(['B', 'C', 'D']))
+        self.assertEqual(get_reachable(graph, ['C', 'E']), set('ABCDE'))
+
+    def test_cycle(self):
+        self.assertEqual(get_reachable({'A': ['B'], 'B': ['A']}, ['A']),
+                         set(['A', 'B']))
+
+    def test_unknown_vertice(self):
+        self.assertEqual(get_reachable({'A': ['B']}, ['C']), set(['C']))
+
 class ordered_nodesTC(TestCase):
 
     def test_one_item(self):
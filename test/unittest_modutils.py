@@ -20,13 +20,19 @@ unit tests for module modutils (module manipulation utilities)
 """
 
 import doctest
+import json
+import os
 import sys
+import shutil
+import tempfile
 import warnings
 try:
     __file__
 except NameError:
     __file__ = sys.argv[0]
 
+from six.moves import builtins
+
 from logilab.common.testlib import TestCase, unittest_main
 from logilab.common import modutils
 
@@ -71,6 +77,151 @@ class ModuleFileTC(ModutilsTestCase):
         self.assertEqual(mfile.split(sep)[-4:], ["test", "data", "MyPyPa-0.1.0-py2.5.egg", self.package])
 
 
+class ResolutionCacheTC(ModutilsTestCase):
+
+    def setUp(self):
+        super(ResolutionCacheTC, self).setUp()
+        self.tmpdir = tempfile.mkdtemp()
+        self.otherdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+        shutil.rmtree(self.otherdir)
+        super(ResolutionCacheTC, self).tearDown()
+
+    def touch(self, *parts):
+        filepath = path.join(*parts)
+        open(filepath, 'w').close()
+        # ensure the directory's modification date changes
+        dirpath = path.dirname(filepath)
+        mtime = os.stat(dirpath).st_mtime + 2
+        os.utime(dirpath, (mtime, mtime))
+        return filepath
+
+    def test_cached(self):
+        filepath = self.touch(self.tmpdir, 'cachedmod.py')
+        self.assertEqual(filepath, modutils.file_from_modpath(
+            ['cachedmod'], [self.otherdir, self.tmpdir]))
+        self.assertEqual(filepath, modutils.file_from_modpath(
+            ['cachedmod'], [self.otherdir, self.tmpdir]))
+
+    def test_invalidation(self):
+        searchpath = [self.otherdir, self.tmpdir]
+        self.assertRaises(ImportError, modutils.file_from_modpath,
+                          ['cachedmod'], searchpath)
+        filepath = self.touch(self.tmpdir, 'cachedmod.py')
+        self.assertEqual(filepath,
+                         modutils.file_from_modpath(['cachedmod'], searchpath))
+        # shadowed by a module of a directory earlier in the path
+        os.mkdir(path.join(self.otherdir, 'cachedmod'))
+        initpath = self.touch(self.otherdir, 'cachedmod', '__init__.py')
+        mtime = os.stat(self.otherdir).st_mtime + 2
+        os.utime(self.otherdir, (mtime, mtime))
+        self.assertEqual(initpath,
+                         modutils.file_from_modpath(['cachedmod'], searchpath))
+        os.remove(initpath)
+        shutil.rmtree(path.join(self.otherdir, 'cachedmod'))
+        mtime = os.stat(self.otherdir).st_mtime + 4
+        os.utime(self.otherdir, (mtime, mtime))
+        self.assertEqual(filepath,
+                         modutils.file_from_modpath(['cachedmod'], searchpath))
+
+    def test_submodule(self):
+        os.mkdir(path.join(self.tmpdir, 'cachedpkg'))
+        self.touch(self.tmpdir, 'cachedpkg', '__init__.py')
+        self.assertRaises(ImportError, modutils.file_from_modpath,
+                          ['cachedpkg', 'sub'], [self.tmpdir])
+        filepath = self.touch(self.tmpdir, 'cachedpkg', 'sub.py')
+        self.assertEqual(filepath, modutils.file_from_modpath(
+            ['cachedpkg', 'sub'], [self.tmpdir]))
+
+
+class LazyImportTC(ModutilsTestCase):
+
+    def setUp(self):
+        super(LazyImportTC, self).setUp()
+        self.tmpdir = tempfile.mkdtemp()
+        for modname, source in (('profiledpkg/__init__.py', ''),
+                                ('profiledpkg/first.py',
+                                 'from profiledpkg import second\n'),
+                                ('profiledpkg/second.py',
+                                 'import time\nVALUE = 42\n'),
+                                ('lazymod.py', 'VALUE = 43\n')):
+            filepath = path.join(self.tmpdir, modname)
+            if not path.isdir(path.dirname(filepath)):
+                os.mkdir(path.dirname(filepath))
+            with open(filepath, 'w') as stream:
+                stream.write(source)
+        sys.path.insert(0, self.tmpdir)
+
+    def tearDown(self):
+        sys.path.remove(self.tmpdir)
+        for modname in list(sys.modules):
+            if modname.startswith(('profiledpkg', 'lazymod')):
+                del sys.modules[modname]
+        shutil.rmtree(self.tmpdir)
+        super(LazyImportTC, self).tearDown()
+
+    def test_lazy_import(self):
+        self.assertIs(modutils.lazy_import('os'), os)
+        lazymod = modutils.lazy_import('lazymod')
+        self.assertIsInstance(lazymod, modutils.LazyModule)
+        self.assertEqual("<lazy module 'lazymod'>", repr(lazymod))
+        self.assertNotIn('lazymod', sys.modules)
+        self.assertEqual(43, lazymod.VALUE)
+        self.assertIn('lazymod', sys.modules)
+        lazymod.OTHER = 1
+        self.assertEqual(1, sys.modules['lazymod'].OTHER)
+
+    def test_profiler(self):
+        with modutils.ImportProfiler() as profiler:
+            import profiledpkg.first
+            import profiledpkg.first
+        records = list(profiler.records())
+        self.assertEqual([(0, 'profiledpkg.first'), (1, 'profiledpkg.second')],
+                         [(depth, record.name) for depth, record in records])
+        self.assertEqual(['profiledpkg', 'profiledpkg.first'],
+                         records[0][1].modules)
+        self.assertGreaterEqual(records[0][1].time, records[1][1].time)
+        self.assertEqual(records[0][1].self_time,
+                         records[0][1].time - records[1][1].time)
+        table = profiler.table()
+        self.assertEqual(['profiledpkg.first', '  profiledpkg.second'],
+                         [row[0] for row in table])
+        self.assertEqual(['module', 'time (ms)', 'self (ms)', 'memory (kB)'],
+                         table.col_names)
+        layout = profiler.report()
+        self.assertEqual(12, len(layout.children[-1].children))
+
+    def test_profiler_lazy(self):
+        with modutils.ImportProfiler(lazy=('lazymod',)) as profiler:
+            import lazymod
+        self.assertIsInstance(lazymod, modutils.LazyModule)
+        self.assertEqual([], list(profiler.records()))
+        self.assertEqual(43, lazymod.VALUE)
+        self.assertIs(builtins.__import__, self.original_import)
+
+    def test_profiler_lazy_dotted(self):
+        with modutils.ImportProfiler(lazy=('profiledpkg.second',)):
+            import profiledpkg.second
+        self.assertIsInstance(profiledpkg, modutils.LazyModule)
+        self.assertNotIn('profiledpkg', sys.modules)
+        self.assertEqual(42, profiledpkg.second.VALUE)
+        self.assertIs(sys.modules['profiledpkg.second'], profiledpkg.second)
+
+    def test_failed_import(self):
+        with modutils.ImportProfiler() as profiler:
+            try:
+                import profiledpkg.unknown
+            except ImportError:
+                pass
+        self.assertEqual([(0, 'profiledpkg')],
+                         [(depth, record.name)
+                          for depth, record in profiler.records()])
+
+    original_import = builtins.__import__
+
+
 class load_module_from_name_tc(ModutilsTestCase):
     """ load a python module from it's name """
 
@@ -235,6 +386,79 @@ class is_standard_module_tc(ModutilsTestCase):
         self.assertEqual(modutils.is_standard_module('logilab.whatever', common.__path__), False)
 
 
+class StandardModulesTableTC(ModutilsTestCase):
+
+    def setUp(self):
+        super(StandardModulesTableTC, self).setUp()
+        self.cachedir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.cachedir)
+        super(StandardModulesTableTC, self).tearDown()
+
+    def test_table(self):
+        table = modutils.standard_modules_table(self.cachedir)
+        self.assertIn('os', table)
+        self.assertIn('email', table)
+        self.assertNotIn('logilab', table)
+        tablefile, = os.listdir(self.cachedir)
+        self.assertEqual(table, modutils.standard_modules_table(self.cachedir))
+        # built again when the interpreter changes
+        tablefile = path.join(self.cachedir, tablefile)
+        with open(tablefile) as stream:
+            content = json.load(stream)
+        content['interpreter'][1] = 'another version'
+        content['modules'] = {}
+        with open(tablefile, 'w') as stream:
+            json.dump(content, stream)
+        self.assertEqual(table, modutils.standard_modules_table(self.cachedir))
+
+    def test_no_cachedir(self):
+        environ = dict(os.environ)
+        os.environ['XDG_CACHE_HOME'] = os.environ['HOME'] = self.cachedir
+        try:
+            table = modutils.standard_modules_table()
+        finally:
+            os.environ.clear()
+            os.environ.update(environ)
+        self.assertIn('os', table)
+        self.assertEqual([], os.listdir(self.cachedir))
+
+    def test_known_modules(self):
+        standard = ['os', 'email', 'sys', 'marshal', 'json']
+        nonstandard = ['six', 'unknown']
+        if sys.version_info < (3, 0):
+            standard.append('StringIO')
+        else:
+            nonstandard.append('StringIO')
+        for name in standard:
+            self.assertEqual(modutils._is_standard_from_table(name), True,
+                             name)
+        for name in nonstandard:
+            self.assertEqual(modutils._is_standard_from_table(name), False,
+                             name)
+
+    def test_same_results(self):
+        """the table gives the same answers as the import machinery for all
+        the modules it knows about"""
+        table = modutils._is_standard_from_table
+        names = sorted(modutils.standard_modules_table())
+        names += ['os.path', 'email.mime', 'xml.dom', 'logilab',
+                  'logilab.common', 'data', 'six', 'unknown', 'StringIO']
+        from_table = [name for name in names
+                      if table(name.split('.')[0]) is not None]
+        self.assertGreater(len(from_table), len(names) * 0.9)
+        expected = [modutils.is_standard_module(name) for name in from_table]
+        modutils._is_standard_from_table = lambda name: None
+        try:
+            self.assertEqual(
+                list(zip(from_table, expected)),
+                [(name, modutils.is_standard_module(name))
+                 for name in from_table])
+        finally:
+            modutils._is_standard_from_table = table
+
+
 class is_relative_tc(ModutilsTestCase):
 
 
@@ -263,6 +487,23 @@ class get_modules_tc(ModutilsTestCase):
             'noendingnewline', 'nonregr')]))
 
 
+    def test_workers(self):
+        modules = modutils.get_modules('logilab.common', common.__path__[0])
+        self.assertIn('logilab.common.ureports.text_writer', modules)
+        self.assertEqual(modules, modutils.get_modules(
+            'logilab.common', common.__path__[0], workers=4))
+
+    def test_walk_modules(self):
+        walker = modutils.walk_modules('logilab.common', common.__path__[0])
+        self.assertEqual(next(walker), modutils.get_modules(
+            'logilab.common', common.__path__[0])[0])
+        walker.close()
+        walker = modutils.walk_modules('logilab.common', common.__path__[0],
+                                       workers=2)
+        self.assertTrue(next(walker).startswith('logilab.common.'))
+        walker.close()
+
+
 class get_modules_files_tc(ModutilsTestCase):
 
     def test_knownValues_get_module_files_1(self): #  XXXFIXME: TOWRITE
@@ -275,15 +516,29 @@ class get_modules_files_tc(ModutilsTestCase):
         self.assertEqual(modules,
                          [path.join(DATADIR, 'find_test', x) for x in ['__init__.py', 'module.py', 'module2.py', 'noendingnewline.py', 'nonregr.py']])
 
+    def test_workers(self):
+        files = modutils.get_module_files(common.__path__[0])
+        self.assertIn(path.join(common.__path__[0], 'ureports', '__init__.py'),
+                      files)
+        self.assertEqual(files, modutils.get_module_files(common.__path__[0],
+                                                          workers=4))
+        self.assertEqual(files,
+                         list(modutils.walk_module_files(common.__path__[0])))
+
     def test_load_module_set_attribute(self):
         import logilab.common.fileutils
         import logilab
+        fileutils = logilab.common.fileutils
         del logilab.common.fileutils
         del sys.modules['logilab.common.fileutils']
-        m = modutils.load_module_from_modpath(['logilab', 'common', 'fileutils'])
-        self.assertTrue( hasattr(logilab, 'common') )
-        self.assertTrue( hasattr(logilab.common, 'fileutils') )
-        self.assertTrue( m is logilab.common.fileutils )
+        try:
+            m = modutils.load_module_from_modpath(['logilab', 'common', 'fileutils'])
+            self.assertTrue( hasattr(logilab, 'common') )
+            self.assertTrue( hasattr(logilab.common, 'fileutils') )
+            self.assertTrue( m is logilab.common.fileutils )
+        finally:
+            # restore the original module, still used by other modules
+            logilab.common.fileutils = sys.modules['logilab.common.fileutils'] = fileutils
 
 
 def load_tests(loader, tests, ignore):
@@ -15,7 +15,15 @@
 #
 # You should have received a copy of the GNU Lesser General Public License along
 # with logilab-common.  If not, see <http://www.gnu.org/licenses/>.
-from os.path import join
+import os
+import shutil
+import subprocess
+import tempfile
+from multiprocessing import current_process
+from os.path import join, exists
+
+from six import StringIO
+
 from logilab.common.testlib import TestCase, unittest_main
 from logilab.common.pytest import *
 
@@ -82,5 +90,350 @@ class ModuleFunctionTC(TestCase):
             myfn()
 
 
+TESTFILES = {
+    'unittest_ok.py': """
+from logilab.common.testlib import TestCase
+class OkTC(TestCase):
+    def test_1(self): pass
+    def test_2(self): pass
+""",
+    'unittest_fail.py': """
+from logilab.common.testlib import TestCase
+class FailTC(TestCase):
+    def test_ok(self): pass
+    def test_fail(self): self.fail('boom')
+""",
+    'unittest_tagged.py': """
+from logilab.common.testlib import TestCase, tag
+class TaggedTC(TestCase):
+    @tag('slow')
+    def test_slow(self): pass
+    def test_generative(self):
+        yield self.assertTrue, True
+""",
+    'unittest_broken.py': "import this_module_does_not_exist\n",
+    'unittest_skipped.py': """
+from logilab.common.testlib import SkipTest
+raise SkipTest('not today')
+""",
+    }
+
+class ParallelTesterTC(TestCase):
+
+    def setUp(self):
+        if current_process().daemon and self._testMethodName != 'test_sequential':
+            self.skipTest('worker processes can not have children')
+        self.testdir = tempfile.mkdtemp()
+        for name, content in TESTFILES.items():
+            with open(join(self.testdir, name), 'w') as stream:
+                stream.write(content)
+        self.stderr = sys.stderr
+        sys.stderr = StringIO()
+        # testonedir removes modules with a relative path from sys.modules
+        self.modules = sys.modules.copy()
+        # test files are imported by name from their directory, and parse
+        # sys.argv, whatever the runner of this test
+        self.path = sys.path[:]
+        sys.path.insert(0, self.testdir)
+        self.argv = sys.argv[:]
+        sys.argv[:] = ['pytest']
+
+    def tearDown(self):
+        sys.argv[:] = self.argv
+        sys.path[:] = self.path
+        sys.modules.clear()
+        sys.modules.update(self.modules)
+        sys.stderr = self.stderr
+        shutil.rmtree(self.testdir)
+
+    def tester(self, *args, **kwargs):
+        options, _ = make_parser().parse_args(list(args))
+        options.test_pattern = kwargs.get('test_pattern')
+        tester = PyTester(None, options)
+        tester.durations_file = join(self.testdir, 'durations.json')
+        tester.collection_file = join(self.testdir, 'collection.json')
+        return tester
+
+    def test_collection(self):
+        tester = self.tester()
+        self.assertTrue(tester.testonedir(self.testdir))
+        tester.record_collection()
+        collection = TestCollection(tester.collection_file)
+        tagged = join(self.testdir, 'unittest_tagged.py')
+        self.assertEqual(collection.tests(tagged),
+                         [['TaggedTC.test_generative', [], True],
+                          ['TaggedTC.test_slow', ['slow'], False]])
+        self.assertEqual(sorted(os.path.basename(f) for f in collection.files),
+                         ['unittest_fail.py', 'unittest_ok.py', 'unittest_tagged.py'])
+        # touched
+        mtime = os.stat(tagged).st_mtime + 2
+        os.utime(tagged, (mtime, mtime))
+        self.assertTrue(collection.tests(tagged))
+        # modified
+        with open(tagged, 'a') as stream:
+            stream.write('\n')
+        self.assertIsNone(collection.tests(tagged))
+
+    def test_select_testfiles(self):
+        tester = self.tester()
+        tester.testonedir(self.testdir)
+        tester.record_collection()
+        files = sorted(abspath_listdir(self.testdir))
+        self.assertEqual(tester.select_testfiles(files), files)
+        def selected(*args, **kwargs):
+            return sorted(os.path.basename(f) for f in
+                          self.tester(*args, **kwargs).select_testfiles(files)
+                          if this_is_a_testfile(f))
+        # unknown files are selected
+        self.assertEqual(selected('-m', 'slow'),
+                         ['unittest_broken.py', 'unittest_skipped.py',
+                          'unittest_tagged.py'])
+        self.assertEqual(selected('-s', 'test_'),
+                         ['unittest_broken.py', 'unittest_skipped.py',
+                          'unittest_tagged.py'])
+        self.assertEqual(selected(test_pattern='OkTC'),
+                         ['unittest_broken.py', 'unittest_ok.py',
+                          'unittest_skipped.py', 'unittest_tagged.py'])
+        tester = self.tester('-m', 'slow', '-j', '2')
+        tester.testonedir(self.testdir)
+        self.assertEqual(tester.report.ran, 3)
+
+    def test_list_tests(self):
+        tester = self.tester('-m', 'not slow')
+        stdout = sys.stdout
+        sys.stdout = StringIO()
+        try:
+            tester.list_tests([join(self.testdir, name) for name in
+                               ('unittest_ok.py', 'unittest_tagged.py',
+                                'unittest_broken.py')])
+            output = sys.stdout.getvalue()
+        finally:
+            sys.stdout = stdout
+        self.assertEqual(output.splitlines(),
+                         ['%s OkTC.test_1' % join(self.testdir, 'unittest_ok.py'),
+                          '%s OkTC.test_2' % join(self.testdir, 'unittest_ok.py'),
+                          '%s TaggedTC.test_generative'
+                          % join(self.testdir, 'unittest_tagged.py')])
+        self.assertEqual(len(TestCollection(tester.collection_file).files), 2)
+        self.assertNotIn('unittest_ok', sys.modules)
+
+    def test_parallel(self):
+        tester = self.tester('-j', '2')
+        self.assertTrue(tester.testonedir(self.testdir))
+        report = tester.report
+        self.assertEqual(report.modulescount, 5)
+        self.assertEqual(report.ran, 8)
+        self.assertEqual(report.failures, 1)
+        self.assertEqual(report.errors, 1)
+        self.assertEqual(sorted(os.path.basename(info[0]) for info in report.errmodules),
+                         ['unittest_broken', 'unittest_fail', 'unittest_skipped'])
+        output = sys.stderr.getvalue()
+        self.assertIn('boom', output)
+        self.assertIn(' unittest_ok.py ', output)
+        tester.record_durations()
+        durations = TestDurations(tester.durations_file)
+        self.assertEqual(sorted(os.path.basename(f) for f in durations.files),
+                         ['unittest_fail.py', 'unittest_ok.py', 'unittest_tagged.py'])
+        self.assertEqual(sorted(durations.tests[join(self.testdir, 'unittest_ok.py')]),
+                         ['unittest_ok.OkTC.test_1', 'unittest_ok.OkTC.test_2'])
+
+    def test_exitfirst(self):
+        tester = self.tester('-j', '2')
+        self.assertFalse(tester.parallel_testfiles(
+            [join(self.testdir, 'unittest_fail.py')], exitfirst=True))
+
+    def test_sequential(self):
+        tester = self.tester()
+        self.assertEqual(tester.jobs, 1)
+        self.assertTrue(tester.testonedir(self.testdir))
+        self.assertEqual(tester.report.ran, 8)
+        self.assertFalse(exists(tester.durations_file))
+        self.show_report(tester)
+        self.assertFalse(exists(tester.durations_file))
+        self.assertFalse(exists(tester.collection_file))
+
+    def test_recorded_files(self):
+        tester = self.tester('-m', 'not slow', '--longest-first')
+        self.assertTrue(tester.testonedir(self.testdir))
+        self.show_report(tester)
+        self.assertTrue(exists(tester.durations_file))
+        self.assertTrue(exists(tester.collection_file))
+
+    def show_report(self, tester):
+        stdout = sys.stdout
+        sys.stdout = StringIO()
+        try:
+            tester.show_report()
+        finally:
+            sys.stdout = stdout
+
+
+PROJECT = {
+    'pkg/__init__.py': '',
+    'pkg/base.py': '',
+    'pkg/util.py': 'from . import base\n',
+    'pkg/other.py': 'import os\n',
+    'test/helper.py': 'from pkg.util import *\n',
+    'test/unittest_util.py': 'import helper\n',
+    'test/unittest_other.py': 'from pkg import other\n',
+    'test/unittest_none.py': 'import os\n',
+    'test/data/file.txt': '',
+    }
+
+class ImportGraphTC(TestCase):
+
+    def setUp(self):
+        self.root = os.path.realpath(tempfile.mkdtemp())
+        for name, content in PROJECT.items():
+            path = self.path(name)
+            if not exists(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            with open(path, 'w') as stream:
+                stream.write(content)
+            os.utime(path, (1000000000, 1000000000))
+        self.cwd = os.getcwd()
+        os.chdir(self.root)
+        sys.path.insert(0, self.root)
+
+    def tearDown(self):
+        sys.path.remove(self.root)
+        os.chdir(self.cwd)
+        shutil.rmtree(self.root)
+
+    def path(self, name):
+        return join(self.root, *name.split('/'))
+
+    def paths(self, *names):
+        return set(self.path(name) for name in names)
+
+    def touch(self, name, content=None):
+        path = self.path(name)
+        if content is not None:
+            with open(path, 'w') as stream:
+                stream.write(content)
+        mtime = os.stat(path).st_mtime + 2
+        os.utime(path, (mtime, mtime))
+
+    def test_module_imports(self):
+        self.touch('pkg/util.py', 'import os.path, sys\n'
+                   'from .. import a, b\n'
+                   'from .base import *\n')
+        self.assertEqual(module_imports(self.path('pkg/util.py')),
+                         [['os.path', 0, []], ['sys', 0, []],
+                          ['', 2, ['a', 'b']], ['base', 1, []]])
+        self.touch('pkg/base.py', 'syntax error')
+        self.assertEqual(module_imports(self.path('pkg/base.py')), [])
+
+    def test_dependents(self):
+        graph = ImportGraph(join(self.root, 'imports.json'))
+        graph.update(self.root)
+        self.assertEqual(graph.dependents([self.path('pkg/base.py')]),
+                         self.paths('pkg/base.py', 'pkg/util.py',
+                                    'test/helper.py', 'test/unittest_util.py'))
+        self.assertEqual(graph.dependents([self.path('pkg/__init__.py')]),
+                         self.paths('pkg/__init__.py', 'pkg/util.py',
+                                    'test/helper.py', 'test/unittest_util.py',
+                                    'test/unittest_other.py'))
+        self.assertEqual(graph.dependents([self.path('test/data/file.txt')]),
+                         self.paths('test/data/file.txt'))
+
+    def test_incremental_update(self):
+        graph = ImportGraph(join(self.root, 'imports.json'))
+        graph.update(self.root)
+        graph.save()
+        graph = ImportGraph(graph.path)
+        self.touch('test/unittest_none.py', 'from pkg import base\n')
+        graph.update(self.root)
+        self.assertIn(self.path('test/unittest_none.py'),
+                      graph.dependents([self.path('pkg/base.py')]))
+        # imports are resolved again when files are added
+        self.touch('test/unittest_new.py', 'import other\n')
+        graph.update(self.root)
+        self.assertNotIn(self.path('test/unittest_new.py'),
+                         graph.dependents([self.path('pkg/other.py')]))
+        self.touch('test/other.py', '')
+        graph.update(self.root)
+        self.assertIn(self.path('test/unittest_new.py'),
+                      graph.dependents([self.path('test/other.py')]))
+
+    def changed_testfiles(self, since):
+        options, _ = make_parser().parse_args(['--changed-since', since])
+        tester = PyTester(None, options)
+        tester.imports_file = join(self.root, 'imports.json')
+        testfiles = [filename for filename in abspath_listdir(self.path('test'))
+                     if this_is_a_testfile(filename)]
+        return sorted(os.path.basename(filename) for filename in
+                      tester.select_testfiles(testfiles))
+
+    def test_changed_since_timestamp(self):
+        self.assertEqual(self.changed_testfiles('1000000000'), [])
+        self.touch('pkg/base.py')
+        self.assertEqual(self.changed_testfiles('1000000000'),
+                         ['unittest_util.py'])
+        self.touch('test/data/file.txt')
+        self.assertEqual(self.changed_testfiles('1000000000'),
+                         ['unittest_none.py', 'unittest_other.py',
+                          'unittest_util.py'])
+
+    def test_changed_since_revision(self):
+        git = ['git', '-c', 'user.name=test', '-c', 'user.email=test@test']
+        try:
+            with open(os.devnull, 'w') as devnull:
+                for args in (['init'], ['add', '.'], ['commit', '-m', 'init']):
+                    subprocess.check_call(git + args, cwd=self.root,
+                                          stdout=devnull, stderr=devnull)
+        except (OSError, subprocess.CalledProcessError):
+            self.skipTest('git is not available')
+        self.assertEqual(changed_files('HEAD', self.path('test')), set())
+        self.touch('pkg/other.py', 'import sys\n')
+        self.touch('test/unittest_new.py', '')
+        self.assertEqual(changed_files('HEAD', self.root),
+                         self.paths('pkg/other.py', 'test/unittest_new.py'))
+        self.assertEqual(changed_files('HEAD', self.path('test')),
+                         self.paths('test/unittest_new.py'))
+        self.assertEqual(self.changed_testfiles('HEAD'),
+                         ['unittest_new.py', 'unittest_other.py'])
+        self.assertRaises(ValueError, changed_files, 'nosuchrev', self.root)
+
+
+class TestDurationsTC(TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mktemp()
+
+    def tearDown(self):
+        if exists(self.path):
+            os.remove(self.path)
+
+    def test_missing_file(self):
+        durations = TestDurations(self.path)
+        self.assertEqual(durations.files, {})
+        self.assertEqual(durations.tests, {})
+        self.assertEqual(durations.longest_first(['a', 'b']), ['a', 'b'])
+
+    def test_roundtrip(self):
+        durations = TestDurations(self.path)
+        durations.update({'a': 1., 'b': 3.}, {'a': {'a.T.test': 1.}})
+        durations.save()
+        durations = TestDurations(self.path)
+        self.assertEqual(durations.files, {'a': 1., 'b': 3.})
+        self.assertEqual(durations.tests, {'a': {'a.T.test': 1.}})
+        self.assertEqual(durations.longest_first(['a', 'b', 'c']), ['c', 'b', 'a'])
+
+    def test_regressions(self):
+        durations = TestDurations(self.path)
+        durations.update({}, {'a': {'a.T.test1': 1., 'a.T.test2': 1.,
+                                    'a.T.test3': 0.01}})
+        tests = {'a': {'a.T.test1': 1.5, 'a.T.test2': 3., 'a.T.test3': 0.05,
+                       'a.T.test4': 10.}}
+        self.assertEqual(durations.regressions(tests), [('a.T.test2', 1., 3.)])
+
+    def test_slowest_tests(self):
+        tests = {'a': {'a.T.test1': 1., 'a.T.test2': 3.},
+                 'b': {'b.T.test': 2.}}
+        self.assertEqual(slowest_tests(tests, 2),
+                         [('a.T.test2', 3.), ('b.T.test', 2.)])
+
+
 if __name__ == '__main__':
     unittest_main()
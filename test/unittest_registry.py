@@ -18,11 +18,17 @@
 """unit tests for selectors mechanism"""
 
 import gc
+import json
 import logging
+import os
 import os.path as osp
 import sys
+import shutil
+import tempfile
+import time
 from operator import eq, lt, le, gt
 from contextlib import contextmanager
+from threading import Thread
 import warnings
 
 logging.basicConfig(level=logging.ERROR)
@@ -30,6 +36,7 @@ logging.basicConfig(level=logging.ERROR)
 from logilab.common.testlib import TestCase, unittest_main
 
 from logilab.common.registry import *
+from logilab.common.registry import _FLATTENED_CALLS
 
 
 class _1_(Predicate):
@@ -166,6 +173,309 @@ class SelectorsTC(TestCase):
         self.assertEqual(s3(None), 0)
         self.assertEqual(self.count, 8)
 
+class _CountedPredicate(Predicate):
+    def __init__(self, score):
+        self.score = score
+        self.calls = 0
+    def __call__(self, cls, *args, **kwargs):
+        self.calls += 1
+        return self.score
+
+
+class FingerprintRegistry(Registry):
+    def context_fingerprint(self, args, kwargs):
+        return args
+
+
+class _RegObject(object):
+    def __init__(self, *args, **kwargs):
+        pass
+
+
+class SelectionCacheTC(TestCase):
+
+    def setUp(self):
+        self.registry = FingerprintRegistry(False)
+        self.predicate = _CountedPredicate(1)
+        class Obj1(_RegObject):
+            __regid__ = 'obj'
+            __select__ = self.predicate
+        class Obj2(_RegObject):
+            __regid__ = 'obj'
+            __select__ = _CountedPredicate(2)
+        self.Obj1, self.Obj2 = Obj1, Obj2
+        self.registry.register(Obj1)
+
+    def test_cache(self):
+        self.assertIsInstance(self.registry.select('obj', 1), self.Obj1)
+        self.assertIsInstance(self.registry.select('obj', 1), self.Obj1)
+        self.assertEqual(len(list(self.registry.possible_objects(1))), 1)
+        self.assertEqual(self.predicate.calls, 1)
+        self.assertIsInstance(self.registry.select('obj', 2), self.Obj1)
+        self.assertEqual(self.predicate.calls, 2)
+        stats = self.registry.selection_cache_stats()
+        self.assertEqual((stats['hits'], stats['misses']), (2, 2))
+
+    def test_no_fingerprint(self):
+        registry = Registry(False)
+        registry.register(self.Obj1)
+        registry.select('obj', 1)
+        registry.select('obj', 1)
+        self.assertEqual(self.predicate.calls, 2)
+        self.assertEqual(registry.selection_cache_stats()['currsize'], 0)
+
+    def test_invalidation(self):
+        self.assertIsInstance(self.registry.select('obj', 1), self.Obj1)
+        self.registry.register(self.Obj2)
+        self.assertIsInstance(self.registry.select('obj', 1), self.Obj2)
+        self.registry.unregister(self.Obj2)
+        self.assertIsInstance(self.registry.select('obj', 1), self.Obj1)
+        self.registry.register_and_replace(self.Obj2, self.Obj1)
+        self.assertIsInstance(self.registry.select('obj', 1), self.Obj2)
+        self.registry.clear()
+        self.assertEqual(self.registry.selection_cache_stats()['currsize'], 0)
+        self.assertRaises(ObjectNotFound, self.registry.select, 'obj', 1)
+
+    def test_no_selectable_object(self):
+        self.predicate.score = 0
+        self.assertRaises(NoSelectableObject, self.registry.select, 'obj', 1)
+        self.assertRaises(NoSelectableObject, self.registry.select, 'obj', 1)
+        self.assertEqual(self.predicate.calls, 1)
+
+
+class CompilePredicateTC(TestCase):
+    _attrs = ('__call__', '_decorators', '_undecorated_call', '_wrapped_call')
+
+    def setUp(self):
+        # other tests may have decorated predicates through wrap_predicates
+        self.predclasses = {}
+        for predcls, call in _FLATTENED_CALLS.items():
+            self.predclasses[predcls] = dict(
+                (attr, predcls.__dict__[attr]) for attr in self._attrs
+                if attr in predcls.__dict__)
+            for attr in self._attrs[1:]:
+                if attr in predcls.__dict__:
+                    delattr(predcls, attr)
+            predcls.__call__ = call
+
+    def tearDown(self):
+        for predcls, attrs in self.predclasses.items():
+            for attr in self._attrs[1:]:
+                if attr in predcls.__dict__:
+                    delattr(predcls, attr)
+            for attr, value in attrs.items():
+                setattr(predcls, attr, value)
+
+    def test_compiled_scores(self):
+        for selector in (_1_() & _1_() & _2_,
+                         _1_() & (_0_() | _2_) & ~_0_(),
+                         (_1_() & _0_()) | (_1_() & _1_()),
+                         ~(_0_() | _0_()) & (_0_() | (_1_() & ~_1_())),
+                         _0_() | _0_(),
+                         yes()):
+            compiled = compile_predicate(selector)
+            self.assertNotEqual(compiled, selector)
+            self.assertEqual(compiled(None), selector(None), str(selector))
+
+    def test_short_circuit(self):
+        zero = _CountedPredicate(0)
+        one = _CountedPredicate(1)
+        compiled = compile_predicate(zero & one)
+        self.assertEqual(compiled(None), 0)
+        self.assertEqual((zero.calls, one.calls), (1, 0))
+        compiled = compile_predicate(one | zero)
+        self.assertEqual(compiled(None), 1)
+        self.assertEqual((zero.calls, one.calls), (1, 1))
+
+    def test_cost_ordering(self):
+        calls = []
+        class cheap(Predicate):
+            cost = 0
+            def __call__(self, cls, *args, **kwargs):
+                calls.append('cheap')
+                return 0
+        class expensive(Predicate):
+            cost = 10
+            def __call__(self, cls, *args, **kwargs):
+                calls.append('expensive')
+                return 1
+        selector = expensive() & cheap()
+        self.assertIsNone(selector.cost)
+        self.assertEqual(compile_predicate(selector)(None), 0)
+        self.assertEqual(calls, ['cheap'])
+        # predicates declaring no cost are never moved across
+        class guard(Predicate):
+            def __call__(self, cls, *args, **kwargs):
+                calls.append('guard')
+                return 1
+        del calls[:]
+        selector = expensive() & guard() & cheap()
+        self.assertEqual(compile_predicate(selector)(None), 0)
+        self.assertEqual(calls, ['expensive', 'guard', 'cheap'])
+
+    def test_guard_ordering(self):
+        calls = []
+        class score(Predicate):
+            def __init__(self, name, score):
+                self.name, self.score = name, score
+            def __call__(self, cls, *args, **kwargs):
+                calls.append(self.name)
+                return self.score
+        class needs_rset(Predicate):
+            def __call__(self, cls, req, rset, **kwargs):
+                return 1
+        selector = (score('a', 0) | score('b', 0)) & needs_rset()
+        self.assertEqual(selector(None), 0)
+        self.assertEqual(calls, ['a', 'b'])
+        del calls[:]
+        self.assertEqual(compile_predicate(selector)(None), 0)
+        self.assertEqual(calls, ['a', 'b'])
+
+    def test_wrapped_call(self):
+        calls = []
+        def decorator(call):
+            def wrapped(self, *args, **kwargs):
+                calls.append(self.__class__.__name__)
+                return call(self, *args, **kwargs)
+            return wrapped
+        selector = _1_() & (_0_() | ~_0_())
+        calls_ = dict((predcls, predcls.__dict__['__call__'])
+                      for predcls in (AndPredicate, OrPredicate, NotPredicate))
+        for predcls, call in calls_.items():
+            predcls.__call__ = decorator(call)
+        try:
+            self.assertEqual(compile_predicate(selector)(None), 2)
+        finally:
+            for predcls, call in calls_.items():
+                predcls.__call__ = call
+        self.assertEqual(calls, ['AndPredicate', 'OrPredicate', 'NotPredicate'])
+
+    def test_wrap_predicates(self):
+        calls = []
+        def decorator(call):
+            def wrapped(self, *args, **kwargs):
+                calls.append(self.__class__.__name__)
+                return call(self, *args, **kwargs)
+            return wrapped
+        selector = _1_() & (_0_() | ~_0_())
+        wrap_predicates(decorator)
+        self.assertEqual(selector(None), 2)
+        self.assertEqual(calls, ['AndPredicate', '_1_', 'OrPredicate', '_0_',
+                                 'NotPredicate', '_0_'])
+        del calls[:]
+        # decorators are applied to leaf predicates only
+        self.assertEqual(compile_predicate(selector)(None), 2)
+        self.assertEqual(calls, ['_1_', '_0_', '_0_'])
+
+    def test_too_deep(self):
+        selector = _1_()
+        for i in range(30):
+            selector = (selector | _0_()) & _1_()
+        self.assertIs(compile_predicate(selector), selector)
+
+    def test_registry(self):
+        registry = Registry(False)
+        predicate = _CountedPredicate(1)
+        class Obj(_RegObject):
+            __regid__ = 'obj'
+            __select__ = predicate & _1_()
+        registry.register(Obj)
+        registry.initialization_completed()
+        compiled = registry._compiled_selectors[id(Obj.__select__)][1]
+        self.assertNotEqual(compiled, Obj.__select__)
+        self.assertIsInstance(registry.select('obj'), Obj)
+        with traced_selection(('other',)):
+            self.assertIsInstance(registry.select('obj'), Obj)
+        self.assertEqual(predicate.calls, 2)
+
+
+class requires(Predicate):
+    def __init__(self, *names):
+        self.names = names
+        self.calls = 0
+    def __call__(self, cls, *args, **kwargs):
+        self.calls += 1
+        return int(all(kwargs.get(name) is not None for name in self.names))
+    def index_keys(self):
+        return tuple(('kwargs', (name,)) for name in self.names)
+
+
+class IndexTC(TestCase):
+
+    def test_index_keys(self):
+        self.assertEqual((requires('a') & requires('b') & _1_()).index_keys(),
+                         (('kwargs', ('a',)), ('kwargs', ('b',))))
+        self.assertEqual((requires('a') | requires('b', 'c')).index_keys(),
+                         (('kwargs', frozenset(('a', 'b'))),))
+        self.assertEqual((requires('a') | _1_()).index_keys(), ())
+        self.assertEqual((~requires('a')).index_keys(), ())
+
+    def test_filtering(self):
+        registry = Registry(False)
+        reqrset, reqentity, reqboth = requires('rset'), requires('entity'), \
+                                      requires('rset', 'entity')
+        class RsetObj(_RegObject):
+            __regid__ = 'obj'
+            __select__ = reqrset
+        class EntityObj(_RegObject):
+            __regid__ = 'obj'
+            __select__ = _1_() & reqentity & _1_()
+        class BothObj(_RegObject):
+            __regid__ = 'obj'
+            __select__ = reqboth & _1_() & _1_() & _1_()
+        class AnyObj(_RegObject):
+            __regid__ = 'obj'
+            __select__ = yes()
+        for obj in (RsetObj, EntityObj, BothObj, AnyObj):
+            registry.register(obj)
+        registry.initialization_completed()
+        self.assertIsInstance(registry.select('obj', rset=1), RsetObj)
+        self.assertEqual((reqrset.calls, reqentity.calls, reqboth.calls),
+                         (1, 0, 1))
+        # BothObj is indexed on 'rset' only
+        self.assertIsInstance(registry.select('obj', entity=1), EntityObj)
+        self.assertEqual((reqrset.calls, reqentity.calls, reqboth.calls),
+                         (1, 1, 1))
+        self.assertIsInstance(registry.select('obj'), AnyObj)
+        self.assertEqual((reqrset.calls, reqentity.calls, reqboth.calls),
+                         (1, 1, 1))
+        self.assertIsInstance(registry.select('obj', rset=1, entity=1),
+                              BothObj)
+        self.assertEqual((reqrset.calls, reqentity.calls, reqboth.calls),
+                         (2, 2, 2))
+        self.assertEqual(len(list(registry.possible_objects(entity=1))), 1)
+        self.assertEqual((reqrset.calls, reqentity.calls, reqboth.calls),
+                         (2, 3, 2))
+        # newly registered objects are not filtered out
+        class OtherObj(_RegObject):
+            __regid__ = 'obj'
+            __select__ = requires('other') & _1_() & _1_()
+        registry.register(OtherObj)
+        self.assertIsInstance(registry.select('obj', other=1), OtherObj)
+        # until they are indexed
+        registry._late_initialization(['obj'])
+        objects, indexname, index, unindexed = \
+            registry._indexes[id(registry['obj'])]
+        self.assertEqual(index['other'], [OtherObj])
+        self.assertIsInstance(registry.select('obj', other=1), OtherObj)
+
+    def test_positional_context(self):
+        class requires_first(requires):
+            def __call__(self, cls, rset=None, **kwargs):
+                return int(rset is not None)
+        class RsetObj(_RegObject):
+            __regid__ = 'obj'
+            __select__ = requires_first('rset')
+        registry = Registry(False)
+        registry.register(RsetObj)
+        registry.initialization_completed()
+        # the context argument may have been given positionally
+        self.assertIsInstance(registry.select('obj', 1), RsetObj)
+        registry.positional_context = ('rset',)
+        self.assertIsInstance(registry.select('obj', 1), RsetObj)
+        self.assertIsNone(registry.select_or_none('obj', None))
+
+
 @contextmanager
 def prepended_syspath(path):
     sys.path.insert(0, path)
@@ -197,6 +507,290 @@ class RegistryStoreTC(TestCase):
                          set(store['zereg']))
 
 
+LAZY_MODULES = {
+    'lazyobjects': '''
+from logilab.common.registry import RegistrableObject, yes
+
+class _Base(RegistrableObject):
+    __registry__ = 'zereg'
+    __select__ = yes()
+
+class LazyObject(_Base):
+    __regid__ = 'lazy'
+
+class OtherObject(_Base):
+    __regid__ = 'other'
+    __registries__ = ('zereg', 'otherreg')
+''',
+    'callbackobjects': '''
+from logilab.common.registry import RegistrableObject, yes
+
+class CallbackObject(RegistrableObject):
+    __registry__ = 'zereg'
+    __regid__ = 'callback'
+    __select__ = yes()
+
+def registration_callback(store):
+    store.register(CallbackObject)
+''',
+    'nolazyregobjects': '''
+from lazyobjects import _Base
+
+class UnknownObject(_Base):
+    pass
+
+class KnownObject(_Base):
+    __regid__ = 'known'
+''',
+    }
+
+class LazyRegistrationTC(TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        for modname, source in LAZY_MODULES.items():
+            with open(osp.join(self.tmpdir, modname + '.py'), 'w') as stream:
+                stream.write(source)
+        sys.path.insert(0, self.tmpdir)
+
+    def tearDown(self):
+        sys.path.remove(self.tmpdir)
+        for modname in LAZY_MODULES:
+            sys.modules.pop(modname, None)
+        shutil.rmtree(self.tmpdir)
+
+    def _store(self, modnames, **kwargs):
+        store = RegistryStore()
+        store.register_modnames(modnames, lazy=True, **kwargs)
+        return store
+
+    def test_lazy_import(self):
+        store = self._store(['lazyobjects'])
+        self.assertNotIn('lazyobjects', sys.modules)
+        self.assertEqual(['otherreg', 'zereg'], sorted(store))
+        self.assertEqual('LazyObject',
+                         store['zereg'].select('lazy').__class__.__name__)
+        self.assertIn('lazyobjects', sys.modules)
+        self.assertEqual(['lazy', 'other'], sorted(store['zereg']))
+        self.assertEqual(['other'], list(store['otherreg']))
+
+    def test_lazy_threads(self):
+        store = self._store(['lazyobjects'])
+        load_file = store.load_file
+        def slow_load_file(filepath, modname):
+            # let other threads run while the module is being loaded
+            time.sleep(0.05)
+            load_file(filepath, modname)
+        store.load_file = slow_load_file
+        results = []
+        def select():
+            try:
+                results.append(store['zereg'].select('lazy').__class__.__name__)
+            except Exception as ex:
+                results.append(ex)
+        threads = [Thread(target=select) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(['LazyObject'] * 8, results)
+        self.assertNotIn(('zereg', 'lazy'), store._lazymods)
+
+    def test_lazy_mapping_accessors(self):
+        for access, expected in ((lambda reg: len(reg.get('lazy')), 1),
+                                 (lambda reg: 'lazy' in reg, True),
+                                 (lambda reg: sorted(reg.keys()),
+                                  ['lazy', 'other']),
+                                 (lambda reg: len(list(reg.values())), 2),
+                                 (lambda reg: len(list(reg.items())), 2),
+                                 (len, 2)):
+            sys.modules.pop('lazyobjects', None)
+            store = self._store(['lazyobjects'])
+            self.assertNotIn('lazyobjects', sys.modules)
+            self.assertEqual(expected, access(store['zereg']))
+
+    def test_lazy_initialization(self):
+        store = self._store(['lazyobjects'])
+        registry = store['zereg']
+        obj = registry.select('lazy').__class__
+        self.assertIn(id(obj.__select__), registry._compiled_selectors)
+
+    def test_lazy_all_objects(self):
+        store = self._store(['lazyobjects'])
+        self.assertEqual(['LazyObject', 'OtherObject'],
+                         sorted(obj.__name__
+                                for obj in store['zereg'].all_objects()))
+
+    def test_lazy_unknown_object(self):
+        store = self._store(['lazyobjects'])
+        self.assertRaises(ObjectNotFound, store['zereg'].select, 'unknown')
+        self.assertNotIn('lazyobjects', sys.modules)
+
+    def test_eager_modules(self):
+        store = self._store(['callbackobjects', 'nolazyregobjects'])
+        self.assertIn('callbackobjects', sys.modules)
+        self.assertIn('nolazyregobjects', sys.modules)
+        self.assertEqual(['callback', 'known'],
+                         sorted(store['zereg']))
+
+    def test_manifest(self):
+        manifest = osp.join(self.tmpdir, 'manifest.json')
+        self._store(['lazyobjects', 'callbackobjects'], manifest=manifest)
+        with open(manifest) as stream:
+            scans = json.load(stream)
+        self.assertEqual(2, len(scans))
+        mdate, eager, provides = scans[osp.join(self.tmpdir, 'lazyobjects.py')]
+        self.assertFalse(eager)
+        self.assertEqual([['otherreg', 'other'], ['zereg', 'lazy'],
+                          ['zereg', 'other']], sorted(provides))
+        # unchanged files aren't scanned again
+        with open(manifest, 'w') as stream:
+            scans[osp.join(self.tmpdir, 'lazyobjects.py')][2] = [['zereg', 'fake']]
+            json.dump(scans, stream)
+        store = self._store(['lazyobjects'], manifest=manifest)
+        self.assertEqual([('zereg', 'fake')], list(store._lazymods))
+
+
+class ChangesTC(TestCase):
+    watch_changes = True
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.pkgdir = osp.join(self.tmpdir, 'changespkg')
+        os.mkdir(self.pkgdir)
+        self.write('__init__.py', '')
+        self.write('objects.py', LAZY_MODULES['lazyobjects'])
+        sys.path.insert(0, self.tmpdir)
+        self.store = RegistryStore()
+        self.store.watch_changes = self.watch_changes
+        self.register()
+
+    def tearDown(self):
+        self.store.stop_watching()
+        sys.path.remove(self.tmpdir)
+        for modname in list(sys.modules):
+            if modname.startswith('changespkg'):
+                del sys.modules[modname]
+        shutil.rmtree(self.tmpdir)
+
+    def write(self, fname, source):
+        path = osp.join(self.pkgdir, fname)
+        mtime = osp.exists(path) and os.stat(path).st_mtime
+        with open(path, 'w') as stream:
+            stream.write(source)
+        # ensure the modification date changes
+        mtime = max(mtime, os.stat(path).st_mtime) + 2
+        os.utime(path, (mtime, mtime))
+
+    def register(self):
+        self.store.register_modnames(['changespkg', 'changespkg.objects'])
+
+    def test_no_change(self):
+        self.assertFalse(self.store.is_reload_needed([self.pkgdir]))
+        self.assertEqual(set(), self.store.changed_modules([self.pkgdir]))
+
+    def test_changes(self):
+        self.assertFalse(self.store.is_reload_needed([self.pkgdir]))
+        self.write('objects.py', LAZY_MODULES['lazyobjects'] + '\n')
+        self.write('new.py', '')
+        self.write('README.txt', '')
+        self.assertTrue(self.store.is_reload_needed([self.pkgdir]))
+        self.assertEqual(set(['changespkg.objects', 'changespkg.new']),
+                         self.store.changed_modules([self.pkgdir]))
+        # changes are reported until reloading
+        self.assertEqual(set(['changespkg.objects', 'changespkg.new']),
+                         self.store.changed_modules([self.pkgdir]))
+        self.register()
+        self.assertEqual(set(['changespkg.new']),
+                         self.store.changed_modules([self.pkgdir]))
+
+    def test_removed(self):
+        self.assertFalse(self.store.is_reload_needed([self.pkgdir]))
+        os.remove(osp.join(self.pkgdir, 'objects.py'))
+        self.assertFalse(self.store.is_reload_needed([self.pkgdir]))
+        if self.watch_changes:
+            self.assertEqual(set(['changespkg.objects']),
+                             self.store.changed_modules([self.pkgdir]))
+
+    def test_moved_away(self):
+        os.mkdir(osp.join(self.pkgdir, 'sub'))
+        self.write('sub/__init__.py', '')
+        self.write('sub/objects.py', LAZY_MODULES['lazyobjects'])
+        self.store.register_modnames(['changespkg', 'changespkg.objects',
+                                      'changespkg.sub',
+                                      'changespkg.sub.objects'])
+        self.assertFalse(self.store.is_reload_needed([self.pkgdir]))
+        os.rename(osp.join(self.pkgdir, 'sub'), osp.join(self.tmpdir, 'sub'))
+        self.assertFalse(self.store.is_reload_needed([self.pkgdir]))
+        if self.watch_changes:
+            self.assertEqual(set(['changespkg.sub', 'changespkg.sub.objects']),
+                             self.store.changed_modules([self.pkgdir]))
+
+    def test_changes_before_first_call(self):
+        self.write('objects.py', LAZY_MODULES['lazyobjects'] + '\n')
+        self.assertEqual(set(['changespkg.objects']),
+                         self.store.changed_modules([self.pkgdir]))
+
+
+class PollingChangesTC(ChangesTC):
+    watch_changes = False
+
+
+class ReloadModulesTC(ChangesTC):
+
+    def setUp(self):
+        super(ReloadModulesTC, self).setUp()
+        self.write('derived.py', '''
+from changespkg.objects import LazyObject
+
+class DerivedObject(LazyObject):
+    __regid__ = 'derived'
+''')
+        self.write('independent.py', '''
+from logilab.common.registry import RegistrableObject, yes
+
+class IndependentObject(RegistrableObject):
+    __registry__ = 'zereg'
+    __regid__ = 'independent'
+    __select__ = yes()
+''')
+        self.store.register_modnames(['changespkg', 'changespkg.objects',
+                                      'changespkg.derived',
+                                      'changespkg.independent'])
+        self.changes = self.store.changed_modules([self.pkgdir])
+
+    def test_reload_dependents(self):
+        independent = self.store['zereg']['independent'][0]
+        derived = self.store['zereg']['derived'][0]
+        self.write('objects.py', LAZY_MODULES['lazyobjects'].replace(
+            "'other'", "'renamed'"))
+        changes = self.store.changed_modules([self.pkgdir])
+        self.assertEqual(set(['changespkg.objects']), changes)
+        self.assertEqual(set(['changespkg.objects', 'changespkg.derived']),
+                         self.store.reload_modules(changes))
+        self.assertEqual(['derived', 'independent', 'lazy', 'renamed'],
+                         sorted(self.store['zereg']))
+        self.assertEqual(['renamed'], list(self.store['otherreg']))
+        # objects of other modules are kept, the others have been reloaded
+        self.assertIs(independent, self.store['zereg']['independent'][0])
+        self.assertIsNot(derived, self.store['zereg']['derived'][0])
+        self.assertIsInstance(self.store['zereg'].select('derived'),
+                              sys.modules['changespkg.objects'].LazyObject)
+        self.assertEqual(set(), self.store.changed_modules([self.pkgdir]))
+
+    def test_reload_new_and_removed(self):
+        os.remove(osp.join(self.pkgdir, 'independent.py'))
+        self.write('new.py', LAZY_MODULES['callbackobjects'])
+        changes = self.store.changed_modules([self.pkgdir])
+        self.assertEqual(set(['changespkg.independent', 'changespkg.new']),
+                         changes)
+        self.store.reload_modules(changes)
+        self.assertEqual(['callback', 'derived', 'lazy', 'other'],
+                         sorted(self.store['zereg']))
+        self.assertNotIn('changespkg.independent', sys.modules)
+        self.assertEqual(set(), self.store.changed_modules([self.pkgdir]))
+
+
 class RegistrableInstanceTC(TestCase):
 
     def test_instance_modulename(self):
@@ -23,9 +23,10 @@ import datetime, time
 
 from six.moves import range
 
+from logilab.common import STD_BLACKLIST
 from logilab.common.testlib import TestCase, unittest_main
 
-from logilab.common.shellutils import (globfind, find, ProgressBar,
+from logilab.common.shellutils import (globfind, find, ifind, ProgressBar,
                                        RawInput)
 from logilab.common.compat import StringIO
 
@@ -74,6 +75,72 @@ class FindTC(TestCase):
         self.assertSetEqual(files,
                             set([join(DATA_DIR, f) for f in ['module.py', 'module2.py']]))
 
+    def test_ifind(self):
+        files = ifind(DATA_DIR, ('.ini', '.msg'), patterns=('mo*.py', 'f*'))
+        self.assertFalse(isinstance(files, list))
+        self.assertSetEqual(set(files),
+                            set([join(DATA_DIR, f) for f in ['test.ini', 'test1.msg',
+                                                             'test2.msg', 'module.py',
+                                                             'module2.py', 'foo.txt',
+                                                             join('sub', 'momo.py')]]))
+        files = set(ifind(DATA_DIR, ('.txt', '.pyc'), patterns='*.py', exclude=True,
+                          blacklist=('sub', 'test.ini', '__pycache__')))
+        self.assertSetEqual(files,
+                            set([join(DATA_DIR, f) for f in ['test1.msg', 'test2.msg']]))
+        blacklist = STD_BLACKLIST + ('__pycache__',)
+        files = set(ifind(DATA_DIR, '.pyc', exclude=True, blacklist=blacklist))
+        self.assertSetEqual(files, set(ifind(DATA_DIR, '.pyc', exclude=True,
+                                             blacklist=blacklist, workers=3)))
+        self.assertSetEqual(files,
+                            set([join(DATA_DIR, f) for f in [
+                                '__init__.py', 'foo.txt', 'module.py', 'module2.py',
+                                'newlines.txt', 'noendingnewline.py', 'nonregr.py',
+                                'normal_file.txt', 'spam.txt', 'test.ini',
+                                'test1.msg', 'test2.msg', 'write_protected_file.txt',
+                                join('sub', 'doc.txt'), join('sub', 'momo.py')]]))
+
+
+class IfindFiltersTC(TestCase):
+
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+        os.mkdir(join(self.tempdir, 'sub'))
+        for name, size, mtime in (('small', 10, 1000000000),
+                                  ('big', 1000, 1000000000),
+                                  (join('sub', 'small'), 10, 2000000000),
+                                  (join('sub', 'big'), 1000, 2000000000)):
+            path = join(self.tempdir, name)
+            with open(path, 'w') as stream:
+                stream.write('x' * size)
+            os.utime(path, (mtime, mtime))
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir)
+
+    def find(self, **kwargs):
+        files = set(ifind(self.tempdir, **kwargs))
+        self.assertSetEqual(files, set(ifind(self.tempdir, workers=2, **kwargs)))
+        return sorted(f[len(self.tempdir)+1:] for f in files)
+
+    def test_size(self):
+        self.assertEqual(self.find(min_size=100), ['big', join('sub', 'big')])
+        self.assertEqual(self.find(max_size=100), ['small', join('sub', 'small')])
+        self.assertEqual(self.find(min_size=10, max_size=10, patterns='b*'), [])
+
+    def test_mtime(self):
+        self.assertEqual(self.find(newer_than=1500000000),
+                         [join('sub', 'big'), join('sub', 'small')])
+        self.assertEqual(self.find(older_than=1500000000, max_size=100),
+                         ['small'])
+
+    def test_links(self):
+        if not hasattr(os, 'symlink'):
+            self.skipTest('no symbolic links on this platform')
+        os.symlink(join(self.tempdir, 'sub'), join(self.tempdir, 'link'))
+        self.assertEqual(self.find(patterns='big'), ['big', join('sub', 'big')])
+        self.assertEqual(self.find(patterns='big', followlinks=True),
+                         ['big', join('link', 'big'), join('sub', 'big')])
+
 
 class ProgressBarTC(TestCase):
     def test_refresh(self):
@@ -24,6 +24,8 @@ import sys
 from os.path import join, dirname, isdir, isfile, abspath, exists
 import tempfile
 import shutil
+import threading
+import time
 
 try:
     __file__
@@ -35,7 +37,7 @@ from six.moves import range
 from logilab.common.compat import StringIO
 from logilab.common.testlib import (unittest, TestSuite, unittest_main, Tags,
     TestCase, mock_object, create_files, InnerTest, with_tempdir, tag,
-    require_version, require_module)
+    require_version, require_module, parallel_generative)
 from logilab.common.pytest  import SkipAwareTextTestRunner, NonStrictTestLoader
 
 
@@ -371,6 +373,65 @@ class GenerativeTestsTC(TestCase):
         self.assertEqual(len(result.skipped), 1)
 
 
+class ParallelGenerativeTestsTC(GenerativeTestsTC):
+
+    def setUp(self):
+        super(ParallelGenerativeTestsTC, self).setUp()
+        TestCase.generative_workers = 4
+
+    def tearDown(self):
+        TestCase.generative_workers = 0
+
+    def test_generative_exit_first(self):
+        runner = SkipAwareTextTestRunner(stream=StringIO(), exitfirst=True)
+        class FooTC(TestCase):
+            def test_generative(self):
+                for i in range(10):
+                    yield self.assertTrue, False
+        result = runner.run(FooTC('test_generative'))
+        self.assertEqual(result.testsRun, 1)
+        self.assertEqual(len(result.failures), 1)
+        self.assertEqual(len(result.errors), 0)
+
+    def test_generative_order(self):
+        class FooTC(TestCase):
+            def check(self, val):
+                # first cases are the longest ones
+                time.sleep((10 - val) * 0.005)
+                if not val % 3:
+                    self.fail('failed %s' % val)
+            def test_generative(self):
+                for i in range(10):
+                    yield InnerTest("check_%s" % i, self.check, i)
+        result = self.runner.run(FooTC('test_generative'))
+        self.assertEqual(result.testsRun, 10)
+        self.assertEqual([err.strip().rsplit(' ', 1)[1]
+                          for test, err in result.failures],
+                         ['0', '3', '6', '9'])
+
+    def test_concurrency(self):
+        TestCase.generative_workers = 0
+        lock = threading.Lock()
+        running = [0, 0]
+        class FooTC(TestCase):
+            def check(self):
+                with lock:
+                    running[0] += 1
+                    running[1] = max(running)
+                time.sleep(0.02)
+                with lock:
+                    running[0] -= 1
+            @parallel_generative(4)
+            def test_generative(self):
+                for i in range(12):
+                    yield self.check
+        result = self.runner.run(FooTC('test_generative'))
+        self.assertEqual(result.testsRun, 12)
+        self.assertTrue(result.wasSuccessful())
+        self.assertGreater(running[1], 1)
+        self.assertLessEqual(running[1], 4)
+
+
 class ExitFirstTC(TestCase):
     def setUp(self):
         output = StringIO()